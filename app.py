@@ -1,32 +1,70 @@
-from flask import Flask, render_template, request, redirect, url_for, session
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from extensions import db 
+from markupsafe import Markup
+from extensions import db, configurar_db, url_base_de_datos
 from utils.supermercado import armar_listado_supermercados, calcular_super_mas_barato
+from utils.precios import mejores_precios, subconsulta_mejor_precio
+from utils.buscador import obtener_indice_busqueda
+from utils.busqueda_hibrida import obtener_buscador_hibrido
+from utils.cache import obtener_cache, clave_lista, incrementar_version_lista, invalidar_lista
+from utils.upsert import upsert
+from types import SimpleNamespace
 import json 
+import os
 
-def create_app():
+def create_app(config=None):
     
     app = Flask(__name__)
 
-    # Base de datos SQLite en un archivo local
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///super_app.db"
+    # Base de datos: DATABASE_URL (ej: postgresql://...) o SQLite en un archivo local
+    app.config["SQLALCHEMY_DATABASE_URI"] = url_base_de_datos()
+    app.config["DATABASE_URL_LECTURA"] = os.environ.get("DATABASE_URL_LECTURA")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.secret_key = "cambia_esta_clave_por_una_muy_larga_y_aleatoria_123456789"
-    db.init_app(app)
+
+    # Perfil de PRAGMAs de SQLite (ver extensions.PERFILES_SQLITE) y pool
+    # de solo lectura para los GET de la web
+    app.config["SQLITE_PERFIL"] = os.environ.get("CARRITO_SQLITE_PERFIL", "produccion")
+    app.config["DB_SOLO_LECTURA"] = os.environ.get("CARRITO_DB_SOLO_LECTURA") == "1"
+
+    # Pool de conexiones (solo motores cliente/servidor, ver extensions.opciones_pool)
+    app.config["DB_POOL_SIZE"] = int(os.environ.get("CARRITO_DB_POOL_SIZE", "10"))
+    app.config["DB_POOL_OVERFLOW"] = int(os.environ.get("CARRITO_DB_POOL_OVERFLOW", "20"))
+    app.config["DB_POOL_RECYCLE"] = int(os.environ.get("CARRITO_DB_POOL_RECYCLE", "1800"))
+
+    # Permite pisar la configuración (ej: base en memoria para benchmarks)
+    if config:
+        app.config.update(config)
+    configurar_db(app)
     from models import Producto, ListaCompra, PrecioProducto, ProductoSupermercado, Supermercado, ItemListaCompra  # ajustá el import según tu estructura
 
     def obtener_items_y_total(lista):
-        # Traer ítems de la lista
-        items = ItemListaCompra.query.filter_by(lista_compra_id=lista.id).all()
-        
-        for item in items:
-            # Adjuntar el producto para que el template pueda usar item.producto.nombre
-            item.producto = Producto.query.get(item.producto_id)
-            # Como todavía no estamos manejando precios, lo dejamos explícito
-            item.mejor_precio = None
+        # Ítems, productos y el mejor precio vigente de cada uno en una sola consulta
+        mejor = subconsulta_mejor_precio(
+            db.select(ItemListaCompra.producto_id).where(ItemListaCompra.lista_compra_id == lista.id)
+        )
+        filas = db.session.execute(
+            db.select(ItemListaCompra, Producto, mejor.c.precio, mejor.c.supermercado)
+            .join(Producto, Producto.id == ItemListaCompra.producto_id)
+            .outerjoin(mejor, mejor.c.producto_id == ItemListaCompra.producto_id)
+            .where(ItemListaCompra.lista_compra_id == lista.id)
+            .order_by(ItemListaCompra.id.asc())
+        ).all()
 
-        # Por ahora no calculamos precios reales
+        items = []
         total = 0
+        for item, producto, precio, nombre_super in filas:
+            # Adjuntar el producto para que el template pueda usar item.producto.nombre
+            item.producto = producto
+            item.mejor_precio = None
+            if precio is not None:
+                # Misma forma que usa el template: mejor_precio.supermercado.nombre
+                item.mejor_precio = SimpleNamespace(
+                    precio=precio,
+                    supermercado=SimpleNamespace(nombre=nombre_super),
+                )
+                total += precio * item.cantidad
+            items.append(item)
 
         return items, total
 
@@ -39,20 +77,19 @@ def create_app():
         listas = ListaCompra.query.order_by(ListaCompra.fecha_creacion.desc()).all()
         
         lista_activa = None
-        items = []
-        total = 0
+        items_html = None
 
         if 'lista_activa_id' in session:
             lista_activa = ListaCompra.query.get(session['lista_activa_id'])
             if lista_activa:
-                items, total = obtener_items_y_total(lista_activa)
+                # Los ítems salen de la cache de fragmentos (ver cargar_items)
+                items_html = Markup(cargar_items(lista_activa))
 
         return render_template(
             'lista_compra.html',
             listas=listas,
             lista_activa=lista_activa,
-            items=items,
-            total_estimado=total
+            items_html=items_html
         )
     
     @app.route('/lista/<int:lista_id>/comparar') 
@@ -60,19 +97,24 @@ def create_app():
         # Obtenemos la lista
         lista = ListaCompra.query.get_or_404(lista_id)
 
-        # Armamos la estructura con supermercados + items
-        listado = armar_listado_supermercados(lista_id)
+        def renderizar():
+            # Armamos la estructura con supermercados + items
+            listado = armar_listado_supermercados(lista_id)
 
-        # Calculamos el nombre del super más barato
-        super_mas_barato = calcular_super_mas_barato(listado)
+            # Calculamos el nombre del super más barato
+            super_mas_barato = calcular_super_mas_barato(listado)
 
-        # IMPORTANTE: pasar lista al template
-        return render_template(
-            "comparar.html",
-            lista=lista,
-            listado=listado,
-            super_mas_barato=super_mas_barato
-        )
+            # IMPORTANTE: pasar lista al template
+            return render_template(
+                "comparar.html",
+                lista=lista,
+                listado=listado,
+                super_mas_barato=super_mas_barato
+            )
+
+        # Mientras no cambien la lista ni los precios (nuevo crawl) se sirve
+        # la página cacheada sin tocar las tablas de precios
+        return obtener_cache().obtener_o_calcular(clave_lista("comparar", lista), renderizar)
 
     @app.route('/lista/crear', methods=['POST'])
     def crear_lista():
@@ -104,17 +146,34 @@ def create_app():
     @app.route('/api/buscar')
     def buscar_productos():
         q = request.args.get('query', '').strip()
+        modo = request.args.get('modo', 'lexico')
+        formato = request.args.get('formato', 'html')
+
         if len(q) < 2:
-            return ''
-
-        # Buscar SOLO productos genéricos
-        productos = (
-            Producto.query
-            .filter(Producto.nombre.ilike(f'%{q}%'))
-            .order_by(Producto.nombre.asc())
-            .limit(10)
-            .all()
-        )
+            return jsonify([]) if formato == 'json' else ''
+
+        # Buscar SOLO productos genéricos, en el índice en memoria
+        # (prefijos, sin acentos y en cualquier orden).
+        # modo=hibrido suma vecinos por embedding ("leche descremada" -> "Leche Desc.")
+        if modo == 'hibrido':
+            productos = obtener_buscador_hibrido().buscar(q, limite=10)
+        else:
+            productos = obtener_indice_busqueda().buscar(q, limite=10)
+
+        # Precio vigente más barato de cada sugerencia (una sola consulta)
+        precios = mejores_precios([producto_id for producto_id, _ in productos])
+
+        if formato == 'json':
+            resultado = []
+            for producto_id, nombre in productos:
+                precio, nombre_super = precios.get(producto_id, (None, None))
+                resultado.append({
+                    'id': producto_id,
+                    'nombre': nombre,
+                    'precio': precio,
+                    'supermercado': nombre_super,
+                })
+            return jsonify(resultado)
 
         if not productos:
             return '<div class="p-3 text-muted">No se encontraron productos</div>'
@@ -124,17 +183,20 @@ def create_app():
             style="max-height:400px;overflow-y:auto;">
         '''
         
-        for prod in productos:
-            nombre_js = json.dumps(prod.nombre or "Sin nombre")
+        for producto_id, nombre in productos:
+            nombre_js = json.dumps(nombre or "Sin nombre")
+
+            # Sin precio vigente: 0 y "Genérico" como placeholders para el JS
+            precio, nombre_super = precios.get(producto_id, (0, "Genérico"))
+            super_js = json.dumps(nombre_super)
 
-            # precio = 0 y "Genérico" son solo placeholders para tu JS actual
             html += f'''
             <div class="px-3 py-3 border-bottom"
                 style="cursor:pointer;background:var(--bs-light);"
-                onclick='seleccionarProducto({prod.id}, {nombre_js}, 0, "Genérico")'>
+                onclick='seleccionarProducto({producto_id}, {nombre_js}, {precio}, {super_js})'>
                 <div class="d-flex justify-content-between align-items-center">
                     <div>
-                        <strong>{prod.nombre}</strong><br>
+                        <strong>{nombre}</strong><br>
                         <small class="text-muted">Producto genérico</small>
                     </div>
                 </div>
@@ -155,22 +217,20 @@ def create_app():
             # Si no seleccionaron producto de las sugerencias, no hacemos nada raro
             return cargar_items(lista)
 
-        item = ItemListaCompra.query.filter_by(
-            lista_compra_id=lista.id,
-            producto_id=producto_id
-        ).first()
-
-        if item:
-            item.cantidad += cantidad
-        else:
-            item = ItemListaCompra(
-                lista_compra_id=lista.id,
-                producto_id=producto_id,
-                cantidad=cantidad
-            )
-            db.session.add(item)
+        # Si el producto ya está en la lista se suma la cantidad
+        # (una sola sentencia, sin carrera entre el SELECT y el INSERT)
+        upsert(
+            ItemListaCompra,
+            {"lista_compra_id": lista.id, "producto_id": producto_id, "cantidad": cantidad},
+            conflicto=["lista_compra_id", "producto_id"],
+            actualizar=lambda sentencia: {
+                "cantidad": ItemListaCompra.cantidad + sentencia.excluded.cantidad
+            },
+        )
 
+        incrementar_version_lista(lista.id)
         db.session.commit()
+        invalidar_lista(lista.id)
         return cargar_items(lista)
 
     @app.route('/item/<int:item_id>/quitar', methods=['POST'])
@@ -183,18 +243,23 @@ def create_app():
 
         # Eliminar el item
         db.session.delete(item)
+        incrementar_version_lista(lista.id)
         db.session.commit()
+        invalidar_lista(lista.id)
 
         # Volver a renderizar los items de ESA lista
         return cargar_items(lista)
 
     def cargar_items(lista):
-        items, total = obtener_items_y_total(lista)
-        return render_template(
-            'partials/items_lista.html',
-            items=items,
-            total_estimado=total
-        )
+        def renderizar():
+            items, total = obtener_items_y_total(lista)
+            return render_template(
+                'partials/items_lista.html',
+                items=items,
+                total_estimado=total
+            )
+
+        return obtener_cache().obtener_o_calcular(clave_lista("items", lista), renderizar)
     
     @app.route('/lista/<int:lista_id>/eliminar', methods=['POST'])
     def eliminar_lista(lista_id):
@@ -207,6 +272,7 @@ def create_app():
         # Borrar la lista
         db.session.delete(lista)
         db.session.commit()
+        invalidar_lista(lista_id)
 
         # Si era la lista activa, sacarla de la sesión
         if session.get('lista_activa_id') == lista.id:
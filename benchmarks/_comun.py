@@ -0,0 +1,64 @@
+import sys
+import os
+import time
+from contextlib import contextmanager
+
+# ruta a la raíz del proyecto
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_PATH)
+
+from sqlalchemy import event
+
+
+# Base para los benchmarks: SQLite en memoria, o la que indique
+# CARRITO_BENCH_DATABASE_URL (ej: un PostgreSQL local descartable)
+URI_BENCHMARK = os.environ.get("CARRITO_BENCH_DATABASE_URL", "sqlite://")
+
+
+def crear_app_benchmark(uri=None, config=None, limpiar=True):
+    """
+    Crea la app de Flask apuntando a una base descartable y crea todas las
+    tablas. `config` se suma a la configuración de la app.
+    En motores que no son SQLite en memoria, con limpiar=True se borran las
+    tablas antes de crearlas, para arrancar siempre de una base vacía.
+    """
+    from app import create_app
+    from extensions import db
+
+    uri = uri or URI_BENCHMARK
+    app = create_app({"SQLALCHEMY_DATABASE_URI": uri, **(config or {})})
+    with app.app_context():
+        if limpiar and uri != "sqlite://":
+            db.drop_all()
+        db.create_all()
+    return app
+
+
+class ContadorConsultas:
+    """
+    Cuenta las sentencias SQL que se ejecutan sobre un engine.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.total = 0
+
+    def _contar(self, *args, **kwargs):
+        self.total += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._contar)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._contar)
+
+
+@contextmanager
+def cronometro(resultado, clave="ms"):
+    """
+    Mide el tiempo del bloque y lo guarda en resultado[clave] en milisegundos.
+    """
+    inicio = time.perf_counter()
+    yield
+    resultado[clave] = (time.perf_counter() - inicio) * 1000
@@ -0,0 +1,55 @@
+"""
+Tiempo de arranque y memoria (RSS máxima) al importar la app, con el modelo
+cargado al importar (como antes, CARRITO_PRECARGAR_MODELO=1) y con carga
+perezosa (por defecto).
+
+Uso:
+    python benchmarks/bench_arranque.py
+"""
+import os
+import subprocess
+import sys
+import json
+
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SCRIPT = """
+import json, resource, time
+inicio = time.perf_counter()
+from app import create_app
+create_app()
+segundos = time.perf_counter() - inicio
+print(json.dumps({
+    "segundos": segundos,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+ESCENARIOS = {
+    "precarga (antes)": {"CARRITO_PRECARGAR_MODELO": "1"},
+    "perezoso (ahora)": {"CARRITO_PRECARGAR_MODELO": "0"},
+}
+
+
+def medir(env_extra):
+    env = dict(os.environ, **env_extra)
+    salida = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        cwd=ROOT_PATH,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{'escenario':<20} {'arranque (s)':>13} {'RSS máx (MB)':>13}")
+    for nombre, env in ESCENARIOS.items():
+        r = medir(env)
+        print(f"{nombre:<20} {r['segundos']:>13.2f} {r['rss_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Latencia del autocompletado (/api/buscar) sobre un catálogo sintético:
+índice en memoria (IndiceBusqueda) contra el ILIKE '%q%' anterior.
+
+Uso:
+    python benchmarks/bench_autocompletar.py [--productos 100000]
+"""
+import argparse
+import random
+import time
+
+from _comun import crear_app_benchmark
+
+from extensions import db
+from models import Producto
+from utils.buscador import IndiceBusqueda
+
+PALABRAS = [
+    "leche", "descremada", "entera", "yogur", "bebible", "queso", "cremoso", "rallado",
+    "galletitas", "dulces", "saladas", "aceite", "girasol", "oliva", "arroz", "largo",
+    "fideos", "tallarines", "mostachol", "azúcar", "yerba", "mate", "café", "té",
+    "gaseosa", "cola", "limón", "naranja", "agua", "mineral", "jabón", "polvo",
+    "detergente", "lavandina", "pan", "lactal", "integral", "manteca", "dulce", "membrillo",
+]
+MARCAS = ["La Serenísima", "Sancor", "Arcor", "Marolio", "Molto", "Bagley", "Knorr", "Taragüí"]
+MEDIDAS = ["1 L", "500 ml", "1 kg", "500 g", "250 g", "2.25 L", "6 x 500 ml"]
+CONSULTAS = ["le", "lech", "leche desc", "desc leche", "azucar", "yerba tar", "ace oli", "gal dul arc", "que rall"]
+
+
+def generar_nombres(n, semilla=42):
+    rnd = random.Random(semilla)
+    return [
+        " ".join(rnd.sample(PALABRAS, 3)).capitalize() + f" {rnd.choice(MARCAS)} {rnd.choice(MEDIDAS)}"
+        for _ in range(n)
+    ]
+
+
+def percentiles(tiempos):
+    tiempos = sorted(tiempos)
+    p = lambda q: tiempos[min(len(tiempos) - 1, int(q * len(tiempos)))]
+    return p(0.50), p(0.99)
+
+
+def medir(nombre, funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        for q in CONSULTAS:
+            inicio = time.perf_counter()
+            funcion(q)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    p50, p99 = percentiles(tiempos)
+    print(f"{nombre:<18} p50={p50:8.2f} ms   p99={p99:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--productos", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    nombres = generar_nombres(args.productos)
+
+    inicio = time.perf_counter()
+    indice = IndiceBusqueda()
+    indice.agregar_muchos(enumerate(nombres, start=1))
+    print(f"Índice de {len(nombres)} productos construido en {time.perf_counter() - inicio:.2f} s")
+    medir("índice en memoria", lambda q: indice.buscar(q, limite=10), args.repeticiones)
+
+    app = crear_app_benchmark()
+    with app.app_context():
+        db.session.execute(db.insert(Producto), [{"nombre": n} for n in nombres])
+        db.session.commit()
+        medir(
+            "ILIKE '%q%'",
+            lambda q: Producto.query.filter(Producto.nombre.ilike(f"%{q}%")).order_by(Producto.nombre.asc()).limit(10).all(),
+            max(1, args.repeticiones // 10),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Latencia de la búsqueda híbrida (léxica + semántica) sobre un log de consultas,
+comparada con la búsqueda solo léxica.
+
+El log es un archivo de texto con una consulta por línea (por ejemplo, las
+consultas a /api/buscar sacadas del log del servidor). Sin --log se genera uno
+simulando tipeo: cada consulta aparece letra por letra, con repeticiones.
+
+Por defecto los embeddings salen de un codificador por hashing de trigramas
+(rápido y sin descargar nada); con --modelo se usa el modelo real.
+
+Uso:
+    python benchmarks/bench_busqueda_hibrida.py [--productos 20000] [--log consultas.txt] [--modelo]
+"""
+import argparse
+import random
+import time
+import zlib
+
+import numpy as np
+
+import _comun  # noqa: F401  (agrega la raíz del proyecto al path)
+
+from bench_autocompletar import CONSULTAS, generar_nombres, percentiles
+from utils.buscador import IndiceBusqueda
+from utils.busqueda_hibrida import BuscadorHibrido
+from utils.generar_alias import normalize_text
+from utils.indice_vectorial import IndiceVectorial
+from utils.servicio_embeddings import ServicioEmbeddings
+
+DIM = 384
+
+CONSULTAS_SEMANTICAS = ["leche descremada", "gaseosa de cola", "yerba mate", "queso para rallar", "agua sin gas"]
+
+
+def codificar_trigramas(textos):
+    """
+    Codificador de juguete: bolsa de trigramas de caracteres en DIM posiciones.
+    """
+    vectores = np.zeros((len(textos), DIM), dtype=np.float32)
+    for i, texto in enumerate(textos):
+        for palabra in normalize_text(texto).split():
+            palabra = f"#{palabra}#"
+            for j in range(len(palabra) - 2):
+                vectores[i, zlib.crc32(palabra[j:j + 3].encode()) % DIM] += 1.0
+    return vectores
+
+
+def generar_log(n, semilla=7):
+    """
+    Consultas como llegan al endpoint: una por cada letra tipeada (desde la
+    segunda), eligiendo las consultas de base con una distribución tipo Zipf.
+    """
+    rnd = random.Random(semilla)
+    base = CONSULTAS + CONSULTAS_SEMANTICAS
+    pesos = [1 / (i + 1) for i in range(len(base))]
+    log = []
+    while len(log) < n:
+        consulta = rnd.choices(base, pesos)[0]
+        log.extend(consulta[:fin] for fin in range(2, len(consulta) + 1))
+    return log[:n]
+
+
+def medir(nombre, funcion, consultas):
+    tiempos = []
+    for q in consultas:
+        inicio = time.perf_counter()
+        funcion(q)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    p50, p99 = percentiles(tiempos)
+    print(f"{nombre:<10} p50={p50:8.2f} ms   p99={p99:8.2f} ms   ({len(consultas)} consultas)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--productos", type=int, default=20_000)
+    parser.add_argument("--log", help="archivo con una consulta por línea")
+    parser.add_argument("--consultas", type=int, default=2_000, help="largo del log generado")
+    parser.add_argument("--modelo", action="store_true", help="usar el modelo de embeddings real")
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, encoding="utf-8") as f:
+            consultas = [linea.strip() for linea in f if linea.strip()]
+    else:
+        consultas = generar_log(args.consultas)
+
+    if args.modelo:
+        from utils import obtener_modelo
+        codificador = lambda textos: obtener_modelo().encode(textos, convert_to_numpy=True)
+    else:
+        codificador = codificar_trigramas
+
+    nombres = generar_nombres(args.productos)
+    servicio = ServicioEmbeddings(codificador)
+
+    inicio = time.perf_counter()
+    lexico = IndiceBusqueda()
+    lexico.agregar_muchos(enumerate(nombres, start=1))
+    vectores = servicio.embed_lote(nombres)
+    vectorial = IndiceVectorial.desde_filas(
+        ((i, None, vec) for i, vec in enumerate(vectores, start=1)), dim=len(vectores[0])
+    )
+    print(f"Índices de {len(nombres)} productos armados en {time.perf_counter() - inicio:.2f} s")
+
+    buscador = BuscadorHibrido(lexico, vectorial, servicio)
+
+    medir("léxica", lambda q: lexico.buscar(q, limite=10), consultas)
+    medir("híbrida", lambda q: buscador.buscar(q, limite=10), consultas)
+    print("Embeddings de consultas:", buscador.estadisticas)
+
+    for q in CONSULTAS_SEMANTICAS:
+        print(f"\n{q!r}")
+        print("  léxica: ", [nombre for _, nombre in lexico.buscar(q, limite=3)])
+        print("  híbrida:", [nombre for _, nombre in buscador.buscar(q, limite=3)])
+
+
+if __name__ == "__main__":
+    main()
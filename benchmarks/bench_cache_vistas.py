@@ -0,0 +1,54 @@
+"""
+Vistas repetidas de /lista/<id>/comparar con y sin la cache de fragmentos:
+consultas SQL y latencia del primer pedido (cache vacía) contra los siguientes.
+
+Uso:
+    python benchmarks/bench_cache_vistas.py [--items 60] [--supers 5] [--repeticiones 20]
+"""
+import argparse
+
+from _comun import crear_app_benchmark, ContadorConsultas, cronometro
+from bench_comparar import poblar
+
+from extensions import db
+from utils.cache import obtener_cache, incrementar_version_precios
+
+
+def pedir(cliente, url):
+    medicion = {}
+    with ContadorConsultas(db.engine) as contador, cronometro(medicion):
+        respuesta = cliente.get(url)
+    assert respuesta.status_code == 200
+    return contador.total, medicion["ms"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=60)
+    parser.add_argument("--supers", type=int, default=5)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    app = crear_app_benchmark()
+    with app.app_context():
+        lista_id = poblar(args.items, args.supers)
+    url = f"/lista/{lista_id}/comparar"
+    cliente = app.test_client()
+
+    with app.app_context():
+        consultas, ms = pedir(cliente, url)
+        print(f"{'cache vacía':<22} consultas={consultas:>4}   {ms:8.2f} ms")
+
+        repetidos = [pedir(cliente, url) for _ in range(args.repeticiones)]
+        promedio = sum(ms for _, ms in repetidos) / len(repetidos)
+        print(f"{'cache caliente':<22} consultas={repetidos[-1][0]:>4}   {promedio:8.2f} ms (promedio)")
+
+        incrementar_version_precios()
+        consultas, ms = pedir(cliente, url)
+        print(f"{'después de un crawl':<22} consultas={consultas:>4}   {ms:8.2f} ms")
+
+    print("Cache:", obtener_cache().estadisticas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark de armar_listado_supermercados: cantidad de consultas y latencia
+en función del largo de la lista y de la cantidad de supermercados.
+
+Uso:
+    python benchmarks/bench_comparar.py
+"""
+from datetime import date, timedelta
+
+from _comun import crear_app_benchmark, ContadorConsultas, cronometro
+
+from extensions import db
+from models import Producto, Supermercado, ProductoSupermercado, ListaCompra, ItemListaCompra
+from utils.supermercado import armar_listado_supermercados, calcular_super_mas_barato
+from utils.precios import reconstruir_precios_actuales
+from utils.historial_precios import registrar_precios
+
+TAMANIOS_LISTA = [10, 60, 200]
+CANTIDAD_SUPERS = [2, 5, 10]
+PRECIOS_POR_PRODUCTO = 30  # ~ un mes de crawls diarios
+
+
+def poblar(n_items, n_supers):
+    supers = [Supermercado(nombre=f"Super {i}", url=f"https://super{i}.example") for i in range(n_supers)]
+    db.session.add_all(supers)
+
+    productos = [Producto(nombre=f"Producto {i}") for i in range(n_items)]
+    db.session.add_all(productos)
+    db.session.flush()
+
+    lista = ListaCompra(nombre="Mensual")
+    db.session.add(lista)
+    db.session.flush()
+
+    # Un crawl por día durante el último mes, con el precio cambiando cada día
+    hoy = date.today()
+    precios = []
+    for prod in productos:
+        db.session.add(ItemListaCompra(lista_compra_id=lista.id, producto_id=prod.id, cantidad=2))
+        for superm in supers:
+            ps = ProductoSupermercado(producto_id=prod.id, supermercado_id=superm.id)
+            db.session.add(ps)
+            db.session.flush()
+            precios.extend(
+                (ps.id, 100.0 + d, "ARS", hoy - timedelta(days=PRECIOS_POR_PRODUCTO - 1 - d))
+                for d in range(PRECIOS_POR_PRODUCTO)
+            )
+    registrar_precios(precios)
+
+    db.session.commit()
+    reconstruir_precios_actuales()
+    return lista.id
+
+
+def main():
+    print(f"{'items':>6} {'supers':>7} {'consultas':>10} {'ms':>10}")
+    for n_items in TAMANIOS_LISTA:
+        for n_supers in CANTIDAD_SUPERS:
+            app = crear_app_benchmark()
+            with app.app_context():
+                lista_id = poblar(n_items, n_supers)
+                db.session.expire_all()
+
+                medicion = {}
+                with ContadorConsultas(db.engine) as contador, cronometro(medicion):
+                    listado = armar_listado_supermercados(lista_id)
+                    calcular_super_mas_barato(listado)
+
+                print(f"{n_items:>6} {n_supers:>7} {contador.total:>10} {medicion['ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Concurrencia adaptativa contra un servidor HTTP local que imita a un super:
+responde las páginas de --fixtures (o JSON sintético tipo VTEX) con una
+latencia configurable, se pone más lento con muchos pedidos en paralelo y
+devuelve 429 (con Retry-After) por encima de --limite pedidos por segundo.
+Manda ETag y contesta 304 a los pedidos condicionales (lo usa
+bench_concurrencia_scrapy.py con la HTTPCACHE).
+
+Compara el perfil fijo anterior (1 pedido por dominio, DOWNLOAD_DELAY = 1)
+con ControlConcurrencia, el mismo control que usa
+ConcurrenciaAdaptativaMiddleware en los spiders. Los 429 se reintentan,
+así que los dos terminan con todas las páginas.
+
+Uso:
+    python benchmarks/bench_concurrencia.py [--paginas 40] [--latencia 0.2] [--limite 20]
+        [--capacidad 8] [--maximo 16] [--fixtures dir]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# No necesita la app ni Scrapy: solo el control de concurrencia
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT_PATH, "scrapers", "precios_super"))
+
+from precios_super.concurrencia import ControlConcurrencia, segundos_retry_after
+
+
+class Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, cuerpos, latencia, limite, capacidad):
+        super().__init__(("127.0.0.1", 0), Manejador)
+        self.cuerpos = cuerpos
+        self.latencia = latencia
+        self.limite = limite
+        self.capacidad = capacidad
+        self.candado = threading.Lock()
+        self.fichas = float(limite)
+        self.ultima_recarga = time.monotonic()
+        self.en_vuelo = 0
+
+    def admitir(self):
+        """
+        Balde de fichas de `limite` por segundo: False si hay que devolver 429.
+        """
+        with self.candado:
+            ahora = time.monotonic()
+            self.fichas = min(self.limite, self.fichas + (ahora - self.ultima_recarga) * self.limite)
+            self.ultima_recarga = ahora
+            if self.fichas < 1:
+                return False
+            self.fichas -= 1
+            self.en_vuelo += 1
+            return True
+
+    def demora(self):
+        # Por encima de `capacidad` pedidos simultáneos cada uno tarda más
+        with self.candado:
+            exceso = max(0, self.en_vuelo - self.capacidad)
+        return self.latencia * (1 + exceso / self.capacidad)
+
+    def liberar(self):
+        with self.candado:
+            self.en_vuelo -= 1
+
+
+class Manejador(BaseHTTPRequestHandler):
+    def do_GET(self):
+        servidor = self.server
+        if not servidor.admitir():
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        try:
+            time.sleep(servidor.demora())
+            cuerpo = servidor.cuerpos[hash(self.path) % len(servidor.cuerpos)]
+            etag = f'"{hashlib.sha1(cuerpo).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+        finally:
+            servidor.liberar()
+
+    def log_message(self, *args):
+        pass
+
+
+def cuerpos_sinteticos(cantidad=5):
+    return [
+        json.dumps([
+            {"productId": f"{n}{i}", "productName": f"Producto {n}-{i}", "brand": "MARCA",
+             "items": [{"ean": str(7790000000000 + i), "sellers": [{"commertialOffer": {"Price": 1000.0 + i}}]}]}
+            for i in range(50)
+        ]).encode("utf-8")
+        for n in range(cantidad)
+    ]
+
+
+def pedir(url):
+    """
+    (status, latencia, Retry-After en segundos o None)
+    """
+    inicio = time.monotonic()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as respuesta:
+            respuesta.read()
+            return respuesta.status, time.monotonic() - inicio, None
+    except urllib.error.HTTPError as e:
+        return e.code, time.monotonic() - inicio, segundos_retry_after(e.headers.get("Retry-After"))
+
+
+def crawl(base, paginas, control):
+    """
+    Baja `paginas` URLs respetando control.concurrencia y control.demora,
+    como el slot de descarga de Scrapy. Devuelve (segundos, pedidos hechos).
+    """
+    pendientes = deque(f"{base}/pagina/{i}" for i in range(paginas))
+    en_vuelo = {}
+    proximo = 0.0
+    pedidos = 0
+    inicio = time.monotonic()
+    with ThreadPoolExecutor(max_workers=control.maximo) as pool:
+        while pendientes or en_vuelo:
+            ahora = time.monotonic()
+            while pendientes and len(en_vuelo) < control.concurrencia and ahora >= proximo:
+                url = pendientes.popleft()
+                en_vuelo[pool.submit(pedir, url)] = url
+                pedidos += 1
+                proximo = ahora + control.demora
+            espera = max(0.005, proximo - ahora) if pendientes else None
+            listos, _ = wait(list(en_vuelo), timeout=espera, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                url = en_vuelo.pop(futuro)
+                status, latencia, reintentar_en = futuro.result()
+                control.respuesta(latencia, status, reintentar_en)
+                if status != 200:
+                    pendientes.append(url)
+    return time.monotonic() - inicio, pedidos
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paginas", type=int, default=40)
+    parser.add_argument("--latencia", type=float, default=0.2, help="segundos por respuesta sin carga")
+    parser.add_argument("--limite", type=float, default=20, help="pedidos por segundo antes de responder 429")
+    parser.add_argument("--capacidad", type=int, default=8, help="pedidos simultáneos antes de ponerse lento")
+    parser.add_argument("--maximo", type=int, default=16, help="concurrencia máxima del control adaptativo")
+    parser.add_argument("--fixtures", default=None, help="directorio con respuestas *.json para servir")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        cuerpos = []
+        for ruta in sorted(glob.glob(os.path.join(args.fixtures, "*.json"))):
+            with open(ruta, "rb") as f:
+                cuerpos.append(f.read())
+    else:
+        cuerpos = cuerpos_sinteticos()
+
+    perfiles = (
+        ("fijo (1 por dominio, demora 1s)", lambda: ControlConcurrencia(
+            inicial=1, minimo=1, maximo=1, demora_inicial=1.0, demora_minima=1.0, demora_maxima=1.0)),
+        (f"adaptativo (máx {args.maximo})", lambda: ControlConcurrencia(
+            inicial=2, maximo=args.maximo, latencia_objetivo=args.latencia * 4, demora_inicial=0.5)),
+    )
+
+    print(f"{args.paginas} páginas, latencia {args.latencia}s, límite {args.limite} pedidos/s, capacidad {args.capacidad}")
+    print(f"{'perfil':<34} {'seg':>7} {'pág/s':>7} {'pedidos':>8} {'429':>5} {'lat media':>10} {'conc máx':>9}")
+    tiempos = []
+    for nombre, crear in perfiles:
+        servidor = Servidor(cuerpos, args.latencia, args.limite, args.capacidad)
+        hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+        hilo.start()
+        try:
+            control = crear()
+            segundos, pedidos = crawl(f"http://127.0.0.1:{servidor.server_address[1]}", args.paginas, control)
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+        stats = control.estadisticas()
+        tiempos.append(segundos)
+        print(
+            f"{nombre:<34} {segundos:>7.1f} {args.paginas / segundos:>7.1f} {pedidos:>8} "
+            f"{stats['errores'].get('429', 0):>5} {stats['latencia_media']:>10.3f} {stats['concurrencia_maxima']:>9}"
+        )
+    print(f"aceleración: {tiempos[0] / tiempos[1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+ConcurrenciaAdaptativaMiddleware dentro de Scrapy, contra el servidor local
+de bench_concurrencia.py: a diferencia de ese benchmark (que solo usa
+ControlConcurrencia con su propio cliente), acá los límites los aplica el
+middleware sobre los slots de descarga reales del downloader, con los
+settings del proyecto (HTTPCACHE incluida).
+
+Hace dos crawls de las mismas --paginas URLs con la cache en un directorio
+temporal y chequea que:
+  - el primer pedido ya sale con los límites del dominio
+    (CONCURRENCIA_DOMINIOS) y no con CONCURRENT_REQUESTS_PER_DOMAIN;
+  - la concurrencia del slot sube con respuestas sanas y la demora sube
+    con los 429;
+  - en el segundo crawl los 304 de la revalidación llegan al control con
+    su status y su latencia (no se pierden como "cached").
+
+Sale con código 1 si algún chequeo falla.
+
+Uso:
+    python benchmarks/bench_concurrencia_scrapy.py [--paginas 60] [--latencia 0.05] [--limite 40]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT_PATH, "scrapers", "precios_super"))
+os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "precios_super.settings")
+
+import scrapy
+from scrapy import signals
+from scrapy.crawler import CrawlerRunner
+from scrapy.utils.log import configure_logging
+from scrapy.utils.project import get_project_settings
+from scrapy.utils.reactor import install_reactor
+from twisted.internet import defer
+
+from bench_concurrencia import Servidor, cuerpos_sinteticos
+
+DOMINIO = "127.0.0.1"
+
+
+class PaginasSpider(scrapy.Spider):
+    name = "bench_concurrencia"
+
+    def __init__(self, base, paginas, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.base = base
+        self.paginas = paginas
+        self.respuestas = 0
+
+    async def start(self):
+        for i in range(self.paginas):
+            yield scrapy.Request(f"{self.base}/pagina/{i}")
+
+    def parse(self, response):
+        self.respuestas += 1
+
+
+class Observador:
+    """
+    Mira el status que devolvió la red y el slot del dominio en cada
+    respuesta, antes de que la procesen los middlewares (signal
+    response_downloaded).
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.status = Counter()
+        self.primera = None
+        self.concurrencias = []
+        self.demoras = []
+        crawler.signals.connect(self.descargada, signal=signals.response_downloaded)
+
+    def descargada(self, response, request, spider):
+        self.status[str(response.status)] += 1
+        slot = self.crawler.engine.downloader.slots[request.meta["download_slot"]]
+        if self.primera is None:
+            self.primera = (slot.concurrency, slot.delay)
+        self.concurrencias.append(slot.concurrency)
+        self.demoras.append(slot.delay)
+
+
+def configurar(args, directorio_cache):
+    settings = get_project_settings()
+    settings.set("ITEM_PIPELINES", {})
+    settings.set("CRAWL_INCREMENTAL", False)
+    settings.set("HTTPCACHE_DIR", directorio_cache)
+    settings.set("RETRY_TIMES", 20)
+    settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", 1)
+    settings.set("DOWNLOAD_DELAY", 0.3)
+    settings.set("RANDOMIZE_DOWNLOAD_DELAY", False)
+    settings.set("CONCURRENCIA_DOMINIOS", {
+        DOMINIO: {"inicial": 3, "maximo": args.maximo, "latencia_objetivo": 2.0, "demora_inicial": 0.05},
+    })
+    settings.set("LOG_LEVEL", "WARNING")
+    return settings
+
+
+@defer.inlineCallbacks
+def correr(runner, base, paginas, resultados):
+    from twisted.internet import reactor
+    try:
+        for _ in range(2):
+            crawler = runner.create_crawler(PaginasSpider)
+            observador = Observador(crawler)
+            yield crawler.crawl(base=base, paginas=paginas)
+            resultados.append((crawler, observador))
+    finally:
+        reactor.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paginas", type=int, default=60)
+    parser.add_argument("--latencia", type=float, default=0.05)
+    parser.add_argument("--limite", type=float, default=40, help="pedidos por segundo antes de responder 429")
+    parser.add_argument("--capacidad", type=int, default=8)
+    parser.add_argument("--maximo", type=int, default=16)
+    args = parser.parse_args()
+
+    servidor = Servidor(cuerpos_sinteticos(), args.latencia, args.limite, args.capacidad)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://{DOMINIO}:{servidor.server_address[1]}"
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio_cache:
+        settings = configurar(args, directorio_cache)
+        install_reactor(settings["TWISTED_REACTOR"])
+        from twisted.internet import reactor
+
+        configure_logging(settings)
+        runner = CrawlerRunner(settings)
+        correr(runner, base, args.paginas, resultados)
+        reactor.run()
+    servidor.shutdown()
+    servidor.server_close()
+
+    fallas = []
+
+    def chequear(condicion, mensaje):
+        print(f"  {'ok   ' if condicion else 'FALLA'} {mensaje}")
+        if not condicion:
+            fallas.append(mensaje)
+
+    for n, (crawler, observador) in enumerate(resultados, 1):
+        stats = crawler.stats.get_stats()
+        control = stats.get(f"concurrencia/{DOMINIO}", {})
+        status = dict(observador.status)
+        print(
+            f"crawl {n}: {crawler.spider.respuestas}/{args.paginas} páginas, status {status}, "
+            f"slot inicial {observador.primera}, concurrencia máx {max(observador.concurrencias)}, "
+            f"demora máx {max(observador.demoras):.2f}s, control {control}"
+        )
+        chequear(crawler.spider.respuestas == args.paginas, "bajó todas las páginas")
+        chequear(observador.primera == (3, 0.05), "el primer pedido sale con los límites del dominio (3, 0.05)")
+        chequear(max(observador.concurrencias) > 3, "la concurrencia del slot sube con respuestas sanas")
+        if status.get("429"):
+            chequear(
+                control["errores"].get("429") == status["429"] and max(observador.demoras) > 0.05,
+                "cada 429 llega al control y sube la demora del slot",
+            )
+        if n == 2:
+            revalidadas = stats.get("httpcache/revalidate", 0)
+            chequear(
+                revalidadas == status.get("304") == args.paginas,
+                f"{revalidadas} páginas revalidadas con 304",
+            )
+            chequear(
+                control.get("respuestas") == sum(status.values()),
+                "los 304 llegan al control como respuestas de la red",
+            )
+
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == "__main__":
+    main()
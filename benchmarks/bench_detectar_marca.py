@@ -0,0 +1,97 @@
+"""
+Micro-benchmark de la detección de marca por diccionario (etapas 1 y 2 de
+detectar_marca): la implementación anterior (un re.search por marca y por
+sinónimo) contra el trie cacheado de MatcherMarcas.
+
+Uso:
+    python benchmarks/bench_detectar_marca.py [nombres.txt] [--marcas marcas.txt]
+
+nombres.txt: un nombre de producto por línea (o el CSV de pendientes).
+marcas.txt: una marca por línea, con sinónimos separados por "|".
+Sin archivos usa los nombres de pendientes_revision.csv y un diccionario
+sintético de ~2000 marcas.
+"""
+import argparse
+import csv
+import re
+import time
+
+from _comun import ROOT_PATH
+
+from utils.generar_alias import normalize_text, generar_aliases_basicos
+from utils.matcher_marcas import MatcherMarcas
+
+RUTA_CSV = f"{ROOT_PATH}/scrapers/precios_super/pendientes_revision.csv"
+
+MARCAS_REALES = [
+    "La Serenísima", "Coca-Cola", "Arcor", "Bimbo", "Frutigelati", "Sancor",
+    "Marolio", "Knorr", "Quilmes", "Terrabusi", "Bagley", "Ledesma", "Cada Día",
+]
+
+
+def cargar_nombres(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        if ruta.endswith(".csv"):
+            return [fila["nombre_original"] for fila in csv.DictReader(f) if fila.get("nombre_original")]
+        return [linea.strip() for linea in f if linea.strip()]
+
+
+def cargar_marcas(ruta):
+    if not ruta:
+        marcas = MARCAS_REALES + [f"Marca Sintetica {i}" for i in range(2000)]
+        return [(m, generar_aliases_basicos(m)) for m in marcas]
+
+    marcas = []
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            partes = [p.strip() for p in linea.split("|") if p.strip()]
+            if partes:
+                marcas.append((partes[0], partes[1:]))
+    return marcas
+
+
+def detectar_regex(nombre, marcas):
+    """
+    Implementación anterior de las etapas 1 y 2 de detectar_marca.
+    """
+    nombre_lower = normalize_text(nombre)
+    for marca, _ in marcas:
+        if re.search(rf"\b{re.escape(marca.lower())}\b", nombre_lower):
+            return marca
+    for marca, sinonimos in marcas:
+        for sinonimo in sinonimos:
+            if re.search(rf"\b{re.escape(sinonimo.lower())}\b", nombre_lower):
+                return marca
+    return None
+
+
+def medir(nombre, funcion, nombres):
+    inicio = time.perf_counter()
+    for n in nombres:
+        funcion(n)
+    segundos = time.perf_counter() - inicio
+    print(f"{nombre:<22} {len(nombres) / segundos:>12.0f} nombres/s {segundos * 1e6 / len(nombres):>10.1f} us/nombre")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("nombres", nargs="?", default=RUTA_CSV)
+    parser.add_argument("--marcas")
+    parser.add_argument("--minimo", type=int, default=3000, help="repite los nombres hasta llegar a este total")
+    args = parser.parse_args()
+
+    nombres = cargar_nombres(args.nombres)
+    while len(nombres) < args.minimo:
+        nombres = nombres * 2
+    marcas = cargar_marcas(args.marcas)
+
+    inicio = time.perf_counter()
+    matcher = MatcherMarcas.desde_filas(marcas)
+    print(f"{len(marcas)} marcas, {len(nombres)} nombres. Trie construido en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    medir("regex por marca", lambda n: detectar_regex(n, marcas), nombres)
+    medir("trie cacheado", matcher.buscar, nombres)
+
+
+if __name__ == "__main__":
+    main()
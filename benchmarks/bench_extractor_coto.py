@@ -0,0 +1,258 @@
+"""
+Extractor de atributos de Coto: paridad y throughput (productos/s) del
+extractor iterativo con políticas de precio (coto_parser) contra los dos
+caminos anteriores, copiados acá tal como estaban:
+
+- el parser anterior: recorrido recursivo de todo el árbol (también dentro
+  de los productos) y compute_price con promos primero;
+- el precio del spider (_parse_precio_from_attributes): precio activo y de
+  lista primero, promos después.
+
+La política "promocion" tiene que dar lo mismo que el parser anterior y la
+política "lista" lo mismo que el spider. También compara el streaming
+(iter_page) y parse_page, el que usa el spider, con el extractor sobre el
+árbol ya parseado. Sale con código 1 si algo no coincide.
+
+Uso:
+    python benchmarks/bench_extractor_coto.py [--fixtures dir] [--repeticiones 20]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+from bench_parser_coto import ROOT_PATH, generar_pagina  # noqa: F401 (ROOT_PATH arma el sys.path)
+
+import coto_parser
+from coto_parser import extract_products_from_root, first_value, parse_page
+
+
+# ---------------------------------------------------------------------- #
+# Caminos anteriores (copias congeladas)
+# ---------------------------------------------------------------------- #
+
+def _extract_number_viejo(s):
+    if s is None:
+        return None
+    m = re.search(r"[0-9][0-9.,]*", str(s))
+    if not m:
+        return None
+    num_str = m.group(0)
+    if "." in num_str and "," in num_str:
+        num_str = num_str.replace(".", "").replace(",", ".")
+    elif "," in num_str:
+        num_str = num_str.replace(",", ".")
+    try:
+        return float(num_str)
+    except ValueError:
+        return None
+
+
+def _descuento_viejo(attrs, first):
+    for key in coto_parser.CLAVES_DESCUENTO:
+        raw = first(attrs, key)
+        if not raw or raw == "[]":
+            continue
+        try:
+            arr = json.loads(raw) if isinstance(raw, str) else raw
+        except Exception:
+            continue
+        if not isinstance(arr, list) or not arr:
+            continue
+        desc = arr[0]
+        for campo in ("precioDescuento", "precioRegular", "textoPrecioRegular"):
+            val = desc.get(campo)
+            if val:
+                num = _extract_number_viejo(val)
+                if num is not None:
+                    return num
+    return None
+
+
+def _dto_viejo(raw, campos):
+    try:
+        obj = json.loads(raw) if isinstance(raw, str) else raw
+        if isinstance(obj, dict):
+            for campo in campos:
+                val = obj.get(campo)
+                if val is None:
+                    continue
+                if isinstance(val, (int, float)):
+                    return float(val)
+                num = _extract_number_viejo(val)
+                if num is not None:
+                    return num
+    except Exception:
+        pass
+    return None
+
+
+def _escalar_viejo(val):
+    if isinstance(val, (int, float)):
+        return float(val)
+    return _extract_number_viejo(val)
+
+
+def compute_price_parser_viejo(attrs):
+    """compute_price del parser anterior: promos > activePrice > dtoPrice > referencePrice."""
+    num = _descuento_viejo(attrs, first_value)
+    if num is not None:
+        return num
+    val = first_value(attrs, "sku.activePrice")
+    if val is not None:
+        num = _escalar_viejo(val)
+        if num is not None:
+            return num
+    raw = first_value(attrs, "sku.dtoPrice")
+    if raw:
+        num = _dto_viejo(raw, ("precio", "precioLista"))
+        if num is not None:
+            return num
+    val = first_value(attrs, "sku.referencePrice")
+    if val is not None:
+        return _escalar_viejo(val)
+    return None
+
+
+def _first_spider(attrs, key):
+    value = attrs.get(key)
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def precio_spider_viejo(attrs):
+    """_parse_precio_from_attributes del spider: activePrice > dtoPrice (lista) > promos > referencePrice > PrecioLista."""
+    val = _first_spider(attrs, "sku.activePrice")
+    if val:
+        num = _escalar_viejo(val)
+        if num is not None:
+            return num
+    raw = _first_spider(attrs, "sku.dtoPrice")
+    if raw:
+        num = _dto_viejo(raw, ("precioLista", "precio"))
+        if num is not None:
+            return num
+    num = _descuento_viejo(attrs, lambda a, k: _first_spider(a, k))
+    if num is not None:
+        return num
+    for key in ("sku.referencePrice", "product.PrecioLista", "product.precioLista"):
+        val = _first_spider(attrs, key)
+        if val:
+            num = _escalar_viejo(val)
+            if num is not None:
+                return num
+    return None
+
+
+def extraer_viejo(root, precio):
+    """Recorrido recursivo anterior: mira 'attributes' en todos los nodos."""
+    productos = []
+
+    def _walk(node):
+        if isinstance(node, dict):
+            attrs = node.get("attributes")
+            if (
+                isinstance(attrs, dict)
+                and "product.displayName" in attrs
+                and ("product.MARCA" in attrs or "product.brand" in attrs)
+            ):
+                categoria = first_value(attrs, "parentCategory.displayName")
+                if categoria is None:
+                    anc = attrs.get("allAncestors.displayName")
+                    if isinstance(anc, list) and anc:
+                        categoria = anc[-1]
+                productos.append({
+                    "categoria": categoria,
+                    "nombre": first_value(attrs, "product.displayName", ""),
+                    "precio": precio(attrs),
+                    "marca": first_value(attrs, "product.MARCA") or first_value(attrs, "product.brand"),
+                    "product_id": first_value(attrs, "product.repositoryId"),
+                    "ean": first_value(attrs, "product.eanPrincipal"),
+                    "url": (
+                        first_value(attrs, "product.url")
+                        or first_value(attrs, "sku.url")
+                        or first_value(attrs, "product.baseUrl")
+                    ),
+                })
+            for v in node.values():
+                _walk(v)
+        elif isinstance(node, list):
+            for item in node:
+                _walk(item)
+
+    _walk(root)
+    return productos
+
+
+# ---------------------------------------------------------------------- #
+
+def paridad(ruta, body):
+    """Lista de diferencias entre los caminos nuevos y los anteriores."""
+    root = json.loads(body)
+    errores = []
+    casos = (
+        ("promocion", compute_price_parser_viejo, "parser anterior"),
+        ("lista", precio_spider_viejo, "precio del spider"),
+    )
+    for politica, precio_viejo, nombre in casos:
+        nuevos = extract_products_from_root(root, politica)
+        viejos = extraer_viejo(root, precio_viejo)
+        if nuevos != viejos:
+            distintos = sum(a != b for a, b in zip(nuevos, viejos)) + abs(len(nuevos) - len(viejos))
+            errores.append(f"{ruta}: política {politica!r} difiere del {nombre} en {distintos} productos")
+        for umbral, nombre_camino in ((0, "el streaming"), (coto_parser.UMBRAL_STREAMING, "parse_page")):
+            productos, _ = parse_page(body, politica, umbral)
+            if productos != nuevos:
+                errores.append(f"{ruta}: {nombre_camino} con política {politica!r} difiere del extractor iterativo")
+    return errores
+
+
+def productos_por_segundo(funcion, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        cantidad = len(funcion())
+    return cantidad * repeticiones / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", default=None, help="directorio con páginas *.json guardadas")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        paginas = []
+        for ruta in sorted(glob.glob(os.path.join(args.fixtures, "*.json"))):
+            with open(ruta, "rb") as f:
+                paginas.append((os.path.basename(ruta), f.read()))
+    else:
+        paginas = [
+            (f"sintetica_{productos:03d}", json.dumps(generar_pagina(productos, 1000, semilla=n)).encode("utf-8"))
+            for n, productos in enumerate((24, 48, 96))
+        ]
+
+    errores = []
+    for ruta, body in paginas:
+        errores.extend(paridad(ruta, body))
+    for error in errores:
+        print(f"[ERROR] {error}")
+    print(f"paridad: {len(paginas)} páginas, {'OK' if not errores else f'{len(errores)} diferencias'}")
+
+    print(f"{'página':<28} {'recursivo p/s':>14} {'iterativo p/s':>14} {'stream p/s':>12} {'parse_page p/s':>15}")
+    for ruta, body in paginas:
+        root = json.loads(body)
+        recursivo = productos_por_segundo(lambda: extraer_viejo(root, compute_price_parser_viejo), args.repeticiones)
+        iterativo = productos_por_segundo(lambda: extract_products_from_root(root), args.repeticiones)
+        stream = productos_por_segundo(lambda: parse_page(body, umbral=0)[0], args.repeticiones)
+        completo = productos_por_segundo(lambda: parse_page(body)[0], args.repeticiones)
+        print(f"{ruta:<28} {recursivo:>14,.0f} {iterativo:>14,.0f} {stream:>12,.0f} {completo:>15,.0f}")
+
+    sys.exit(1 if errores else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Historial de precios: filas guardadas y tiempo de consulta en función de la
+cantidad de crawls, con el historial viejo (una fila de precio_producto por
+crawl) contra el historial por tramos (intervalo_precio).
+
+Simula `--productos` productos en super con un crawl diario durante
+`--dias` días, donde cada precio cambia con probabilidad `--cambio` por día.
+Las observaciones se cargan en precio_producto y se pasan a tramos con
+compactar_historial, igual que en una base existente.
+
+Uso:
+    python benchmarks/bench_historial_precios.py [--productos 2000] [--dias 365] [--cambio 0.05]
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from _comun import crear_app_benchmark, cronometro
+
+from extensions import db
+from models import Producto, Supermercado, ProductoSupermercado, PrecioProducto, IntervaloPrecio
+from utils.historial_precios import compactar_historial, precio_en_fecha, registrar_precios, serie_producto
+
+CONSULTAS = 500
+
+
+def poblar(productos, dias, cambio, semilla=0):
+    azar = random.Random(semilla)
+    superm = Supermercado(nombre="Super", url="https://super.example")
+    db.session.add(superm)
+    prods = [Producto(nombre=f"Producto {i}") for i in range(productos)]
+    db.session.add_all(prods)
+    db.session.flush()
+
+    ps = [ProductoSupermercado(producto_id=p.id, supermercado_id=superm.id) for p in prods]
+    db.session.add_all(ps)
+    db.session.flush()
+
+    inicio = date.today() - timedelta(days=dias)
+    precios = {fila.id: 100.0 for fila in ps}
+    for d in range(dias):
+        fecha = inicio + timedelta(days=d)
+        filas = []
+        for ps_id in precios:
+            if azar.random() < cambio:
+                precios[ps_id] = round(precios[ps_id] * azar.uniform(0.9, 1.2), 2)
+            filas.append({"producto_supermercado_id": ps_id, "precio": precios[ps_id], "moneda": "ARS", "fecha": fecha})
+        db.session.execute(db.insert(PrecioProducto), filas)
+    db.session.commit()
+    return [fila.id for fila in ps], [p.id for p in prods], inicio
+
+
+def contar(modelo):
+    return db.session.execute(db.select(db.func.count()).select_from(modelo)).scalar_one()
+
+
+def medir_consultas(ps_ids, producto_ids, inicio, dias, azar):
+    """
+    Latencia media (ms) de "precio en fecha D" y "serie del producto P" sobre
+    el historial por tramos, y de "precio en fecha D" sobre el viejo.
+    """
+    fechas = [inicio + timedelta(days=azar.randrange(dias)) for _ in range(CONSULTAS)]
+    elegidos = [azar.choice(ps_ids) for _ in range(CONSULTAS)]
+
+    tiempos = {}
+    with cronometro(tiempos, "viejo"):
+        for ps_id, fecha in zip(elegidos, fechas):
+            db.session.execute(
+                db.select(PrecioProducto.precio)
+                .where(PrecioProducto.producto_supermercado_id == ps_id, PrecioProducto.fecha <= fecha)
+                .order_by(PrecioProducto.fecha.desc())
+                .limit(1)
+            ).first()
+    with cronometro(tiempos, "tramos"):
+        for ps_id, fecha in zip(elegidos, fechas):
+            precio_en_fecha(ps_id, fecha)
+    with cronometro(tiempos, "serie"):
+        for _ in range(CONSULTAS):
+            serie_producto(azar.choice(producto_ids))
+    return {nombre: ms / CONSULTAS for nombre, ms in tiempos.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--productos", type=int, default=2_000)
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--cambio", type=float, default=0.05, help="probabilidad diaria de cambio de precio")
+    args = parser.parse_args()
+
+    app = crear_app_benchmark()
+    azar = random.Random(1)
+    with app.app_context():
+        ps_ids, producto_ids, inicio = poblar(args.productos, args.dias, args.cambio)
+        filas_viejas = contar(PrecioProducto)
+
+        t = time.perf_counter()
+        compactar_historial()
+        segundos = time.perf_counter() - t
+        tramos = contar(IntervaloPrecio)
+
+        print(f"precio_producto:  {filas_viejas:>10} filas ({args.dias} crawls)")
+        print(f"intervalo_precio: {tramos:>10} filas ({filas_viejas / max(tramos, 1):.1f}x menos)")
+        print(f"compactación:     {segundos:>10.2f} s ({filas_viejas / segundos:,.0f} filas/s)")
+
+        ms = medir_consultas(ps_ids, producto_ids, inicio, args.dias, azar)
+        print(f"precio en fecha:  viejo {ms['viejo']:.3f} ms   tramos {ms['tramos']:.3f} ms")
+        print(f"serie producto:   {ms['serie']:.3f} ms")
+
+        # Un crawl más sin cambios no agrega filas: solo corre `hasta`
+        hoy = date.today()
+        t = time.perf_counter()
+        ultimos = db.session.execute(
+            db.select(IntervaloPrecio.producto_supermercado_id, IntervaloPrecio.precio, IntervaloPrecio.moneda)
+            .where(IntervaloPrecio.hasta == inicio + timedelta(days=args.dias - 1))
+        ).all()
+        registrar_precios([(ps_id, precio, moneda, hoy) for ps_id, precio, moneda in ultimos])
+        db.session.commit()
+        print(
+            f"crawl sin cambios: {len(ultimos)} precios en {(time.perf_counter() - t) * 1000:.1f} ms, "
+            f"intervalo_precio sigue en {contar(IntervaloPrecio)} filas"
+        )
+
+
+if __name__ == "__main__":
+    main()
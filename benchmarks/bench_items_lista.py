@@ -0,0 +1,53 @@
+"""
+Render del parcial de ítems (partials/items_lista.html) para listas de
+distinto largo: cantidad de consultas y latencia.
+
+Verifica que la cantidad de consultas no crezca con el largo de la lista
+(sin N+1) y que el total estimado sea la suma de los mejores precios.
+
+Uso:
+    python benchmarks/bench_items_lista.py
+"""
+from _comun import crear_app_benchmark, ContadorConsultas, cronometro
+from bench_comparar import poblar, PRECIOS_POR_PRODUCTO
+
+from extensions import db
+from utils.cache import invalidar_lista
+
+TAMANIOS_LISTA = [10, 60, 200]
+CANTIDAD_SUPERS = 3
+
+# Lista (PK) + ítems con productos y mejor precio (1) + versión de precios para la cache
+MAXIMO_CONSULTAS = 3
+
+
+def main():
+    print(f"{'items':>6} {'consultas':>10} {'ms':>10} {'total':>12}")
+    for n_items in TAMANIOS_LISTA:
+        app = crear_app_benchmark()
+        with app.app_context():
+            lista_id = poblar(n_items, CANTIDAD_SUPERS)
+        cliente = app.test_client()
+
+        # La cache de vistas es del proceso: que cada app mida el render y
+        # no un fragmento que haya quedado de la anterior
+        invalidar_lista(lista_id)
+
+        with app.app_context():
+            medicion = {}
+            with ContadorConsultas(db.engine) as contador, cronometro(medicion):
+                # agregar/quitar terminan en este mismo render; sin producto_id
+                # agregar_item solo re-renderiza la lista
+                respuesta = cliente.post(f"/listas/{lista_id}/agregar", data={"producto_id": ""})
+            assert respuesta.status_code == 200
+
+            # Precio más barato de cada producto = el último cargado por poblar(), x2 unidades
+            esperado = n_items * 2 * (100.0 + PRECIOS_POR_PRODUCTO - 1)
+            assert f"{esperado:.2f}" in respuesta.get_data(as_text=True), "total estimado incorrecto"
+            assert contador.total <= MAXIMO_CONSULTAS, f"{contador.total} consultas para {n_items} ítems"
+
+            print(f"{n_items:>6} {contador.total:>10} {medicion['ms']:>10.2f} {esperado:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Latencia de lectura de la web mientras un crawl escribe en la misma base
+SQLite, para cada perfil de conexión:
+
+  - default:            PRAGMAs de fábrica (journal DELETE)
+  - produccion:         WAL + synchronous=NORMAL + busy_timeout + mmap/cache
+  - produccion+lectura: lo anterior + pool de solo lectura para los GET
+
+Un proceso aparte simula el pipeline: registra precios en lotes con un commit
+cada `--lote` filas. Mientras tanto varios hilos arman la comparación de una
+lista como un GET de la web (sin pasar por la cache de vistas, para medir la base).
+
+Uso:
+    python benchmarks/bench_lectura_concurrente.py [--lectores 4] [--segundos 10]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from _comun import crear_app_benchmark
+from bench_autocompletar import percentiles
+from bench_comparar import poblar
+
+from utils.supermercado import armar_listado_supermercados, calcular_super_mas_barato
+
+PERFILES = {
+    "default": {"SQLITE_PERFIL": "default"},
+    "produccion": {"SQLITE_PERFIL": "produccion"},
+    "produccion+lectura": {"SQLITE_PERFIL": "produccion", "DB_SOLO_LECTURA": True},
+}
+
+
+def escritor(uri, perfil, lote, parar):
+    """
+    Simula un crawl: registra precios para todos los ProductoSupermercado, en lotes.
+    """
+    from datetime import date
+    from extensions import db
+    from models import ProductoSupermercado
+    from utils.historial_precios import registrar_precios
+    from utils.precios import actualizar_precios_actuales
+
+    # Abre la base que pobló main(): sin limpiar=False la vaciaría
+    app = crear_app_benchmark(uri, PERFILES[perfil], limpiar=False)
+    with app.app_context():
+        ps_ids = db.session.execute(db.select(ProductoSupermercado.id)).scalars().all()
+        i = 0
+        while not parar.is_set():
+            precios = [
+                (ps_ids[(i + j) % len(ps_ids)], 100.0 + i + j, "ARS", date.today())
+                for j in range(lote)
+            ]
+            registrar_precios(precios)
+            actualizar_precios_actuales(precios)
+            db.session.commit()
+            i += lote
+
+
+def medir(uri, perfil, lista_id, lectores, segundos, lote):
+    app = crear_app_benchmark(uri, PERFILES[perfil], limpiar=False)
+    url = f"/lista/{lista_id}/comparar"
+
+    parar = multiprocessing.Event()
+    proceso = multiprocessing.Process(target=escritor, args=(uri, perfil, lote, parar))
+    proceso.start()
+    time.sleep(0.5)
+
+    tiempos, errores = [], []
+    fin = time.monotonic() + segundos
+
+    def leer():
+        while time.monotonic() < fin:
+            # Mismo camino que un GET: before_request elige el pool de lectura
+            with app.test_request_context(url, method="GET"):
+                app.preprocess_request()
+                inicio = time.perf_counter()
+                try:
+                    calcular_super_mas_barato(armar_listado_supermercados(lista_id))
+                except OperationalError as e:  # "database is locked"
+                    errores.append(str(e.orig))
+                    continue
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    hilos = [threading.Thread(target=leer) for _ in range(lectores)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    parar.set()
+    proceso.join()
+
+    if tiempos:
+        p50, p99 = percentiles(tiempos)
+        print(f"{perfil:<20} lecturas={len(tiempos):>6} errores={len(errores):>4}   p50={p50:8.2f} ms   p99={p99:8.2f} ms")
+    else:
+        print(f"{perfil:<20} sin lecturas exitosas ({len(errores)} errores)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=60)
+    parser.add_argument("--supers", type=int, default=5)
+    parser.add_argument("--lectores", type=int, default=4)
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--lote", type=int, default=200, help="precios por commit del escritor")
+    args = parser.parse_args()
+
+    for perfil in PERFILES:
+        with tempfile.TemporaryDirectory() as directorio:
+            uri = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+            app = crear_app_benchmark(uri, PERFILES[perfil])
+            with app.app_context():
+                lista_id = poblar(args.items, args.supers)
+            medir(uri, perfil, lista_id, args.lectores, args.segundos, args.lote)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Paginado de categorías de Carrefour contra un servidor local que imita la
+API de búsqueda de VTEX (ventanas _from/_to de 50 productos, header
+"resources" con el total, latencia fija). Mide el tiempo total con la misma
+concurrencia para las tres formas de pedir las páginas de una categoría:
+
+- serie: la página N+1 se pide cuando vuelve la N y cada categoría termina
+  con un pedido vacío (el spider anterior);
+- total: con el total del header se piden todas las páginas juntas;
+- especulativo: sin header, lotes de --lote páginas.
+
+Uso:
+    python benchmarks/bench_paginado_carrefour.py [--categorias 10] [--latencia 0.1]
+        [--concurrencia 16] [--lote 4]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TAM_PAGINA = 50
+
+
+class Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, totales, latencia, con_total):
+        super().__init__(("127.0.0.1", 0), Manejador)
+        self.totales = totales
+        self.latencia = latencia
+        self.con_total = con_total
+
+
+class Manejador(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        total = self.server.totales[url.path.strip("/")]
+        args = parse_qs(url.query)
+        desde, hasta = int(args["_from"][0]), int(args["_to"][0])
+        cantidad = max(0, min(hasta + 1, total) - desde)
+        cuerpo = json.dumps([{"productId": str(desde + i)} for i in range(cantidad)]).encode("utf-8")
+
+        time.sleep(self.server.latencia)
+        self.send_response(200)
+        if self.server.con_total:
+            self.send_header("resources", f"{desde}-{hasta}/{total}")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def pedir(url):
+    with urllib.request.urlopen(url, timeout=30) as respuesta:
+        return json.loads(respuesta.read()), respuesta.headers.get("resources")
+
+
+def crawl(base, categorias, concurrencia, siguientes):
+    """
+    Baja las páginas con `concurrencia` pedidos en vuelo. `siguientes(pedido,
+    datos, resources)` devuelve los pedidos (categoría, desde, meta) que
+    genera cada respuesta, como los callbacks del spider.
+    Devuelve (segundos, pedidos, productos).
+    """
+    pendientes = deque((c, 0, {"primera": True}) for c in categorias)
+    en_vuelo = {}
+    pedidos = productos = 0
+    inicio = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        while pendientes or en_vuelo:
+            while pendientes and len(en_vuelo) < concurrencia:
+                pedido = pendientes.popleft()
+                categoria, desde, _ = pedido
+                url = f"{base}/{categoria}?_from={desde}&_to={desde + TAM_PAGINA - 1}"
+                en_vuelo[pool.submit(pedir, url)] = pedido
+                pedidos += 1
+            listos, _ = wait(list(en_vuelo), return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                pedido = en_vuelo.pop(futuro)
+                datos, resources = futuro.result()
+                productos += len(datos)
+                pendientes.extend(siguientes(pedido, datos, resources))
+    return time.monotonic() - inicio, pedidos, productos
+
+
+def en_serie(pedido, datos, resources):
+    categoria, desde, _ = pedido
+    return [(categoria, desde + TAM_PAGINA, {})] if datos else []
+
+
+def con_total(pedido, datos, resources):
+    categoria, desde, meta = pedido
+    if not meta.get("primera") or len(datos) < TAM_PAGINA:
+        return []
+    total = int(resources.rsplit("/", 1)[1])
+    return [(categoria, d, {}) for d in range(desde + TAM_PAGINA, total, TAM_PAGINA)]
+
+
+def especulativo(lote):
+    def siguientes(pedido, datos, resources):
+        categoria, desde, meta = pedido
+        if not (meta.get("primera") or meta.get("fin_lote")) or len(datos) < TAM_PAGINA:
+            return []
+        inicios = [desde + TAM_PAGINA * (i + 1) for i in range(lote)]
+        return [(categoria, d, {"fin_lote": d == inicios[-1]}) for d in inicios]
+    return siguientes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--categorias", type=int, default=10)
+    parser.add_argument("--max-productos", type=int, default=2500, help="productos de la categoría más grande")
+    parser.add_argument("--latencia", type=float, default=0.1)
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--lote", type=int, default=4)
+    args = parser.parse_args()
+
+    azar = random.Random(0)
+    totales = {f"cat{i}": azar.randint(1, args.max_productos) for i in range(args.categorias)}
+    paginas = sum(-(-t // TAM_PAGINA) for t in totales.values())
+    print(
+        f"{args.categorias} categorías, {sum(totales.values())} productos en {paginas} páginas, "
+        f"latencia {args.latencia}s, concurrencia {args.concurrencia}"
+    )
+
+    estrategias = (
+        ("serie", en_serie, False),
+        ("total (header resources)", con_total, True),
+        (f"especulativo (lote {args.lote})", especulativo(args.lote), False),
+    )
+    print(f"{'estrategia':<28} {'seg':>7} {'pedidos':>8} {'vacíos':>7} {'productos':>10}")
+    for nombre, siguientes, header in estrategias:
+        servidor = Servidor(totales, args.latencia, header)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        try:
+            segundos, pedidos, productos = crawl(
+                f"http://127.0.0.1:{servidor.server_address[1]}", list(totales), args.concurrencia, siguientes
+            )
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+        assert productos == sum(totales.values()), f"{nombre}: faltan productos"
+        print(f"{nombre:<28} {segundos:>7.2f} {pedidos:>8} {pedidos - paginas:>7} {productos:>10}")
+    print(f"cota por concurrencia: {paginas * args.latencia / args.concurrencia:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
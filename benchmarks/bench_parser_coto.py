@@ -0,0 +1,169 @@
+"""
+Parseo de páginas de categoría de Coto: tiempo y pico de memoria por página
+del camino anterior (response.text + json.loads + dos recorridos del árbol),
+del streaming de coto_parser.iter_page sobre los bytes y de parse_page, que
+usa uno u otro según coto_parser.UMBRAL_STREAMING.
+
+Usa las páginas guardadas en --fixtures (archivos *.json, por ejemplo las
+que guarda el spider con -s COTO_GUARDAR_PAGINAS=dir). Sin --fixtures
+genera páginas sintéticas con la forma del JSON de Endeca, de los tamaños
+de una página normal (24-96 productos) y una por encima del umbral.
+
+Uso:
+    python benchmarks/bench_parser_coto.py [--fixtures dir] [--repeticiones 20]
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# No necesita la app ni la base: solo el parser del proyecto de Scrapy
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT_PATH, "scrapers", "precios_super"))
+
+import coto_parser
+from coto_parser import extract_products_from_root, find_results_list, parse_page
+
+# Productos por página sintética: la última pasa UMBRAL_STREAMING
+PRODUCTOS_SINTETICAS = (24, 48, 96, 1200)
+
+
+def generar_pagina(productos, total, semilla=0):
+    """
+    Página sintética: Category_ResultsList con `productos` records, cada uno
+    con sus atributos de producto y un record hijo de SKU.
+    """
+    azar = random.Random(semilla)
+    records = []
+    for i in range(productos):
+        precio = round(azar.uniform(500, 30000), 2)
+        atributos = {
+            "product.displayName": [f"Producto de prueba {semilla}-{i} x 500 gr"],
+            "product.MARCA": [azar.choice(["ARCOR", "LA SERENISIMA", "COTO", "MOLTO"])],
+            "product.repositoryId": [f"prod{semilla:03d}{i:05d}"],
+            "product.eanPrincipal": [str(7790000000000 + i)],
+            "parentCategory.displayName": ["Almacén"],
+            "allAncestors.displayName": ["Catálogo", "Almacén", "Desayuno"],
+            "product.url": [f"/sitios/cdigi/productos/prod{i}"],
+            "product.dtoDescuentos": ["[]"],
+            **{f"product.extra{k}": [f"valor {k} " * 4] for k in range(60)},
+        }
+        # Distintas combinaciones de fuentes de precio, como en las páginas reales
+        variante = i % 8
+        if variante in (0, 1, 5):
+            atributos["sku.activePrice"] = [f"{precio:.6f}"] if variante != 5 else [precio]
+        if variante in (0, 2):
+            atributos["sku.dtoPrice"] = [json.dumps({"precioLista": round(precio * 1.1, 2), "precio": precio})]
+        if variante in (0, 3):
+            atributos["sku.referencePrice"] = [f"Precio Regular: ${precio * 1.2:.0f}"]
+        if variante == 1:
+            atributos["product.dtoDescuentos"] = [json.dumps([{"precioDescuento": f"${precio * 0.5:.2f}c/u"}])]
+        if variante == 4:
+            atributos["product.PrecioLista"] = [f"${precio:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")]
+        if variante == 5:
+            atributos["product.dtoDescuentosTarjeta"] = [json.dumps([{"textoPrecioRegular": f"Precio Contado: ${precio:.0f}"}])]
+        # Precio activo en cero: la política "lista" lo saltea, la "promocion" no
+        if variante in (6, 7):
+            atributos["sku.activePrice"] = [0.0]
+        if variante == 6:
+            atributos["sku.dtoPrice"] = [json.dumps({"precioLista": round(precio * 1.1, 2), "precio": precio})]
+        if variante == 7:
+            atributos["sku.referencePrice"] = [0]
+            atributos["product.precioLista"] = [f"{precio:.2f}"]
+        records.append({
+            "attributes": atributos,
+            "records": [{"attributes": {"sku.repositoryId": [f"sku{i}"], "sku.activePrice": [str(precio)]}}],
+            "detailsAction": {"recordState": f"/productos/prod{i}?format=json", "label": ""},
+        })
+    return {
+        "@type": "Page",
+        "contents": [{
+            "@type": "Category_Page",
+            "Main": [
+                {"@type": "Category_Breadcrumbs", "refinementCrumbs": [{"label": "Almacén"}]},
+                {
+                    "@type": "Category_ResultsList",
+                    "recsPerPage": productos,
+                    "totalNumRecs": total,
+                    "firstRecNum": 1,
+                    "records": records,
+                },
+            ],
+        }],
+    }
+
+
+def camino_anterior(body):
+    texto = body.decode("utf-8").strip()
+    data = json.loads(texto)
+    return extract_products_from_root(data), find_results_list(data)
+
+
+def streaming(body):
+    return parse_page(body, umbral=0)
+
+
+def medir(funcion, body, repeticiones):
+    """
+    (ms promedio, pico de memoria en KiB) de funcion(body).
+    """
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(body)
+    ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+
+    tracemalloc.start()
+    funcion(body)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ms, pico / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", default=None, help="directorio con páginas *.json guardadas")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    if coto_parser.ijson is None:
+        print("[WARN] ijson no está instalado: iter_page usa el parseo completo")
+
+    with tempfile.TemporaryDirectory() as temporal:
+        directorio = args.fixtures
+        if directorio is None:
+            directorio = temporal
+            for n, productos in enumerate(PRODUCTOS_SINTETICAS):
+                with open(os.path.join(directorio, f"sintetica_{productos:04d}.json"), "w", encoding="utf-8") as f:
+                    json.dump(generar_pagina(productos, 1000, semilla=n), f)
+
+        print(
+            f"{'página':<28} {'KiB':>8} {'prods':>6} {'anterior ms':>12} {'KiB pico':>9} "
+            f"{'stream ms':>10} {'KiB pico':>9} {'parse_page ms':>14} {'KiB pico':>9}"
+        )
+        for ruta in sorted(glob.glob(os.path.join(directorio, "*.json"))):
+            with open(ruta, "rb") as f:
+                body = f.read()
+
+            anteriores, paginado_anterior = camino_anterior(body)
+            for funcion in (streaming, parse_page):
+                productos, paginado = funcion(body)
+                assert productos == anteriores, f"{ruta}: los productos de {funcion.__name__} no coinciden"
+                assert (paginado or {}).get("totalNumRecs") == (paginado_anterior or {}).get("totalNumRecs")
+
+            ms_anterior, pico_anterior = medir(camino_anterior, body, args.repeticiones)
+            ms_stream, pico_stream = medir(streaming, body, args.repeticiones)
+            ms_parse, pico_parse = medir(parse_page, body, args.repeticiones)
+            print(
+                f"{os.path.basename(ruta):<28} {len(body) / 1024:>8.0f} {len(productos):>6} "
+                f"{ms_anterior:>12.2f} {pico_anterior:>9.0f} {ms_stream:>10.2f} {pico_stream:>9.0f} "
+                f"{ms_parse:>14.2f} {pico_parse:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Chequeo de regresión con EXPLAIN: cada consulta de los caminos calientes
+(pipeline, comparación y lista) tiene que resolverse con un índice, sin
+recorrer la tabla completa.
+
+Corre contra una base SQLite en memoria creada con create_all, o contra la
+URI que se pase (por ejemplo, una copia de la base real ya migrada; no se
+borra nada). En PostgreSQL se desactiva el seq scan para que el plan muestre
+si hay índice usable aunque las tablas sean chicas.
+
+Sale con código 1 si alguna consulta hace un recorrido completo.
+
+Uso:
+    python benchmarks/explicar_consultas.py [--uri sqlite:///super_app.db]
+"""
+import argparse
+import re
+import sys
+from datetime import date, timedelta
+
+from _comun import crear_app_benchmark
+
+from extensions import db
+from models import Marca, MarcaSinonimo, Supermercado, ProductoSupermercado, IntervaloPrecio, ItemListaCompra
+
+TABLAS = {"marca", "marca_sinonimo", "supermercado", "producto_supermercado", "intervalo_precio", "item_lista_compra"}
+
+RECORRIDOS = {
+    "sqlite": re.compile(r"^SCAN (\w+)"),
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+}
+
+
+def consultas_calientes():
+    hoy = date.today()
+    return {
+        "producto_supermercado por (producto, super)": db.select(ProductoSupermercado.id).where(
+            ProductoSupermercado.producto_id == 1, ProductoSupermercado.supermercado_id == 1
+        ),
+        "producto_supermercado por super y producto_id IN (escritura por lotes)": db.select(
+            ProductoSupermercado.id, ProductoSupermercado.producto_id
+        ).where(
+            ProductoSupermercado.supermercado_id == 1, ProductoSupermercado.producto_id.in_([1, 2, 3])
+        ),
+        "producto_supermercado por (super, código externo) (crawl incremental)": db.select(
+            ProductoSupermercado.id, ProductoSupermercado.huella
+        ).where(
+            ProductoSupermercado.supermercado_id == 1, ProductoSupermercado.codigo_externo.in_(["100", "200"])
+        ),
+        "producto_supermercado por producto_id IN": db.select(ProductoSupermercado).where(
+            ProductoSupermercado.producto_id.in_([1, 2, 3])
+        ),
+        "ventana de min/max de precios": db.select(
+            db.func.min(IntervaloPrecio.precio), db.func.max(IntervaloPrecio.precio)
+        ).where(
+            IntervaloPrecio.producto_supermercado_id == 1,
+            IntervaloPrecio.hasta >= hoy - timedelta(days=30),
+            IntervaloPrecio.desde <= hoy,
+        ),
+        "precio en fecha (precio_en_fecha)": db.select(IntervaloPrecio.precio)
+        .where(IntervaloPrecio.producto_supermercado_id == 1, IntervaloPrecio.desde <= hoy)
+        .order_by(IntervaloPrecio.desde.desc())
+        .limit(1),
+        "ítems de una lista": db.select(ItemListaCompra).where(ItemListaCompra.lista_compra_id == 1),
+        "ítem por (lista, producto)": db.select(ItemListaCompra.id).where(
+            ItemListaCompra.lista_compra_id == 1, ItemListaCompra.producto_id == 1
+        ),
+        "supermercado por nombre": db.select(Supermercado.id).where(Supermercado.nombre == "Coto"),
+        "marca por nombre": db.select(Marca.id).where(Marca.nombre == "Arcor"),
+        "marcas por alias (resolver_aliases)": db.select(MarcaSinonimo.alias, Marca.id, Marca.nombre)
+        .join(Marca, Marca.id == MarcaSinonimo.marca_id)
+        .where(MarcaSinonimo.alias.in_(["arcor", "la serenisima", "coca cola"])),
+    }
+
+
+def plan(sentencia):
+    """
+    Devuelve las líneas del plan de ejecución de una sentencia.
+    """
+    dialecto = db.engine.dialect
+    compilada = sentencia.compile(dialect=dialecto, compile_kwargs={"render_postcompile": True})
+    if compilada.positiontup:
+        parametros = tuple(compilada.params[nombre] for nombre in compilada.positiontup)
+    else:
+        parametros = compilada.params
+
+    with db.engine.connect() as conn:
+        if dialecto.name == "sqlite":
+            prefijo = "EXPLAIN QUERY PLAN "
+        else:
+            conn.exec_driver_sql("SET enable_seqscan = off")
+            prefijo = "EXPLAIN "
+        filas = conn.exec_driver_sql(prefijo + str(compilada), parametros).all()
+    # SQLite: (id, padre, -, detalle); PostgreSQL: (línea,)
+    return [str(fila[-1]) for fila in filas]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default=None)
+    args = parser.parse_args()
+
+    app = crear_app_benchmark(args.uri, limpiar=False)
+    fallas = 0
+    with app.app_context():
+        recorrido = RECORRIDOS[db.engine.dialect.name]
+        for nombre, sentencia in consultas_calientes().items():
+            lineas = plan(sentencia)
+            completas = [
+                linea for linea in lineas
+                if (m := recorrido.search(linea.strip())) and m.group(1) in TABLAS
+            ]
+            estado = "FALLA" if completas else "ok"
+            fallas += bool(completas)
+            print(f"[{estado:>5}] {nombre}")
+            for linea in lineas:
+                print(f"         {linea}")
+
+    if fallas:
+        print(f"\n{fallas} consulta(s) recorren la tabla completa")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
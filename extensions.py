@@ -1,4 +1,141 @@
 # extensions.py
+import os
+from flask import current_app, g, request
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, Select
 
-db = SQLAlchemy()
\ No newline at end of file
+# Perfiles de PRAGMAs para SQLite. Se elige con SQLITE_PERFIL
+# (env CARRITO_SQLITE_PERFIL) y se puede pisar cada valor con SQLITE_PRAGMAS.
+PERFILES_SQLITE = {
+    # Lo que trae SQLite: journal DELETE, sync FULL, sin esperas por locks
+    "default": {},
+    # Lectores y un escritor (el crawl) a la vez sin "database is locked"
+    "produccion": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,            # ms esperando un lock antes de fallar
+        "cache_size": -65536,            # negativo = KiB (64 MiB por conexión)
+        "mmap_size": 268435456,          # 256 MiB leídos vía mmap
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+}
+
+
+def url_base_de_datos(predeterminada="sqlite:///super_app.db"):
+    """
+    URL de la base según DATABASE_URL (si no está definida, el SQLite local).
+    Acepta el esquema viejo postgres:// que usan algunos proveedores.
+    """
+    url = os.environ.get("DATABASE_URL", predeterminada)
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def opciones_pool(config):
+    """
+    Opciones del pool de conexiones para motores cliente/servidor (PostgreSQL).
+    SQLite usa las opciones por defecto de SQLAlchemy.
+    """
+    if config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": config.get("DB_POOL_SIZE", 10),
+        "max_overflow": config.get("DB_POOL_OVERFLOW", 20),
+        "pool_timeout": config.get("DB_POOL_TIMEOUT", 30),
+        # Descarta conexiones cortadas (reinicio del server, timeouts de red)
+        "pool_pre_ping": True,
+        # Renueva conexiones viejas antes de que las corte un proxy/firewall
+        "pool_recycle": config.get("DB_POOL_RECYCLE", 1800),
+    }
+
+
+def pragmas_configurados(config):
+    """
+    PRAGMAs a aplicar según la configuración de la app.
+    """
+    perfil = config.get("SQLITE_PERFIL", "default")
+    if perfil not in PERFILES_SQLITE:
+        raise ValueError(f"Perfil de SQLite desconocido: {perfil!r} (opciones: {', '.join(PERFILES_SQLITE)})")
+    return {**PERFILES_SQLITE[perfil], **config.get("SQLITE_PRAGMAS", {})}
+
+
+def aplicar_pragmas(engine, pragmas):
+    """
+    Registra un hook que corre los PRAGMAs en cada conexión nueva del engine.
+    """
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _al_conectar(conexion_dbapi, _registro):
+        cursor = conexion_dbapi.cursor()
+        for nombre, valor in pragmas.items():
+            cursor.execute(f"PRAGMA {nombre}={valor}")
+        cursor.close()
+
+
+def crear_engine_lectura(engine, pragmas, config):
+    """
+    Engine aparte, de solo lectura, sobre el mismo archivo SQLite.
+    Las lecturas de la web no compiten por el pool del escritor y SQLite
+    rechaza cualquier escritura que se cuele por este camino.
+    En otros motores usa DATABASE_URL_LECTURA (por ejemplo, una réplica).
+    """
+    if config.get("DATABASE_URL_LECTURA"):
+        return create_engine(config["DATABASE_URL_LECTURA"], **opciones_pool(config))
+
+    if engine.dialect.name != "sqlite" or not engine.url.database or engine.url.database == ":memory:":
+        raise ValueError("El pool de solo lectura necesita una base SQLite en archivo")
+
+    lectura = create_engine(
+        f"sqlite:///file:{engine.url.database}?mode=ro&uri=true",
+        connect_args={"check_same_thread": False},
+    )
+    # journal_mode no se puede cambiar en modo solo lectura (lo fija el escritor)
+    aplicar_pragmas(lectura, {
+        **{k: v for k, v in pragmas.items() if k != "journal_mode"},
+        "query_only": "ON",
+    })
+    return lectura
+
+
+class SesionLecturaEscritura(Session):
+    """
+    Sesión que, dentro de un request marcado como de solo lectura
+    (g.solo_lectura), manda los SELECT al engine de lectura. Los flush y
+    cualquier otra sentencia siguen yendo al engine principal.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and isinstance(clause, Select) and g and g.get("solo_lectura"):
+            lectura = current_app.extensions.get("db_lectura")
+            if lectura is not None:
+                return lectura
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": SesionLecturaEscritura})
+
+
+def configurar_db(app):
+    """
+    Inicializa `db` en la app con el pool configurado y aplica el perfil de
+    SQLite. Con DB_SOLO_LECTURA activo, los GET de la web leen por un pool aparte.
+    """
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", opciones_pool(app.config))
+    db.init_app(app)
+    pragmas = pragmas_configurados(app.config)
+
+    with app.app_context():
+        engine = db.engine
+        aplicar_pragmas(engine, pragmas)
+        if app.config.get("DB_SOLO_LECTURA"):
+            app.extensions["db_lectura"] = crear_engine_lectura(engine, pragmas, app.config)
+
+    if app.config.get("DB_SOLO_LECTURA"):
+        @app.before_request
+        def _marcar_solo_lectura():
+            g.solo_lectura = request.method in ("GET", "HEAD")
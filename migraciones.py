@@ -0,0 +1,232 @@
+"""
+Migraciones simples del esquema y de datos.
+
+No usamos Alembic: cada paso es idempotente (revisa el esquema antes de
+tocarlo) y se corre desde startDB.py con aplicar_migraciones().
+"""
+from datetime import date
+import uuid
+from sqlalchemy import inspect, null, text
+from extensions import db
+from models import (
+    Producto, Marca, MarcaSinonimo, Supermercado, ProductoSupermercado, PrecioProducto,
+    PrecioActual, ItemListaCompra, ListaCompra,
+)
+from vectores import FORMATO_EMBEDDINGS
+from utils.precios import reconstruir_precios_actuales
+from utils.historial_precios import asegurar_particiones, compactar_historial
+from utils.sinonimos_marca import agregar_sinonimos
+
+
+def _columnas(tabla):
+    return {col["name"] for col in inspect(db.engine).get_columns(tabla)}
+
+
+def agregar_columna(tabla, nombre, tipo, extra=""):
+    """
+    Agrega una columna a una tabla existente si todavía no la tiene.
+    `tipo` es un tipo de SQLAlchemy (se traduce al motor: BLOB / BYTEA, etc.)
+    y `extra` lo que va después (ej: "NOT NULL DEFAULT 0").
+    """
+    if nombre in _columnas(tabla):
+        return False
+    tipo_sql = tipo.compile(dialect=db.engine.dialect)
+    with db.engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo_sql} {extra}".rstrip()))
+    print(f"[MIGRACION] Columna {tabla}.{nombre} agregada")
+    return True
+
+
+def migrar_embeddings_binarios(formato=FORMATO_EMBEDDINGS, lote=500):
+    """
+    Pasa los embeddings guardados como JSON a la columna binaria
+    (embedding_bin + embedding_tag) y vacía la columna JSON.
+    Retorna la cantidad de filas migradas.
+
+    En SQLite el archivo no se achica hasta correr VACUUM.
+    """
+    migradas = 0
+    for modelo in (Producto, Marca):
+        # Paginado por id: cada fila se visita una sola vez aunque quede
+        # con el JSON 'null' de datos viejos
+        ultimo_id = 0
+        while True:
+            filas = (
+                modelo.query
+                .filter(modelo.id > ultimo_id, modelo.embedding.isnot(None), modelo.embedding_bin.is_(None))
+                .order_by(modelo.id.asc())
+                .limit(lote)
+                .all()
+            )
+            if not filas:
+                break
+            ultimo_id = filas[-1].id
+
+            for fila in filas:
+                if fila.embedding:
+                    fila.set_vector(fila.embedding, formato)
+                else:
+                    # JSON vacío ([]) o 'null': no hay nada que migrar
+                    fila.embedding = null()
+                migradas += 1
+
+            db.session.commit()
+            print(f"[MIGRACION] {modelo.__tablename__}: {migradas} embeddings migrados...")
+
+    return migradas
+
+
+def _duplicados(modelo, columnas):
+    """
+    Devuelve {id_que_se_queda: [ids_duplicados]} para las filas que repiten
+    los valores de `columnas`. Se queda la de menor id.
+    """
+    claves = [getattr(modelo, c) for c in columnas]
+    grupos = {}
+    for fila in db.session.execute(db.select(modelo.id, *claves).order_by(modelo.id.asc())):
+        grupos.setdefault(tuple(fila[1:]), []).append(fila[0])
+    return {ids[0]: ids[1:] for ids in grupos.values() if len(ids) > 1}
+
+
+def deduplicar_para_indices_unicos():
+    """
+    Une las filas repetidas que impedirían crear los índices únicos:
+      - supermercados con el mismo nombre,
+      - producto_supermercado con el mismo (producto_id, supermercado_id),
+      - ítems de lista con el mismo (lista_compra_id, producto_id) (se suman cantidades).
+    Las referencias se mueven a la fila que se queda. Retorna la cantidad de filas borradas.
+    """
+    borradas = 0
+
+    for queda, repetidos in _duplicados(Supermercado, ["nombre"]).items():
+        db.session.execute(
+            db.update(ProductoSupermercado)
+            .where(ProductoSupermercado.supermercado_id.in_(repetidos))
+            .values(supermercado_id=queda)
+        )
+        db.session.execute(db.delete(Supermercado).where(Supermercado.id.in_(repetidos)))
+        borradas += len(repetidos)
+
+    # Después de unir supermercados pueden aparecer pares repetidos nuevos
+    duplicados_ps = _duplicados(ProductoSupermercado, ["producto_id", "supermercado_id"])
+    for queda, repetidos in duplicados_ps.items():
+        db.session.execute(
+            db.update(PrecioProducto)
+            .where(PrecioProducto.producto_supermercado_id.in_(repetidos))
+            .values(producto_supermercado_id=queda)
+        )
+        db.session.execute(db.delete(PrecioActual).where(PrecioActual.producto_supermercado_id.in_(repetidos)))
+        db.session.execute(db.delete(ProductoSupermercado).where(ProductoSupermercado.id.in_(repetidos)))
+        borradas += len(repetidos)
+
+    for queda, repetidos in _duplicados(ItemListaCompra, ["lista_compra_id", "producto_id"]).items():
+        total = db.session.execute(
+            db.select(db.func.sum(ItemListaCompra.cantidad))
+            .where(ItemListaCompra.id.in_([queda, *repetidos]))
+        ).scalar_one()
+        db.session.execute(db.update(ItemListaCompra).where(ItemListaCompra.id == queda).values(cantidad=total))
+        db.session.execute(db.delete(ItemListaCompra).where(ItemListaCompra.id.in_(repetidos)))
+        borradas += len(repetidos)
+
+    db.session.commit()
+
+    # Si se movió historial de fila, precio_actual se recalcula después de
+    # compactarlo (ver aplicar_migraciones)
+
+    if borradas:
+        print(f"[MIGRACION] {borradas} filas duplicadas unificadas")
+    return borradas
+
+
+def crear_indices():
+    """
+    Crea los índices declarados en __table_args__ de los modelos que todavía
+    no existen en la base (create_all no los agrega a tablas ya creadas).
+    Si falta algún índice único, antes unifica los duplicados.
+    """
+    dialecto = db.engine.dialect.name
+    faltantes = []
+    for modelo in (Marca, Supermercado, ProductoSupermercado, PrecioProducto, ItemListaCompra):
+        existentes = {ix["name"] for ix in inspect(db.engine).get_indexes(modelo.__tablename__)}
+        for indice in modelo.__table__.indexes:
+            # Los índices propios de PostgreSQL (GIN) no existen en otros motores
+            if indice.kwargs.get("postgresql_using") and dialecto != "postgresql":
+                continue
+            if indice.name not in existentes:
+                faltantes.append(indice)
+
+    if any(ix.unique for ix in faltantes):
+        deduplicar_para_indices_unicos()
+
+    for indice in faltantes:
+        indice.create(db.engine)
+        print(f"[MIGRACION] Índice {indice.name} creado")
+    return len(faltantes)
+
+
+def migrar_sinonimos_marca(lote=500):
+    """
+    Carga la tabla marca_sinonimo a partir de Marca.nombre y Marca.sinonimos
+    (JSON). Solo corre si la tabla está vacía. Si dos marcas comparten un
+    alias se queda la de menor id. Retorna la cantidad de marcas procesadas.
+    """
+    if db.session.execute(db.select(MarcaSinonimo.id).limit(1)).first():
+        return 0
+
+    procesadas = 0
+    ultimo_id = 0
+    while True:
+        marcas = (
+            Marca.query
+            .filter(Marca.id > ultimo_id)
+            .order_by(Marca.id.asc())
+            .limit(lote)
+            .all()
+        )
+        if not marcas:
+            break
+        for marca in marcas:
+            agregar_sinonimos(marca, [])
+        db.session.commit()
+        procesadas += len(marcas)
+        ultimo_id = marcas[-1].id
+        print(f"[MIGRACION] marca_sinonimo: {procesadas} marcas procesadas...")
+
+    return procesadas
+
+
+def completar_tokens_lista():
+    """
+    Asigna un token a las listas creadas antes de la columna token.
+    """
+    listas = ListaCompra.query.filter(ListaCompra.token.is_(None)).all()
+    for lista in listas:
+        lista.token = uuid.uuid4().hex
+    db.session.commit()
+    if listas:
+        print(f"[MIGRACION] lista_compra: {len(listas)} tokens asignados")
+    return len(listas)
+
+
+def aplicar_migraciones():
+    """
+    Corre todas las migraciones pendientes, en orden.
+    """
+    for tabla in ("producto", "marca"):
+        agregar_columna(tabla, "embedding_bin", db.LargeBinary())
+        agregar_columna(tabla, "embedding_tag", db.String(100))
+
+    agregar_columna("lista_compra", "version", db.Integer(), "NOT NULL DEFAULT 0")
+    agregar_columna("lista_compra", "token", db.String(32))
+    agregar_columna("producto_supermercado", "huella", db.String(40))
+    agregar_columna("producto_supermercado", "ultima_vez_visto", db.Date())
+
+    completar_tokens_lista()
+    migrar_embeddings_binarios()
+    crear_indices()
+    migrar_sinonimos_marca()
+
+    asegurar_particiones(date.today())
+    if compactar_historial():
+        # precio_actual y su ventana de min/max salen ahora de intervalo_precio
+        reconstruir_precios_actuales()
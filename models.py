@@ -1,22 +1,84 @@
-from sqlalchemy import Enum
+from sqlalchemy import DDL, Enum, event, null
+from sqlalchemy.dialects.postgresql import JSONB
 from extensions import db 
-from datetime import date
+from datetime import date, datetime
+import uuid
+import numpy as np
+from vectores import codificar, decodificar, FORMATO_EMBEDDINGS
 
-class Producto(db.Model):
+# JSON en SQLite, JSONB (indexable con GIN, operador @>) en PostgreSQL
+JSONVariante = db.JSON().with_variant(JSONB(), "postgresql")
+
+class ConEmbedding:
+    """
+    Columnas y accesores del embedding en formato binario.
+    `embedding` (JSON) queda solo para datos viejos; ver migraciones.py.
+    """
+    # float32/float16/int8 crudos (ver vectores.py): BLOB en SQLite, BYTEA en PostgreSQL
+    embedding_bin = db.Column(db.LargeBinary, nullable=True)
+    embedding_tag = db.Column(db.String(100), nullable=True)
+
+    @property
+    def vector(self):
+        """
+        Embedding como array float32 (vista sin copia del blob cuando es float32).
+        Retorna None si no tiene embedding.
+        """
+        if self.embedding_bin:
+            return decodificar(self.embedding_bin, self.embedding_tag)
+        if self.embedding:
+            return np.asarray(self.embedding, dtype=np.float32)
+        return None
+
+    def set_vector(self, vector, formato=FORMATO_EMBEDDINGS):
+        """
+        Guarda el embedding en binario y limpia la columna JSON vieja.
+        """
+        self.embedding_bin, self.embedding_tag = codificar(vector, formato)
+        # null(): NULL de SQL; None en una columna JSON guarda el JSON 'null'
+        self.embedding = null()
+
+class Producto(ConEmbedding, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
-    embedding = db.Column(db.JSON, nullable=True)
+    embedding = db.Column(JSONVariante, nullable=True)
     marca_id = db.Column(db.Integer, db.ForeignKey("marca.id"), nullable=True)
-    unidad_medida = db.Column(Enum("kg", "litro", "unidad", "gramo", "mililitro"), nullable=True)
+    unidad_medida = db.Column(Enum("kg", "litro", "unidad", "gramo", "mililitro", name="unidad_medida"), nullable=True)
     valor_medida = db.Column(db.Float, nullable=True)
 
-class Marca(db.Model):
+class Marca(ConEmbedding, db.Model):
+    __table_args__ = (
+        db.Index("ix_marca_nombre", "nombre"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
-    sinonimos = db.Column(db.JSON, nullable=True)
-    embedding = db.Column(db.JSON, nullable=True)
+    # Lista para mostrar/editar; las búsquedas van contra MarcaSinonimo
+    sinonimos = db.Column(JSONVariante, nullable=True)
+    embedding = db.Column(JSONVariante, nullable=True)
+
+class MarcaSinonimo(db.Model):
+    """
+    Alias normalizado (generar_alias.normalize_text) -> marca.
+    Resolver una marca es una búsqueda por índice único en lugar de
+    recorrer las listas JSON de Marca.sinonimos. El nombre de cada marca
+    también está cargado como alias.
+    """
+    __tablename__ = "marca_sinonimo"
+    __table_args__ = (
+        db.Index("ux_marca_sinonimo_alias", "alias", unique=True),
+        db.Index("ix_marca_sinonimo_marca", "marca_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    alias = db.Column(db.String(100), nullable=False)
+    marca_id = db.Column(db.Integer, db.ForeignKey("marca.id"), nullable=False)
 
 class Supermercado(db.Model):
+    __table_args__ = (
+        db.Index("ux_supermercado_nombre", "nombre", unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
     url = db.Column(db.String(500), nullable=False)
@@ -25,6 +87,12 @@ class Supermercado(db.Model):
 
 class ProductoSupermercado(db.Model):
     __tablename__ = "producto_supermercado"
+    __table_args__ = (
+        # Un producto aparece una sola vez por super; también sirve para buscar por producto_id
+        db.Index("ux_producto_supermercado", "producto_id", "supermercado_id", unique=True),
+        # Crawl incremental: buscar por el id del producto en el sitio del super
+        db.Index("ix_producto_supermercado_codigo", "supermercado_id", "codigo_externo"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     supermercado_id = db.Column(db.Integer, db.ForeignKey("supermercado.id"), nullable=False)
@@ -34,10 +102,23 @@ class ProductoSupermercado(db.Model):
     url = db.Column(db.String(500), nullable=True)
     marca = db.Column(db.String(100), nullable=True)
     cantidad = db.Column(db.Integer, nullable=True)
+    # Huella del último item scrapeado (ver pipelines.huella_item): si el
+    # próximo crawl trae la misma, el producto solo actualiza ultima_vez_visto
+    huella = db.Column(db.String(40), nullable=True)
+    ultima_vez_visto = db.Column(db.Date, nullable=True)
 
 
 class PrecioProducto(db.Model):
+    """
+    Historial viejo: una fila por precio observado en cada crawl.
+    El pipeline ya no escribe acá (ver IntervaloPrecio); las filas que
+    quedan se pasan a intervalos con utils.historial_precios.compactar_historial.
+    """
     __tablename__ = "precio_producto"
+    __table_args__ = (
+        # Historial de un producto en un super por fecha (ventana de min/max)
+        db.Index("ix_precio_producto_ps_fecha", "producto_supermercado_id", "fecha"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     producto_supermercado_id = db.Column(db.Integer, db.ForeignKey("producto_supermercado.id"), nullable=False)
@@ -46,18 +127,99 @@ class PrecioProducto(db.Model):
     fecha = db.Column(db.Date, nullable=True, default=date.today)
 
 
+class IntervaloPrecio(db.Model):
+    """
+    Historial de precios por tramos: una fila por cada precio distinto que tuvo
+    un ProductoSupermercado, vigente desde `desde` y visto por última vez en
+    `hasta` (inclusive). Un crawl que repite el precio solo corre `hasta`, así
+    que la tabla crece con los cambios de precio y no con la cantidad de crawls.
+
+    En PostgreSQL la tabla se particiona por mes de `desde` (ver
+    utils.historial_precios.asegurar_particiones); la partición DEFAULT recibe
+    lo que caiga fuera de los meses creados.
+    """
+    __tablename__ = "intervalo_precio"
+    __table_args__ = {"postgresql_partition_by": "RANGE (desde)"}
+
+    # La clave de partición tiene que ser parte de la clave primaria
+    producto_supermercado_id = db.Column(db.Integer, db.ForeignKey("producto_supermercado.id"), primary_key=True)
+    desde = db.Column(db.Date, primary_key=True)
+    hasta = db.Column(db.Date, nullable=False)
+    precio = db.Column(db.Float, nullable=False)
+    moneda = db.Column(db.String(100), nullable=True)
+
+
+event.listen(
+    IntervaloPrecio.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS intervalo_precio_default PARTITION OF intervalo_precio DEFAULT")
+    .execute_if(dialect="postgresql"),
+)
+
+
 class ListaCompra(db.Model):
     __tablename__ = "lista_compra"
 
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
     fecha_creacion = db.Column(db.Date, nullable=False, default=date.today)
+    # Se incrementa en cada cambio de ítems; forma parte de la clave de cache
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Distingue a la lista de otra que reuse su id después de eliminarla
+    # (también forma parte de la clave de cache)
+    token = db.Column(db.String(32), nullable=True, default=lambda: uuid.uuid4().hex)
 
 
 class ItemListaCompra(db.Model):
     __tablename__ = "item_lista_compra"
+    __table_args__ = (
+        db.Index("ux_item_lista_producto", "lista_compra_id", "producto_id", unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     lista_compra_id = db.Column(db.Integer, db.ForeignKey("lista_compra.id"), nullable=False)
     producto_id = db.Column(db.Integer, db.ForeignKey("producto.id"), nullable=False)
-    cantidad = db.Column(db.Integer, nullable=False)
\ No newline at end of file
+    cantidad = db.Column(db.Integer, nullable=False)
+
+class PrecioActual(db.Model):
+    """
+    Precio vigente de cada ProductoSupermercado (una fila por producto en super).
+    Lo mantiene el pipeline de scraping en la misma escritura que el historial,
+    para que las lecturas no tengan que agregar todo PrecioProducto.
+    """
+    __tablename__ = "precio_actual"
+
+    producto_supermercado_id = db.Column(db.Integer, db.ForeignKey("producto_supermercado.id"), primary_key=True)
+    precio = db.Column(db.Float, nullable=False)
+    moneda = db.Column(db.String(100), nullable=True)
+    fecha = db.Column(db.Date, nullable=False, default=date.today)
+    precio_anterior = db.Column(db.Float, nullable=True)
+    precio_min = db.Column(db.Float, nullable=True)
+    precio_max = db.Column(db.Float, nullable=True)
+
+class VersionDatos(db.Model):
+    """
+    Contadores de versión de datos compartidos entre procesos.
+    "precios" lo incrementa el pipeline al terminar cada crawl, así la web
+    sabe cuándo descartar lo que tiene cacheado sobre precios.
+    "historial_compactado" guarda el último id de precio_producto ya pasado
+    a intervalo_precio.
+    """
+    __tablename__ = "version_datos"
+
+    clave = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class Crawl(db.Model):
+    """
+    Una corrida del orquestador de crawls (todas las cadenas a la vez).
+    `estadisticas` guarda, por spider, items y segundos de crawl.
+    """
+    __tablename__ = "crawl"
+
+    id = db.Column(db.String(50), primary_key=True)  # crawl_id
+    inicio = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    fin = db.Column(db.DateTime, nullable=True)
+    spiders = db.Column(db.String(200), nullable=True)
+    items = db.Column(db.Integer, nullable=False, default=0)
+    estadisticas = db.Column(JSONVariante, nullable=True)
@@ -1,6 +1,15 @@
 # coto_parser.py
 import json
 import re
+from functools import lru_cache
+
+try:
+    import ijson
+except ImportError:  # sin ijson se parsea el documento completo con json
+    ijson = None
+
+# Errores de JSON mal formado de cualquiera de los dos caminos
+ERRORES_JSON = (ValueError,) if ijson is None else (ValueError, ijson.JSONError)
 
 
 def first_value(attrs: dict, key: str, default=None):
@@ -17,6 +26,10 @@ def first_value(attrs: dict, key: str, default=None):
     return value or default
 
 
+# Primer bloque "numérico" de un texto de precio
+NUMERO = re.compile(r"[0-9][0-9.,]*")
+
+
 def extract_number(s):
     """
     Extrae un número flotante razonable de un string.
@@ -31,9 +44,7 @@ def extract_number(s):
     if s is None:
         return None
 
-    s = str(s)
-
-    m = re.search(r"[0-9][0-9.,]*", s)
+    m = NUMERO.search(str(s))
     if not m:
         return None
 
@@ -53,174 +64,424 @@ def extract_number(s):
         return None
 
 
-def compute_price(attrs: dict):
-    """
-    Calcula el precio "actual" del producto usando varias fuentes.
+def _numero(val):
+    # a veces viene como float directo, a veces como string
+    if isinstance(val, (int, float)):
+        return float(val)
+    return extract_number(val)
 
-    Prioridad:
-    1) Promos: product.dtoDescuentos* (precioDescuento > precioRegular > textoPrecioRegular)
-    2) sku.activePrice
-    3) sku.dtoPrice (precio > precioLista)
-    4) sku.referencePrice
+
+@lru_cache(maxsize=4096)
+def _json_cacheado(raw):
+    """
+    json.loads de los strings JSON que vienen dentro de los atributos
+    (dtoDescuentos*, dtoPrice). Se repiten mucho entre productos, así que se
+    parsean una vez. El resultado se comparte: solo leerlo. None si no es JSON.
     """
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
 
-    # 1) Promos: dtoDescuentos y variantes
-    dto_keys = [
-        "product.dtoDescuentos",
-        "product.dtoDescuentosMediosPago",
-        "product.dtoDescuentosTarjeta",
-        "dtoDescuentos",
-        "dtoDescuentosMediosPago",
-        "dtoDescuentosTarjeta",
-    ]
 
-    for key in dto_keys:
+def _json_atributo(raw):
+    return _json_cacheado(raw) if isinstance(raw, str) else raw
+
+
+# ---------------------------------------------------------------------- #
+# Fuentes de precio: cada una devuelve un float o None
+# ---------------------------------------------------------------------- #
+
+CLAVES_DESCUENTO = (
+    "product.dtoDescuentos",
+    "product.dtoDescuentosMediosPago",
+    "product.dtoDescuentosTarjeta",
+    "dtoDescuentos",
+    "dtoDescuentosMediosPago",
+    "dtoDescuentosTarjeta",
+)
+
+
+def _precio_promocion(attrs):
+    """
+    Promos: dtoDescuentos y variantes
+    (precioDescuento > precioRegular > textoPrecioRegular).
+    """
+    for key in CLAVES_DESCUENTO:
         raw = first_value(attrs, key)
         if not raw or raw == "[]":
             continue
 
-        try:
-            arr = json.loads(raw) if isinstance(raw, str) else raw
-        except Exception:
-            continue
-
-        if not isinstance(arr, list) or not arr:
+        arr = _json_atributo(raw)
+        if not isinstance(arr, list) or not arr or not isinstance(arr[0], dict):
             continue
 
         desc = arr[0]
+        # precioDescuento: ej "$4605.00c/u" (precio unitario promo 2x1, 3x2, etc.)
+        # precioRegular (a veces lo usan también)
+        # textoPrecioRegular: "Precio Contado: $9210"
+        for campo in ("precioDescuento", "precioRegular", "textoPrecioRegular"):
+            val = desc.get(campo)
+            if val:
+                num = extract_number(val)
+                if num is not None:
+                    return num
+    return None
 
-        # 1.a precioDescuento: ej "$4605.00c/u" (precio unitario promo 2x1, 3x2, etc.)
-        val = desc.get("precioDescuento")
-        if val:
-            num = extract_number(val)
-            if num is not None:
-                return num
 
-        # 1.b precioRegular (a veces lo usan también)
-        val = desc.get("precioRegular")
-        if val:
-            num = extract_number(val)
+def _precio_atributo(clave, sin_cero=False):
+    """
+    Atributo con un precio escalar. Con `sin_cero` un valor falso (0, 0.0)
+    cuenta como ausente y se sigue con la fuente siguiente, como hacía el
+    spider (`if val:`); sin él un 0 es un precio, como en el parser anterior.
+    """
+    def fuente(attrs):
+        val = first_value(attrs, clave)
+        if val is None or (sin_cero and not val):
+            return None
+        return _numero(val)
+    return fuente
+
+
+def _precio_dto(campos):
+    """
+    sku.dtoPrice: JSON con {precioLista, precio, ...}, leído en el orden de `campos`.
+    """
+    def fuente(attrs):
+        raw = first_value(attrs, "sku.dtoPrice")
+        if not raw:
+            return None
+        obj = _json_atributo(raw)
+        if not isinstance(obj, dict):
+            return None
+        for campo in campos:
+            val = obj.get(campo)
+            if val is None:
+                continue
+            num = _numero(val)
             if num is not None:
                 return num
+        return None
+    return fuente
 
-        # 1.c textoPrecioRegular: "Precio Contado: $9210"
-        val = desc.get("textoPrecioRegular")
+
+def _precio_lista_producto(attrs):
+    for key in ("product.PrecioLista", "product.precioLista"):
+        val = first_value(attrs, key)
         if val:
-            num = extract_number(val)
+            num = _numero(val)
             if num is not None:
                 return num
+    return None
+
+
+FUENTES_PRECIO = {
+    "promocion": _precio_promocion,
+    "activo": _precio_atributo("sku.activePrice"),
+    "activo_sin_cero": _precio_atributo("sku.activePrice", sin_cero=True),
+    "dto_precio": _precio_dto(("precio", "precioLista")),
+    "dto_lista": _precio_dto(("precioLista", "precio")),
+    "referencia": _precio_atributo("sku.referencePrice"),
+    "referencia_sin_cero": _precio_atributo("sku.referencePrice", sin_cero=True),
+    "lista_producto": _precio_lista_producto,
+}
+
+# Políticas de prioridad de precio: se usa la primera fuente que da un valor
+POLITICAS_PRECIO = {
+    # Lo que paga el cliente hoy: promos primero (la que usa el spider)
+    "promocion": ("promocion", "activo", "dto_precio", "referencia"),
+    # Precio de lista: promos después del precio activo y del de lista
+    "lista": ("activo_sin_cero", "dto_lista", "promocion", "referencia_sin_cero", "lista_producto"),
+}
+POLITICA_PRECIO = "promocion"
+
+
+class PoliticaPrecioDesconocida(LookupError):
+    """
+    COTO_POLITICA_PRECIO no es una política ni una tupla de fuentes conocidas.
+    No hereda de ValueError para no confundirse con un JSON inválido
+    (ERRORES_JSON).
+    """
+
+
+@lru_cache(maxsize=None)
+def _fuentes(politica):
+    nombres = POLITICAS_PRECIO.get(politica, politica) if isinstance(politica, str) else politica
+    if isinstance(nombres, str) or any(nombre not in FUENTES_PRECIO for nombre in nombres):
+        raise PoliticaPrecioDesconocida(
+            f"Política de precio desconocida: {politica!r} "
+            f"(políticas: {', '.join(POLITICAS_PRECIO)}; fuentes: {', '.join(FUENTES_PRECIO)})"
+        )
+    return tuple(FUENTES_PRECIO[nombre] for nombre in nombres)
 
-    # 2) sku.activePrice (precio principal “normal”)
-    val = first_value(attrs, "sku.activePrice")
-    if val is not None:
-        # a veces viene como float directo, a veces como string
-        if isinstance(val, (int, float)):
-            return float(val)
-        num = extract_number(val)
-        if num is not None:
-            return num
-
-    # 3) sku.dtoPrice: JSON con {precioLista, precio, ...}
-    raw = first_value(attrs, "sku.dtoPrice")
-    if raw:
-        try:
-            obj = json.loads(raw) if isinstance(raw, str) else raw
-            if isinstance(obj, dict):
-                # Preferimos "precio" sobre "precioLista" (lista suele ser precio de lista)
-                for field in ["precio", "precioLista"]:
-                    val = obj.get(field)
-                    if val is None:
-                        continue
-                    if isinstance(val, (int, float)):
-                        return float(val)
-                    num = extract_number(val)
-                    if num is not None:
-                        return num
-        except Exception:
-            pass
-
-    # 4) sku.referencePrice como fallback
-    val = first_value(attrs, "sku.referencePrice")
-    if val is not None:
-        if isinstance(val, (int, float)):
-            return float(val)
-        num = extract_number(val)
-        if num is not None:
-            return num
-
-    # Si no encontramos nada, devolvemos None
+
+def validar_politica(politica=None):
+    """
+    Levanta PoliticaPrecioDesconocida si la política no existe. Para validar
+    la configuración una vez, al arrancar, y no en cada página.
+    """
+    _fuentes(politica or POLITICA_PRECIO)
+
+
+def compute_price(attrs: dict, politica=None):
+    """
+    Calcula el precio del producto con la primera fuente de la política que
+    da un valor. `politica` es un nombre de POLITICAS_PRECIO o una tupla de
+    nombres de FUENTES_PRECIO (por defecto POLITICA_PRECIO).
+    Si no encontramos nada, devolvemos None.
+    """
+    for fuente in _fuentes(politica or POLITICA_PRECIO):
+        precio = fuente(attrs)
+        if precio is not None:
+            return precio
     return None
 
 
-def extract_products_from_root(root):
+def product_from_attrs(attrs, politica=None):
     """
-    Recorre el JSON completo buscando nodos con 'attributes'
-    que tengan info de producto (displayName + MARCA/brand, etc).
-    Devuelve una lista de dicts simplificados.
+    Arma el dict simplificado de un producto a partir de su nodo 'attributes'.
+    Devuelve None si el nodo no es un producto completo.
+    """
+    # Heurística: es un producto completo si tiene displayName y marca
+    if not (
+        isinstance(attrs, dict)
+        and "product.displayName" in attrs
+        and ("product.MARCA" in attrs or "product.brand" in attrs)
+    ):
+        return None
+
+    # marca (puede venir como product.MARCA o product.brand)
+    marca = first_value(attrs, "product.MARCA") or first_value(attrs, "product.brand")
+
+    # categoría: primero intento con parentCategory.displayName,
+    # si no, uso el último de allAncestors.displayName.
+    categoria = first_value(attrs, "parentCategory.displayName")
+    if categoria is None:
+        anc = attrs.get("allAncestors.displayName")
+        if isinstance(anc, list) and anc:
+            categoria = anc[-1]
+
+    # url interna: priorizo product.url, luego sku.url, luego baseUrl
+    url_interna = (
+        first_value(attrs, "product.url")
+        or first_value(attrs, "sku.url")
+        or first_value(attrs, "product.baseUrl")
+    )
+
+    return {
+        "categoria": categoria,
+        "nombre": first_value(attrs, "product.displayName", ""),
+        "precio": compute_price(attrs, politica),
+        "marca": marca,
+        "product_id": first_value(attrs, "product.repositoryId"),
+        "ean": first_value(attrs, "product.eanPrincipal"),
+        "url": url_interna,
+    }
+
+
+def extract_products_from_root(root, politica=None):
+    """
+    Recorre el JSON completo buscando nodos con 'attributes' que tengan info
+    de producto (displayName + MARCA/brand, etc). Iterativo (sin límite de
+    recursión) y sin bajar dentro de un nodo que ya es un producto.
+    Devuelve una lista de dicts simplificados, en orden de documento.
     """
     products = []
+    pendientes = [root] if isinstance(root, (dict, list)) else []
+    while pendientes:
+        node = pendientes.pop()
+        if isinstance(node, dict):
+            producto = product_from_attrs(node.get("attributes"), politica)
+            if producto is not None:
+                products.append(producto)
+                continue
+            hijos = node.values()
+        else:
+            hijos = node
+        # Al revés, para sacarlos de la pila en el orden del documento
+        pendientes.extend(hijo for hijo in reversed(list(hijos)) if isinstance(hijo, (dict, list)))
+    return products
 
-    def _walk(node):
-        # Si es dict, miro si tiene 'attributes'
+
+def find_results_list(root):
+    """
+    Busca el nodo con "@type": "Category_ResultsList" que tiene
+    recsPerPage y totalNumRecs (paginado de la categoría).
+    """
+    pendientes = [root] if isinstance(root, (dict, list)) else []
+    while pendientes:
+        node = pendientes.pop()
         if isinstance(node, dict):
-            attrs = node.get("attributes")
+            if node.get("@type") == "Category_ResultsList" and "totalNumRecs" in node:
+                return node
+            hijos = node.values()
+        else:
+            hijos = node
+        pendientes.extend(hijo for hijo in reversed(list(hijos)) if isinstance(hijo, (dict, list)))
+    return None
+
 
-            # Heurística: es un producto completo si tiene displayName y marca
-            if isinstance(attrs, dict) and "product.displayName" in attrs and (
-                "product.MARCA" in attrs or "product.brand" in attrs
+# Campos del nodo Category_ResultsList que necesita el paginado
+CAMPOS_PAGINADO = ("@type", "recsPerPage", "totalNumRecs")
+
+# Tamaño de página (bytes) desde el que parse_page usa el streaming. Por
+# debajo json.loads + el recorrido del árbol es ~2x más rápido y el árbol
+# ocupa poco (unas 4.5 veces el cuerpo); el streaming recién ahorra memoria
+# que importe en páginas de varios MiB
+UMBRAL_STREAMING = 4 * 1024 * 1024
+
+# Atributos que leen product_from_attrs y compute_price: el resto de cada
+# nodo 'attributes' se saltea en el streaming sin armarlo
+CAMPOS_PRODUCTO = frozenset({
+    "product.displayName", "product.MARCA", "product.brand", "product.repositoryId",
+    "product.eanPrincipal", "parentCategory.displayName", "allAncestors.displayName",
+    "product.url", "sku.url", "product.baseUrl",
+    "sku.activePrice", "sku.dtoPrice", "sku.referencePrice",
+    "product.PrecioLista", "product.precioLista",
+    "product.dtoDescuentos", "product.dtoDescuentosMediosPago", "product.dtoDescuentosTarjeta",
+    "dtoDescuentos", "dtoDescuentosMediosPago", "dtoDescuentosTarjeta",
+})
+
+
+def _leer_subarbol(eventos, evento, valor):
+    """
+    Arma el valor completo (dict, lista o escalar) que empieza con
+    (evento, valor), consumiendo de `eventos` solo ese subárbol.
+    """
+    builder = ijson.ObjectBuilder()
+    builder.event(evento, valor)
+    profundidad = 1 if evento in ("start_map", "start_array") else 0
+    while profundidad:
+        evento, valor = next(eventos)
+        builder.event(evento, valor)
+        if evento in ("start_map", "start_array"):
+            profundidad += 1
+        elif evento in ("end_map", "end_array"):
+            profundidad -= 1
+    return builder.value
+
+
+def _saltear_subarbol(eventos, evento):
+    """
+    Consume de `eventos` el valor que empieza con `evento`, sin armarlo.
+    """
+    if evento not in ("start_map", "start_array"):
+        return
+    profundidad = 1
+    for evento, _ in eventos:
+        if evento in ("start_map", "start_array"):
+            profundidad += 1
+        elif evento in ("end_map", "end_array"):
+            profundidad -= 1
+            if not profundidad:
+                return
+
+
+def _leer_atributos(eventos, evento, valor):
+    """
+    Arma un nodo 'attributes' solo con las claves de CAMPOS_PRODUCTO.
+    """
+    if evento != "start_map":
+        _saltear_subarbol(eventos, evento)
+        return None
+
+    attrs = {}
+    for evento, valor in eventos:
+        if evento == "end_map":
+            return attrs
+        # evento == "map_key"
+        evento_valor, dato = next(eventos)
+        if valor in CAMPOS_PRODUCTO:
+            attrs[valor] = _leer_subarbol(eventos, evento_valor, dato)
+        else:
+            _saltear_subarbol(eventos, evento_valor)
+    return attrs
+
+
+def _recorrer_documento(root, politica):
+    """
+    Lo mismo que genera iter_page, sobre el documento ya parseado.
+    """
+    for producto in extract_products_from_root(root, politica):
+        yield "producto", producto
+    paginado = find_results_list(root)
+    if paginado is not None:
+        yield "paginado", {k: paginado.get(k) for k in CAMPOS_PAGINADO}
+
+
+def iter_page(body, politica=None):
+    """
+    Extrae en una sola pasada los productos y el paginado de una página de
+    categoría de Coto (bytes o archivo), sin armar el documento completo:
+    de cada nodo 'attributes' solo se arman las claves de CAMPOS_PRODUCTO,
+    y del nodo Category_ResultsList los campos del paginado.
+
+    Genera tuplas ("producto", dict) y, una vez, ("paginado", dict con
+    recsPerPage y totalNumRecs). Como extract_products_from_root, no baja
+    dentro de un nodo que ya es un producto. `politica`: ver compute_price.
+    Sin ijson instalado cae al parseo completo.
+    """
+    if ijson is None:
+        yield from _recorrer_documento(json.loads(body if isinstance(body, (bytes, str)) else body.read()), politica)
+        return
+
+    eventos = iter(ijson.basic_parse(body, use_float=True))
+    # Un elemento por contenedor abierto: dict con los campos de paginado
+    # capturados si es un objeto, None si es una lista
+    abiertos = []
+    clave = None
+    paginado_listo = False
+
+    for evento, valor in eventos:
+        if evento == "map_key":
+            if valor == "attributes":
+                evento, valor = next(eventos)
+                producto = product_from_attrs(_leer_atributos(eventos, evento, valor), politica)
+                if producto is not None:
+                    yield "producto", producto
+                    # El resto del nodo del producto (SKUs, acciones) no se mira
+                    _saltear_subarbol(eventos, "start_map")
+                    abiertos.pop()
+                clave = None
+            else:
+                clave = valor
+        elif evento == "start_map":
+            abiertos.append({})
+            clave = None
+        elif evento == "start_array":
+            abiertos.append(None)
+        elif evento == "end_map":
+            campos = abiertos.pop()
+            if (
+                not paginado_listo
+                and campos.get("@type") == "Category_ResultsList"
+                and "totalNumRecs" in campos
             ):
-                # nombre
-                nombre = first_value(attrs, "product.displayName", "")
-
-                # marca (puede venir como product.MARCA o product.brand)
-                marca = first_value(attrs, "product.MARCA") or first_value(
-                    attrs, "product.brand"
-                )
-
-                # product_id
-                product_id = first_value(attrs, "product.repositoryId")
-
-                # ean
-                ean = first_value(attrs, "product.eanPrincipal")
-
-                # categoría: primero intento con parentCategory.displayName,
-                # si no, uso el último de allAncestors.displayName.
-                categoria = first_value(attrs, "parentCategory.displayName")
-                if categoria is None:
-                    anc = attrs.get("allAncestors.displayName")
-                    if isinstance(anc, list) and anc:
-                        categoria = anc[-1]
-
-                # precio: calculado con la lógica de arriba
-                precio = compute_price(attrs)
-
-                # url interna: priorizo product.url, luego sku.url, luego baseUrl
-                url_interna = (
-                    first_value(attrs, "product.url")
-                    or first_value(attrs, "sku.url")
-                    or first_value(attrs, "product.baseUrl")
-                )
-
-                products.append(
-                    {
-                        "categoria": categoria,
-                        "nombre": nombre,
-                        "precio": precio,
-                        "marca": marca,
-                        "product_id": product_id,
-                        "ean": ean,
-                        "url": url_interna,
-                    }
-                )
-
-            # Sigo recorriendo el resto de las claves
-            for v in node.values():
-                _walk(v)
-
-        # Si es lista, recorro cada elemento
-        elif isinstance(node, list):
-            for item in node:
-                _walk(item)
-
-    _walk(root)
-    return products
+                paginado_listo = True
+                yield "paginado", campos
+        elif evento == "end_array":
+            abiertos.pop()
+        elif clave in CAMPOS_PAGINADO and abiertos and abiertos[-1] is not None:
+            abiertos[-1][clave] = valor
+
+
+def parse_page(body, politica=None, umbral=UMBRAL_STREAMING):
+    """
+    Productos y paginado de una página de categoría: (productos, paginado o
+    None). Un cuerpo de menos de `umbral` bytes se parsea entero con
+    json.loads; uno más grande (o un archivo) va por iter_page, que no arma
+    el documento completo.
+    """
+    if isinstance(body, (bytes, str)) and len(body) < umbral:
+        eventos = _recorrer_documento(json.loads(body), politica)
+    else:
+        eventos = iter_page(body, politica)
+
+    productos = []
+    paginado = None
+    for tipo, valor in eventos:
+        if tipo == "producto":
+            productos.append(valor)
+        else:
+            paginado = valor
+    return productos, paginado
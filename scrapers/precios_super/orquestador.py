@@ -0,0 +1,235 @@
+"""
+Orquestador de crawls: corre todos los spiders a la vez, cada uno en su
+proceso, y un único proceso escritor que es el dueño de la sesión de base.
+
+    spider coto      ──┐
+    spider carrefour ──┼── cola ──> escritor (DBPipeline por lotes) ──> base
+    ...              ──┘
+
+Los spiders no abren la base (ColaPipeline manda los items por la cola), así
+que no compiten por locks y un refresh completo tarda lo que el spider más
+lento. Al terminar informa el throughput de cada spider y del escritor, y
+registra la corrida en la tabla crawl con su crawl_id.
+
+Uso (desde scrapers/precios_super):
+    python orquestador.py [--spiders coto carrefour] [--crawl-id ID]
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import traceback
+from datetime import datetime
+
+DIR_PROYECTO = os.path.dirname(os.path.abspath(__file__))
+if DIR_PROYECTO not in sys.path:
+    sys.path.insert(0, DIR_PROYECTO)
+os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "precios_super.settings")
+
+# Tandas de items encoladas sin consumir antes de frenar a los spiders
+TAM_COLA = 1000
+# Segundos entre controles de los procesos hijos
+ESPERA = 1.0
+
+
+def correr_spider(nombre, cola, crawl_id):
+    """
+    Proceso de un spider: crawl normal de Scrapy, con ColaPipeline como
+    único pipeline de items.
+    """
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from precios_super.cola import ColaPipeline
+
+    ColaPipeline.cola = cola
+    settings = get_project_settings()
+    settings.set("ITEM_PIPELINES", {"precios_super.cola.ColaPipeline": 300})
+    settings.set("CRAWL_ID", crawl_id)
+
+    proceso = CrawlerProcess(settings)
+    proceso.crawl(nombre)
+    proceso.start()
+
+
+def escribir(cola, crawl_id, spiders, tam_lote, intervalo, incremental, ruta_paginas, resultados):
+    """
+    Proceso escritor: consume la cola hasta que todos los spiders avisan que
+    terminaron y escribe con DBPipeline en modo por lotes. Es también el que
+    registra los hashes de las páginas del crawl incremental, después de
+    commitear sus items.
+    """
+    try:
+        resultados.put(("ok", _escribir(cola, crawl_id, spiders, tam_lote, intervalo, incremental, ruta_paginas)))
+    except BaseException:
+        # Que main() se entere y frene a los spiders en vez de esperar para siempre
+        resultados.put(("error", traceback.format_exc()))
+        raise
+
+
+def _escribir(cola, crawl_id, spiders, tam_lote, intervalo, incremental, ruta_paginas):
+    from precios_super.pipelines import DBPipeline
+    from extensions import db
+    from models import Crawl
+
+    pipeline = DBPipeline(
+        tam_lote=tam_lote, intervalo=intervalo, crawl_id=crawl_id,
+        incremental=incremental, ruta_paginas=ruta_paginas,
+    )
+    with pipeline.app.app_context():
+        db.session.merge(Crawl(id=crawl_id, inicio=datetime.now(), spiders=",".join(spiders)))
+        db.session.commit()
+
+    pipeline.open_spider(None)
+    pendientes = set(spiders)
+    escritos = {nombre: 0 for nombre in spiders}
+    crawls = {}
+    while pendientes:
+        tipo, nombre, carga = cola.get()
+        if tipo == "items":
+            for item in carga:
+                pipeline.process_item(item, None)
+            escritos[nombre] += sum(1 for item in carga if "pagina_procesada" not in item)
+        elif tipo == "fin" and nombre in pendientes:
+            # Vale el primero: el del spider, o el que manda vigilar() si
+            # murió sin avisar. Los repetidos se ignoran.
+            pendientes.discard(nombre)
+            crawls[nombre] = carga
+    pipeline.close_spider(None)
+    segundos = time.monotonic() - pipeline.inicio
+
+    estadisticas = {
+        nombre: {**(crawls.get(nombre) or {"error": True}), "escritos": escritos[nombre]}
+        for nombre in spiders
+    }
+    with pipeline.app.app_context():
+        crawl = db.session.get(Crawl, crawl_id)
+        crawl.fin = datetime.now()
+        crawl.items = pipeline.items_procesados
+        crawl.estadisticas = estadisticas
+        db.session.commit()
+
+    return estadisticas, pipeline.items_procesados, segundos
+
+
+def vigilar(procesos, escritor, cola, resultados):
+    """
+    Espera el resultado del escritor mientras corren los spiders. Por cada
+    spider que termina, con cualquier código de salida, manda un "fin" en
+    nombre suyo: si el crawl falló al arrancar (por ejemplo un setting
+    inválido) Scrapy sale con código 0 sin que ColaPipeline mande el suyo, y
+    el escritor lo esperaría para siempre. El "fin" propio del spider ya está
+    en la cola antes de que el proceso termine, así que llega primero y el
+    escritor ignora este. Si el escritor muere (con o sin excepción) devuelve
+    ("error", detalle) sin esperar al resto.
+    Devuelve ("ok", (estadisticas, items, segundos)) o ("error", detalle).
+    """
+    vivos = dict(procesos)
+    while True:
+        for nombre, proceso in list(vivos.items()):
+            if proceso.is_alive():
+                continue
+            del vivos[nombre]
+            if proceso.exitcode != 0:
+                print(f"[ORQUESTADOR] el spider {nombre} terminó con código {proceso.exitcode}")
+            while escritor.is_alive():
+                try:
+                    cola.put(("fin", nombre, None), timeout=ESPERA)
+                    break
+                except queue.Full:
+                    continue
+
+        try:
+            return resultados.get(timeout=ESPERA)
+        except queue.Empty:
+            if not escritor.is_alive():
+                # Terminó sin mandar nada (por ejemplo, lo mató el sistema)
+                return "error", f"el escritor terminó con código {escritor.exitcode}"
+
+
+def spiders_registrados():
+    from scrapy.spiderloader import SpiderLoader
+    from scrapy.utils.project import get_project_settings
+
+    return SpiderLoader.from_settings(get_project_settings()).list()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spiders", nargs="+", default=None, help="por defecto, todos los registrados")
+    parser.add_argument("--crawl-id", default=None, help="por defecto, la fecha y hora de inicio")
+    args = parser.parse_args()
+
+    from scrapy.utils.project import get_project_settings
+    settings = get_project_settings()
+    spiders = args.spiders or spiders_registrados()
+    crawl_id = args.crawl_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+
+    # spawn: cada proceso arranca su propio reactor de Twisted desde cero
+    contexto = multiprocessing.get_context("spawn")
+    cola = contexto.Queue(maxsize=TAM_COLA)
+    resultados = contexto.Queue()
+
+    escritor = contexto.Process(
+        target=escribir,
+        args=(
+            cola, crawl_id, spiders,
+            # El escritor siempre escribe por lotes: es el único que toca la base
+            settings.getint("DB_PIPELINE_LOTE", 0) or 200,
+            settings.getfloat("DB_PIPELINE_INTERVALO", 5.0),
+            settings.getbool("CRAWL_INCREMENTAL"),
+            settings.get("INCREMENTAL_RUTA", "estado_paginas.sqlite"),
+            resultados,
+        ),
+    )
+    procesos = {
+        nombre: contexto.Process(target=correr_spider, args=(nombre, cola, crawl_id), name=f"spider-{nombre}")
+        for nombre in spiders
+    }
+
+    print(f"[ORQUESTADOR] crawl {crawl_id}: {', '.join(spiders)}")
+    inicio = time.monotonic()
+    escritor.start()
+    for proceso in procesos.values():
+        proceso.start()
+
+    estado, resultado = vigilar(procesos, escritor, cola, resultados)
+    if estado == "error":
+        # Sin escritor nadie vacía la cola: los spiders quedarían trabados en put()
+        print(f"[ORQUESTADOR] el escritor falló, se cancela el crawl {crawl_id}:\n{resultado}")
+        for proceso in procesos.values():
+            if proceso.is_alive():
+                proceso.terminate()
+            proceso.join()
+        escritor.join()
+        cola.cancel_join_thread()
+        sys.exit(1)
+
+    for proceso in procesos.values():
+        proceso.join()
+    escritor.join()
+    estadisticas, total, segundos_escritor = resultado
+    total_segundos = time.monotonic() - inicio
+
+    print(f"[ORQUESTADOR] crawl {crawl_id} terminado en {total_segundos:.1f}s")
+    for nombre, stats in estadisticas.items():
+        if stats.get("error"):
+            print(f"  {nombre:<12} falló ({stats['escritos']} items escritos)")
+            continue
+        por_segundo = stats["items"] / max(stats["segundos"], 1e-9)
+        print(
+            f"  {nombre:<12} {stats['items']:>7} items en {stats['segundos']:>7.1f}s "
+            f"= {por_segundo:7.1f} items/s   escritos={stats['escritos']}"
+        )
+        for dominio, d in (stats.get("dominios") or {}).items():
+            print(
+                f"    {dominio}: {d['respuestas']} respuestas, latencia media {d['latencia_media']}s, "
+                f"errores {d['errores'] or 0}, concurrencia máx {d['concurrencia_maxima']}"
+            )
+    print(f"  {'escritor':<12} {total:>7} items en {segundos_escritor:>7.1f}s "
+          f"= {total / max(segundos_escritor, 1e-9):7.1f} items/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import time
+
+
+class ColaPipeline:
+    """
+    Pipeline de los procesos de crawl que lanza el orquestador: no toca la
+    base, manda los items en tandas por una cola al proceso escritor, que es
+    el único con sesión de base (ver orquestador.py).
+
+    Mensajes: ("items", spider, [items]) y, al cerrar, ("fin", spider, stats),
+    con las estadísticas por dominio de ConcurrenciaAdaptativaMiddleware.
+    """
+
+    # La fija el orquestador en cada proceso hijo (la cola no se puede copiar
+    # dentro de los settings de Scrapy)
+    cola = None
+
+    def __init__(self, tam_tanda=100, intervalo=1.0, stats=None):
+        self.tam_tanda = tam_tanda
+        self.stats = stats
+        self.intervalo = intervalo
+        self.tanda = []
+        self.ultimo_envio = time.monotonic()
+        self.enviados = 0
+        self.inicio = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            tam_tanda=crawler.settings.getint("COLA_TANDA", 100),
+            intervalo=crawler.settings.getfloat("COLA_INTERVALO", 1.0),
+            stats=crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        if self.cola is None:
+            raise RuntimeError("ColaPipeline solo corre dentro del orquestador (falta la cola)")
+        self.inicio = time.monotonic()
+
+    def _enviar(self, spider):
+        if self.tanda:
+            self.cola.put(("items", spider.name, self.tanda))
+            # Sin contar las marcas de fin de página del crawl incremental
+            self.enviados += sum(1 for item in self.tanda if "pagina_procesada" not in item)
+            self.tanda = []
+        self.ultimo_envio = time.monotonic()
+
+    def process_item(self, item, spider):
+        self.tanda.append(dict(item))
+        vencido = time.monotonic() - self.ultimo_envio >= self.intervalo
+        if len(self.tanda) >= self.tam_tanda or vencido:
+            self._enviar(spider)
+        return item
+
+    def close_spider(self, spider):
+        self._enviar(spider)
+        segundos = time.monotonic() - self.inicio if self.inicio is not None else 0.0
+        dominios = {
+            clave.split("/", 1)[1]: valor
+            for clave, valor in (self.stats.get_stats() if self.stats is not None else {}).items()
+            if clave.startswith("concurrencia/")
+        }
+        self.cola.put((
+            "fin", spider.name,
+            {"items": self.enviados, "segundos": round(segundos, 2), "dominios": dominios},
+        ))
@@ -0,0 +1,118 @@
+import time
+
+# Respuestas que piden bajar el ritmo
+STATUS_SATURADO = frozenset({429, 503})
+
+
+class ControlConcurrencia:
+    """
+    Concurrencia adaptativa de un dominio (AIMD, como el control de
+    congestión de TCP):
+
+    - cada respuesta sana y rápida suma 1/concurrencia, o sea +1 por "vuelta"
+      de pedidos en vuelo, hasta `maximo`;
+    - un 429/5xx o un error de descarga la divide por 2 y duplica la demora
+      entre pedidos (o usa el Retry-After si viene);
+    - una respuesta más lenta que `latencia_objetivo` la baja un 25%.
+
+    Las bajadas se aplican como mucho una vez por latencia media, para que
+    una ráfaga de 429 de los pedidos que ya estaban en vuelo no la lleve
+    directo al mínimo. No depende de Scrapy: lo usa
+    ConcurrenciaAdaptativaMiddleware y también benchmarks/bench_concurrencia.py.
+    """
+
+    def __init__(self, inicial=2, minimo=1, maximo=8, latencia_objetivo=2.0,
+                 demora_inicial=0.0, demora_minima=0.0, demora_maxima=30.0):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self._concurrencia = float(min(max(inicial, self.minimo), self.maximo))
+        self.latencia_objetivo = latencia_objetivo
+        self.demora = demora_inicial
+        self.demora_minima = demora_minima
+        self.demora_maxima = demora_maxima
+        self.latencia_media = None
+        self.ultima_bajada = float("-inf")
+
+        self.respuestas = 0
+        self.errores = {}
+        self.lentas = 0
+        self.latencia_total = 0.0
+        self.latencia_maxima = 0.0
+        self.concurrencia_maxima = int(self._concurrencia)
+
+    @property
+    def concurrencia(self):
+        return int(self._concurrencia)
+
+    def _bajar(self, factor, ahora):
+        ventana = max(self.latencia_media or 0.0, 0.5)
+        if ahora - self.ultima_bajada < ventana:
+            return False
+        self._concurrencia = max(self.minimo, self._concurrencia * factor)
+        self.ultima_bajada = ahora
+        return True
+
+    def _frenar(self, reintentar_en, ahora):
+        self._bajar(0.5, ahora)
+        demora = max(self.demora * 2, 0.25)
+        if reintentar_en is not None:
+            demora = max(demora, reintentar_en)
+        self.demora = min(self.demora_maxima, demora)
+
+    def respuesta(self, latencia, status=200, reintentar_en=None, ahora=None):
+        """
+        Registra una respuesta del dominio: `latencia` en segundos,
+        `reintentar_en` en segundos (header Retry-After) si vino.
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        self.respuestas += 1
+        self.latencia_total += latencia
+        self.latencia_maxima = max(self.latencia_maxima, latencia)
+        self.latencia_media = latencia if self.latencia_media is None else 0.8 * self.latencia_media + 0.2 * latencia
+
+        if status in STATUS_SATURADO or status >= 500:
+            clave = str(status)
+            self.errores[clave] = self.errores.get(clave, 0) + 1
+            self._frenar(reintentar_en, ahora)
+        elif latencia > self.latencia_objetivo:
+            self.lentas += 1
+            self._bajar(0.75, ahora)
+        else:
+            self._concurrencia = min(self.maximo, self._concurrencia + 1 / self._concurrencia)
+            demora = self.demora / 2
+            self.demora = demora if demora >= max(self.demora_minima, 0.01) else self.demora_minima
+        self.concurrencia_maxima = max(self.concurrencia_maxima, self.concurrencia)
+
+    def error(self, tipo="excepcion", ahora=None):
+        """
+        Registra un pedido que falló sin respuesta (timeout, conexión cortada).
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        self.errores[tipo] = self.errores.get(tipo, 0) + 1
+        self._frenar(None, ahora)
+
+    def estadisticas(self):
+        return {
+            "respuestas": self.respuestas,
+            "errores": dict(self.errores),
+            "lentas": self.lentas,
+            "latencia_media": round(self.latencia_total / self.respuestas, 3) if self.respuestas else None,
+            "latencia_maxima": round(self.latencia_maxima, 3),
+            "concurrencia": self.concurrencia,
+            "concurrencia_maxima": self.concurrencia_maxima,
+            "demora": round(self.demora, 3),
+        }
+
+
+def segundos_retry_after(valor):
+    """
+    Retry-After en segundos (solo la forma numérica; la fecha HTTP se ignora).
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, bytes):
+        valor = valor.decode("latin-1")
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        return None
@@ -0,0 +1,30 @@
+"""
+Estado del crawl incremental: hash del contenido de cada página (por URL)
+del último crawl cuyos items quedaron escritos en la base, en un SQLite
+local (INCREMENTAL_RUTA). Lo lee CambiosPaginaMiddleware al arrancar y lo
+escribe DBPipeline después de cada commit (ver HuellaPaginaMiddleware).
+"""
+import sqlite3
+from contextlib import closing
+
+
+def _conectar(ruta):
+    conexion = sqlite3.connect(ruta, timeout=30)
+    conexion.execute("CREATE TABLE IF NOT EXISTS pagina (url TEXT PRIMARY KEY, hash TEXT NOT NULL)")
+    return conexion
+
+
+def cargar_huellas(ruta):
+    """
+    Devuelve {url: hash} de las páginas registradas.
+    """
+    with closing(_conectar(ruta)) as conexion:
+        return dict(conexion.execute("SELECT url, hash FROM pagina"))
+
+
+def guardar_huellas(ruta, huellas):
+    """
+    Registra pares (url, hash) de páginas cuyos items ya están commiteados.
+    """
+    with closing(_conectar(ruta)) as conexion, conexion:
+        conexion.executemany("INSERT OR REPLACE INTO pagina (url, hash) VALUES (?, ?)", huellas)
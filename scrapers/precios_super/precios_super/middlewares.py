@@ -3,7 +3,15 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import hashlib
+
 from scrapy import signals
+from scrapy.downloadermiddlewares.httpcache import HttpCacheMiddleware
+from scrapy.exceptions import NotConfigured
+from scrapy.extensions.httpcache import RFC2616Policy
+
+from precios_super.concurrencia import ControlConcurrencia, segundos_retry_after
+from precios_super.estado_paginas import cargar_huellas
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
@@ -98,3 +106,214 @@ class PreciosSuperDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class PoliticaCachePrecios(RFC2616Policy):
+    """
+    HTTPCACHE_POLICY de los spiders: la cache solo sirve para no volver a
+    bajar una página que el servidor confirma igual con un 304. Nunca usa una
+    copia guardada sin preguntar (ni por la frescura heurística de
+    RFC2616Policy) y nunca la devuelve en lugar de un 5xx: esa respuesta pasa
+    como vino y la reintenta el RetryMiddleware.
+    """
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        # Siempre pedido condicional (If-None-Match / If-Modified-Since)
+        self._set_conditional_validators(request, cachedresponse)
+        return False
+
+    def is_cached_response_valid(self, cachedresponse, response, request):
+        return response.status == 304
+
+
+class CachePreciosMiddleware(HttpCacheMiddleware):
+    """
+    Reemplaza al HttpCacheMiddleware de Scrapy (con PoliticaCachePrecios):
+    - la copia de la cache que se devuelve por un 304 queda marcada
+      "revalidado", así CambiosPaginaMiddleware y
+      ConcurrenciaAdaptativaMiddleware la distinguen de cualquier otra
+      respuesta con la marca "cached";
+    - un error de descarga (timeout, conexión cortada) hace fallar el pedido
+      en vez de devolver la copia guardada con precios viejos.
+    """
+
+    def process_response(self, request, response, spider):
+        resultado = super().process_response(request, response, spider)
+        if resultado is not response:
+            # Es la copia de la cache, validada por un 304
+            resultado.flags.append("revalidado")
+        return resultado
+
+    def process_exception(self, request, exception, spider):
+        request.meta.pop("cached_response", None)
+        return None
+
+
+class CambiosPaginaMiddleware:
+    """
+    Crawl incremental: compara el hash del contenido de cada página (por URL)
+    con el del último crawl y marca response.meta["pagina_sin_cambios"]
+    cuando es igual. Los spiders usan la marca para no volver a armar los
+    items de esa página (ver DBPipeline._separar_sin_cambios).
+
+    Se activa con CRAWL_INCREMENTAL. El hash nuevo queda en
+    request.meta["huella_pagina"]; no se guarda acá sino cuando los items
+    de la página ya están en la base (HuellaPaginaMiddleware y DBPipeline),
+    así que una página cuyos items no se escribieron (error del pipeline,
+    escritor caído, crawl cortado) se vuelve a procesar en el próximo crawl.
+    Para no volver a descargar lo que no cambió, va junto con el HTTPCACHE
+    (pedidos condicionales con ETag/Last-Modified, ver CachePreciosMiddleware).
+    Una respuesta de la cache solo cuenta como "sin cambios" si viene de un
+    304 ("revalidado"); cualquier otra copia guardada se procesa completa.
+    """
+
+    def __init__(self, ruta, stats=None):
+        self.ruta = ruta
+        self.stats = stats
+        self.anteriores = cargar_huellas(ruta)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CRAWL_INCREMENTAL"):
+            raise NotConfigured
+        return cls(crawler.settings.get("INCREMENTAL_RUTA", "estado_paginas.sqlite"), crawler.stats)
+
+    def process_response(self, request, response, spider):
+        if response.status != 200:
+            return response
+
+        huella = hashlib.sha1(response.body).hexdigest()
+        desde_cache = "cached" in response.flags and "revalidado" not in response.flags
+        if not desde_cache and self.anteriores.get(request.url) == huella:
+            request.meta["pagina_sin_cambios"] = True
+            if self.stats is not None:
+                self.stats.inc_value("incremental/paginas_sin_cambios")
+        request.meta["huella_pagina"] = (request.url, huella)
+        return response
+
+
+class HuellaPaginaMiddleware:
+    """
+    Middleware de spider del crawl incremental: a cada item que sale de una
+    página con huella le agrega "pagina_url" y, cuando el callback termina,
+    manda el item {"pagina_procesada": url, "huella": hash}. DBPipeline lo
+    guarda en el estado recién después de commitear los items anteriores,
+    y lo descarta si alguno de los items de esa página falló.
+    Si el callback se corta con una excepción, la página no se registra.
+    """
+
+    def process_spider_output(self, response, result, spider):
+        huella = response.meta.get("huella_pagina")
+        if huella is None:
+            yield from result
+            return
+        url, valor = huella
+        for salida in result:
+            if isinstance(salida, dict):
+                salida["pagina_url"] = url
+            yield salida
+        yield {"pagina_procesada": url, "huella": valor}
+
+
+class ConcurrenciaAdaptativaMiddleware:
+    """
+    Ajusta la concurrencia y la demora de cada slot de descarga (un slot por
+    dominio) con un ControlConcurrencia: sube mientras las respuestas llegan
+    sanas y rápidas, y baja con 429/5xx, errores de descarga o respuestas
+    lentas. Reemplaza al CONCURRENT_REQUESTS_PER_DOMAIN/DOWNLOAD_DELAY fijo,
+    que pasan a ser solo el punto de partida.
+
+    Se activa con CONCURRENCIA_ADAPTATIVA. Los límites por defecto salen de
+    CONCURRENCIA_* y cada spider los puede pisar por dominio en sus
+    custom_settings con CONCURRENCIA_DOMINIOS, por ejemplo
+    {"www.carrefour.com.ar": {"maximo": 16, "latencia_objetivo": 1.5}}.
+    Las estadísticas de cada dominio quedan en las stats del crawl bajo
+    "concurrencia/<dominio>".
+
+    Tiene que ir después del HttpCacheMiddleware (número mayor que 900) para
+    ver lo que devolvió la red antes de que lo toque la cache: el 304 de una
+    revalidación con su status y su latencia reales (cuenta como respuesta
+    sana), y los 429/5xx y timeouts antes de que se reintenten. Las páginas
+    servidas por la cache sin ir a la red ("cached" sin download_latency) no
+    cuentan.
+    """
+
+    def __init__(self, crawler, por_defecto, dominios):
+        self.crawler = crawler
+        self.por_defecto = por_defecto
+        self.dominios = dominios
+        self.controles = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("CONCURRENCIA_ADAPTATIVA"):
+            raise NotConfigured
+        por_defecto = {
+            "inicial": settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN", 2),
+            "minimo": settings.getint("CONCURRENCIA_MINIMA", 1),
+            "maximo": settings.getint("CONCURRENCIA_MAXIMA", 8),
+            "latencia_objetivo": settings.getfloat("CONCURRENCIA_LATENCIA_OBJETIVO", 2.0),
+            "demora_inicial": settings.getfloat("DOWNLOAD_DELAY", 0.0),
+            "demora_minima": settings.getfloat("CONCURRENCIA_DEMORA_MINIMA", 0.0),
+            "demora_maxima": settings.getfloat("CONCURRENCIA_DEMORA_MAXIMA", 30.0),
+        }
+        middleware = cls(crawler, por_defecto, settings.getdict("CONCURRENCIA_DOMINIOS"))
+        crawler.signals.connect(middleware.pedido_en_descargador, signal=signals.request_reached_downloader)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def _control(self, dominio):
+        control = self.controles.get(dominio)
+        if control is None:
+            control = ControlConcurrencia(**{**self.por_defecto, **self.dominios.get(dominio, {})})
+            self.controles[dominio] = control
+        return control
+
+    def _aplicar(self, request, control_fn):
+        # El slot (y meta["download_slot"]) lo crea el downloader recién
+        # después de los middlewares: la clave se calcula igual que él
+        downloader = self.crawler.engine.downloader
+        dominio = downloader.get_slot_key(request)
+        control = self._control(dominio)
+        control_fn(control)
+        slot = downloader.slots.get(dominio)
+        if slot is not None:
+            slot.concurrency = control.concurrencia
+            slot.delay = control.demora
+        self.crawler.stats.set_value(f"concurrencia/{dominio}", control.estadisticas())
+
+    def pedido_en_descargador(self, request, spider):
+        # El slot ya existe: el primer pedido a un dominio (o el primero
+        # después de que Scrapy descartó un slot inactivo) arranca con los
+        # límites del control y no con CONCURRENT_REQUESTS_PER_DOMAIN
+        slot = self.crawler.engine.downloader.slots.get(request.meta.get("download_slot"))
+        if slot is None:
+            return
+        control = self._control(request.meta["download_slot"])
+        if slot.concurrency != control.concurrencia or slot.delay != control.demora:
+            self._aplicar(request, lambda control: None)
+
+    def process_response(self, request, response, spider):
+        latencia = request.meta.get("download_latency")
+        if latencia is None or "cached" in response.flags:
+            # Servida por la cache, sin pedido a la red
+            return response
+        reintentar_en = segundos_retry_after(response.headers.get("Retry-After"))
+        self._aplicar(request, lambda control: control.respuesta(latencia, response.status, reintentar_en))
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self._aplicar(request, lambda control: control.error(type(exception).__name__))
+        return None
+
+    def spider_closed(self, spider, reason):
+        for dominio, control in self.controles.items():
+            stats = control.estadisticas()
+            spider.logger.info(
+                f"[CONCURRENCIA] {dominio}: {stats['respuestas']} respuestas, "
+                f"latencia media {stats['latencia_media']}s (máx {stats['latencia_maxima']}s), "
+                f"errores {stats['errores'] or 0}, lentas {stats['lentas']}, "
+                f"concurrencia final {stats['concurrencia']} (máx {stats['concurrencia_maxima']}), "
+                f"demora {stats['demora']}s"
+            )
@@ -4,15 +4,59 @@ import os
 ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
 sys.path.append(ROOT_PATH)
 
-from utils.embedding import embed, encontrar_producto_por_nombre_semantico
+import hashlib
+import time
+import numpy as np
+from utils.embedding import embed, embed_lote, encontrar_producto_por_nombre_semantico
 from utils.normalizar import normalizar
+from utils.precios import actualizar_precio_actual, actualizar_precios_actuales
+from utils.indice_vectorial import obtener_indice
+from utils.matcher_marcas import registrar_marca
+from utils.buscador import registrar_producto
+from utils.cache import incrementar_version_precios
+from utils.historial_precios import registrar_precio, registrar_precios, asegurar_particiones
+from utils.upsert import insertar_o_ignorar, upsert
+from utils.sinonimos_marca import resolver_aliases, agregar_sinonimos
+from utils.generar_alias import normalize_text
 from app import create_app, db
-from models import Producto, Supermercado, ProductoSupermercado, PrecioProducto, Marca
+from models import Producto, Supermercado, ProductoSupermercado, PrecioActual, Marca
+from unidades_medida import extraer_medida, extraer_medidas, UNIDAD_MODELO
 from datetime import date
+from precios_super.estado_paginas import guardar_huellas
+
+# Similitud mínima para considerar que dos nombres son el mismo producto
+UMBRAL_MISMO_PRODUCTO = 0.85
+
+# Campos del item que usa el pipeline: si ninguno cambió, el producto no se reprocesa
+CAMPOS_HUELLA = ("supermercado_nombre", "product_id", "nombre", "marca", "precio", "multiplicador", "url")
+
+
+def clave_marca(texto):
+    """
+    Clave de un texto de marca para resueltos/marcas_cache: la misma
+    normalización que marca_sinonimo ("ARCOR", "Arcor" y "arcor" son una).
+    """
+    return normalize_text(texto or "")
+
+
+def resolver_claves(textos):
+    """
+    resolver_aliases con el resultado indexado por clave_marca.
+    """
+    return {clave_marca(texto): resuelto for texto, resuelto in resolver_aliases(textos).items()}
+
+
+def huella_item(item):
+    """
+    Huella (sha1) de los datos de un item que terminan en la base.
+    """
+    datos = "\x1f".join(str(item.get(campo) or "") for campo in CAMPOS_HUELLA)
+    return hashlib.sha1(datos.encode("utf-8")).hexdigest()
+
 
 class DBPipeline:
 
-    def __init__(self):
+    def __init__(self, tam_lote=0, intervalo=5.0, crawl_id=None, incremental=False, ruta_paginas=None):
         # Crear app de Flask y activar contexto
         self.app = create_app()
         self.app.app_context().push()
@@ -20,37 +64,122 @@ class DBPipeline:
         # Cache en memoria: nombre_super -> supermercado_id (INT, no el objeto)
         self.supermercados_cache = {}
 
-    def process_unit_value(self, text): # TODO implementar para normalizar unidades y valores
-        pass
+        # Cache en memoria: clave_marca(texto de marca del item) -> marca resuelta (o None)
+        self.marcas_cache = {}
+
+        # Cambios a los índices en memoria (vectorial, de prefijos, de marcas)
+        # y entradas (cache, clave) de supermercados_cache/marcas_cache
+        # agregadas en la transacción abierta: los cambios se aplican recién
+        # después del commit y, si hay rollback, se descartan junto con esas
+        # entradas (ver _aplicar_memoria)
+        self.pendientes_memoria = []
+        self.claves_lote = []
+
+        # Modo por lotes: si tam_lote > 0 los items se acumulan y se escriben
+        # juntos cada `tam_lote` items o cada `intervalo` segundos.
+        self.tam_lote = tam_lote
+        self.intervalo = intervalo
+        self.buffer = []
+        self.ultimo_flush = time.monotonic()
+
+        # Métricas de throughput
+        self.items_procesados = 0
+        self.inicio = None
+
+        # Identificador de la corrida (lo pone el orquestador o -s CRAWL_ID=...)
+        self.crawl_id = crawl_id
+
+        # Crawl incremental: los productos con la misma huella que en el crawl
+        # anterior solo actualizan "visto" (sin embeddings ni normalización)
+        self.incremental = incremental
+        self.items_sin_cambios = 0
+
+        # Hashes de páginas (HuellaPaginaMiddleware) a guardar en ruta_paginas
+        # cuando se commiteen sus items, y páginas con algún item que falló
+        self.ruta_paginas = ruta_paginas
+        self.paginas_pendientes = []
+        self.paginas_fallidas = set()
 
-    def process_marca(self, text): # TODO: mejorar esta funcion con embeddings
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Lee el modo de escritura de los settings del proyecto/spider:
+          DB_PIPELINE_LOTE      -> items por commit (0 = un commit por item)
+          DB_PIPELINE_INTERVALO -> segundos máximos entre commits
+          CRAWL_ID              -> identificador de la corrida
+          CRAWL_INCREMENTAL     -> saltear productos que no cambiaron
+          INCREMENTAL_RUTA      -> estado de páginas del crawl incremental
+        """
+        pipeline = cls(
+            tam_lote=crawler.settings.getint("DB_PIPELINE_LOTE", 0),
+            intervalo=crawler.settings.getfloat("DB_PIPELINE_INTERVALO", 5.0),
+            crawl_id=crawler.settings.get("CRAWL_ID"),
+            incremental=crawler.settings.getbool("CRAWL_INCREMENTAL"),
+            ruta_paginas=crawler.settings.get("INCREMENTAL_RUTA", "estado_paginas.sqlite"),
+        )
+        pipeline.stats = crawler.stats
+        return pipeline
+
+    def open_spider(self, spider):
+        self.inicio = time.monotonic()
+        # En PostgreSQL, la partición del mes del historial tiene que existir
+        with self.app.app_context():
+            asegurar_particiones(date.today())
+
+    def process_unit_value(self, text, medida=None):
+        """
+        Normaliza unidad y valor de medida a partir del nombre del producto.
+        Retorna (unidad_medida, valor_medida) listos para Producto, con el
+        valor en unidad base (gramo, mililitro o unidad), o (None, None).
+        Se puede pasar una Medida ya extraída (modo por lotes).
+        """
+        medida = medida or extraer_medida(text)
+        if not medida:
+            return None, None
+        return UNIDAD_MODELO[medida.unidad_base], medida.valor_base
+
+    def process_marca(self, text, commit=True, resueltos=None): # TODO: mejorar esta funcion con embeddings
         """
         Procesa el nombre de una marca.
-        Si la marca ya existe en la DB (incluso como sinónimo), devuelve el
-        nombre de la marca existente.
-        Si no existe, crea un nuevo registro de Marca y devuelve su nombre.
+        Si el texto (o, si tiene varias palabras, alguna de ellas) es el nombre
+        o un sinónimo de una marca existente, devuelve el nombre de esa marca.
+        Si es una sola palabra desconocida, crea la Marca y devuelve su nombre.
         Si no se puede determinar una marca válida, devuelve None.
+        La búsqueda es una sola consulta sobre marca_sinonimo; en modo por lotes
+        se pasa `resueltos` ya calculado para todo el lote (ver resolver_claves),
+        indexado por clave_marca: una marca creada acá con un texto resuelve
+        también sus variantes de mayúsculas y acentos en el resto del lote.
+        Con commit=False la marca nueva solo se flushea (modo por lotes).
         """
-        marca_aislada = not(" " in text and len(text.split(" ")) > 1)
+        if not text:
+            return None
+
+        palabras = text.split()
+        if resueltos is None:
+            resueltos = resolver_claves([text, *palabras])
+
+        clave = clave_marca(text)
+        if clave in resueltos:
+            return resueltos[clave][1]
+
+        marca_aislada = len(palabras) <= 1
         if marca_aislada:
-            # comprobar si text es una marca existente en la db   
-            marca_existe = Marca.query.filter(Marca.sinonimos.contains([text])).first()
-            if marca_existe:
-                return text
             # crear registro en la DB de nueva marca
-            new_marca = Marca(
-                nombre=text,
-                sinonimos=[text]
-            )
+            new_marca = Marca(nombre=text)
             db.session.add(new_marca)
-            db.session.commit()
+            db.session.flush()
+            agregar_sinonimos(new_marca, [text])
+            self._al_commitear(registrar_marca, text, [text])
+            resueltos[clave] = (new_marca.id, text)
+            if commit:
+                db.session.commit()
+                self._aplicar_memoria()
             return text
 
-        for word in text.split(" "):
+        for word in palabras:
             # comprobar si word es una marca existente en la db
-            marca_existe = Marca.query.filter(Marca.sinonimos.contains([word])).first()
-            if marca_existe:
-                return word
+            if clave_marca(word) in resueltos:
+                return resueltos[clave_marca(word)][1]
             
         # logear: No se encontro coincidencia con las marcas de la DB.
         print(f"[WARN] No se encontro coincidencia de marca para: {text}")
@@ -67,43 +196,211 @@ class DBPipeline:
             print(f"--------------------------- Usando supermercado cacheado: {nombre} (ID: {supermercado_id})")
             return supermercado_id
 
-        # 2) Buscar en BD
-        supermercado = Supermercado.query.filter_by(nombre=nombre).first()
-        if not supermercado:
-            supermercado = Supermercado(
-                nombre=nombre,
-                url=url,
-                ciudad=ciudad
-            )
-            db.session.add(supermercado)
-            db.session.commit()  # para que tenga ID
-
-        supermercado_id = supermercado.id
+        # 2) Crear si no existe (ON CONFLICT sobre el nombre único) y leer el ID
+        insertar_o_ignorar(
+            Supermercado,
+            [{"nombre": nombre, "url": url, "ciudad": ciudad}],
+            conflicto=["nombre"],
+        )
+        db.session.commit()
+        supermercado_id = db.session.execute(
+            db.select(Supermercado.id).where(Supermercado.nombre == nombre)
+        ).scalar_one()
 
         # 3) Guardar en cache (solo el ID)
         self.supermercados_cache[nombre] = supermercado_id
-        print(f"--------------------------- Usando supermercado: {supermercado.nombre} (ID: {supermercado_id})")
+        print(f"--------------------------- Usando supermercado: {nombre} (ID: {supermercado_id})")
         return supermercado_id
 
+    def _item_valido(self, item):
+        if not item.get("supermercado_nombre"):
+            print("[ERROR] El item no tiene 'supermercado_nombre'. No se puede procesar.")
+            return False
+        if not item.get("supermercado_url"):
+            print("[ERROR] El item no tiene 'supermercado_url'. No se puede procesar.")
+            return False
+        return True
+
     def process_item(self, item, spider):
         """
         Procesa un item extraído por un spider.
         Guarda/actualiza la información en la base de datos.
         Retorna el item procesado.
         """
+        if item.get("pagina_procesada") is not None:
+            # Fin de una página: todos sus items llegaron antes que este
+            self.paginas_pendientes.append((item["pagina_procesada"], item["huella"]))
+            if not self.tam_lote:
+                self._guardar_paginas()
+            return item
+
+        if not self._item_valido(item):
+            return item
+
+        if self.tam_lote:
+            self.buffer.append(dict(item))
+            vencido = time.monotonic() - self.ultimo_flush >= self.intervalo
+            if len(self.buffer) >= self.tam_lote or vencido:
+                self.flush()
+            return item
+
+        try:
+            with self.app.app_context():
+                cambiados = self._separar_sin_cambios([item])
+                db.session.commit()
+            if cambiados:
+                self._procesar_item(item)
+        except Exception:
+            with self.app.app_context():
+                db.session.rollback()
+            self._descartar_memoria()
+            self._marcar_fallidas([item])
+            raise
+        self.items_procesados += 1
+        return item
+
+    def _al_commitear(self, funcion, *args):
+        """
+        Deja pendiente un cambio a un índice en memoria hasta el próximo
+        commit: con un rollback SQLite vuelve a dar los mismos ids, y el
+        índice quedaría apuntando a otro producto (o a uno que no existe).
+        """
+        self.pendientes_memoria.append((funcion, args))
+
+    def _aplicar_memoria(self):
+        """
+        Después de un commit: aplica los cambios pendientes a los índices.
+        """
+        pendientes, self.pendientes_memoria = self.pendientes_memoria, []
+        self.claves_lote = []
+        for funcion, args in pendientes:
+            funcion(*args)
+
+    def _descartar_memoria(self):
+        """
+        Después de un rollback: descarta los cambios pendientes y los
+        supermercados y marcas cacheados en la transacción (pueden ser filas
+        que ya no existen).
+        """
+        self.pendientes_memoria = []
+        for cache, clave in self.claves_lote:
+            cache.pop(clave, None)
+        self.claves_lote = []
+
+    def _marcar_fallidas(self, items):
+        """
+        Las páginas de estos items no se registran como procesadas: en el
+        próximo crawl incremental se vuelven a escribir completas.
+        """
+        self.paginas_fallidas.update(item["pagina_url"] for item in items if item.get("pagina_url"))
+
+    def _guardar_paginas(self):
+        """
+        Guarda el hash de las páginas cuyos items ya están commiteados.
+        """
+        pendientes, self.paginas_pendientes = self.paginas_pendientes, []
+        huellas = [(url, huella) for url, huella in pendientes if url not in self.paginas_fallidas]
+        if huellas and self.ruta_paginas:
+            guardar_huellas(self.ruta_paginas, huellas)
+            stats = getattr(self, "stats", None)
+            if stats is not None:
+                stats.inc_value("incremental/paginas_registradas", len(huellas))
+
+    # ------------------------------------------------------------------ #
+    # Crawl incremental
+    # ------------------------------------------------------------------ #
+
+    def _tocar_vistos(self, ps_ids, hoy):
+        """
+        Productos que siguen publicados sin cambios: actualiza ultima_vez_visto,
+        extiende el tramo de precio vigente y la fecha de precio_actual.
+        Son tres sentencias para todo el lote. No hace commit.
+        """
+        if not ps_ids:
+            return
+        db.session.execute(
+            db.update(ProductoSupermercado)
+            .where(ProductoSupermercado.id.in_(ps_ids))
+            .values(ultima_vez_visto=hoy)
+        )
+        vigentes = db.session.execute(
+            db.select(PrecioActual.producto_supermercado_id, PrecioActual.precio, PrecioActual.moneda)
+            .where(PrecioActual.producto_supermercado_id.in_(ps_ids))
+        ).all()
+        registrar_precios([(ps_id, precio, moneda, hoy) for ps_id, precio, moneda in vigentes])
+        db.session.execute(
+            db.update(PrecioActual)
+            .where(PrecioActual.producto_supermercado_id.in_(ps_ids), PrecioActual.fecha < hoy)
+            .values(fecha=hoy)
+        )
+
+    def _separar_sin_cambios(self, items):
+        """
+        Resuelve lo que no hace falta volver a procesar y devuelve el resto:
+          - items {"sin_cambios": [product_id, ...]} que mandan los spiders
+            por cada página igual a la del crawl anterior;
+          - con el modo incremental, items cuya huella coincide con la guardada.
+        A esos productos solo se les toca "visto" (ver _tocar_vistos).
+        No hace commit.
+        """
+        paginas = [item for item in items if item.get("sin_cambios") is not None]
+        productos = [item for item in items if item.get("sin_cambios") is None]
+        consultar = paginas + (
+            [item for item in productos if item.get("product_id")] if self.incremental else []
+        )
+        if not consultar:
+            return productos
+
+        supermercados = self._resolver_supermercados(consultar)
+        claves = set()
+        for item in paginas:
+            superm_id = supermercados[item["supermercado_nombre"]]
+            claves.update((superm_id, str(codigo)) for codigo in item["sin_cambios"] if codigo)
+        for item in consultar[len(paginas):]:
+            claves.add((supermercados[item["supermercado_nombre"]], str(item["product_id"])))
+
+        # Una consulta por supermercado: supermercado_id = ? AND
+        # codigo_externo IN (...) usa ix_producto_supermercado_codigo
+        codigos_por_super = {}
+        for superm_id, codigo in claves:
+            codigos_por_super.setdefault(superm_id, []).append(codigo)
+        conocidos = {}
+        for superm_id, codigos in codigos_por_super.items():
+            for ps_id, codigo, huella in db.session.execute(
+                db.select(ProductoSupermercado.id, ProductoSupermercado.codigo_externo, ProductoSupermercado.huella)
+                .where(
+                    ProductoSupermercado.supermercado_id == superm_id,
+                    ProductoSupermercado.codigo_externo.in_(codigos),
+                )
+            ):
+                conocidos.setdefault((superm_id, codigo), (ps_id, huella))
+
+        vistos = [ps_id for ps_id, _ in conocidos.values()] if paginas else []
+        cambiados = []
+        for item in productos:
+            conocido = None
+            if self.incremental and item.get("product_id"):
+                clave = (supermercados[item["supermercado_nombre"]], str(item["product_id"]))
+                conocido = conocidos.get(clave)
+            if conocido and conocido[1] == huella_item(item):
+                vistos.append(conocido[0])
+                self.items_sin_cambios += 1
+            else:
+                cambiados.append(item)
+
+        self._tocar_vistos(sorted(set(vistos)), date.today())
+        return cambiados
+
+    def _procesar_item(self, item):
+        """
+        Modo item por item: un commit por producto.
+        """
         with self.app.app_context():
             # ---- SUPERMERCADO ----
             nombre_super = item.get("supermercado_nombre", None)
             url_super = item.get("supermercado_url", None)
             ciudad_super = item.get("supermercado_ciudad", None)  # puede ser None
 
-            if not nombre_super:
-                print("[ERROR] El item no tiene 'supermercado_nombre'. No se puede procesar.")
-                return item
-            if not url_super:
-                print("[ERROR] El item no tiene 'supermercado_url'. No se puede procesar.")
-                return item
-
             supermercado_id = self.get_or_create_supermercado(
                 nombre=nombre_super,
                 url=url_super,
@@ -113,40 +410,52 @@ class DBPipeline:
             # ---- PRODUCTO ----
             # producto = Producto.query.filter_by(nombre=item["nombre"]).first()
             marca = self.process_marca(item.get("marca"))
-            producto, sim = encontrar_producto_por_nombre_semantico(item["nombre"], marca)
-            if not producto or sim < 0.85:
+            embedding_nombre = embed(item["nombre"])
+            producto, sim = encontrar_producto_por_nombre_semantico(
+                item["nombre"], marca, embedding=embedding_nombre
+            )
+            if not producto or sim < UMBRAL_MISMO_PRODUCTO:
+                unidad_medida, valor_medida = self.process_unit_value(item["nombre"])
                 producto = Producto(
                     nombre=item["nombre"],
-                    embedding=embed(item["nombre"]),
                     marca_id=Marca.query.filter_by(nombre=marca).first().id if marca else None,
-                    unidad_medida=item.get("unidad"),
-                    valor_medida=item.get("multiplicador")
+                    unidad_medida=unidad_medida,
+                    valor_medida=valor_medida
                 )
+                producto.set_vector(embedding_nombre)
                 db.session.add(producto)
                 db.session.flush()
+                # Mantener el índice vectorial al día con el producto nuevo
+                self._al_commitear(obtener_indice().agregar, producto.id, producto.marca_id, embedding_nombre)
+                self._al_commitear(registrar_producto, producto.id, producto.nombre)
             print(f"XXXXXXXXXXXXXXXXXXXXXXXXXXXXXX   Procesando producto: {producto.nombre} (ID: {producto.id})")
 
             # ---- PRODUCTO x SUPERMERCADO ----
-            prod_super = ProductoSupermercado.query.filter_by(
-                producto_id=producto.id,
-                supermercado_id=supermercado_id
-            ).first()
-
-            if not prod_super:
-                prod_super = ProductoSupermercado(
-                    producto_id=producto.id,
-                    supermercado_id=supermercado_id,
-                    nombre_externo=item.get("nombre"),
-                    codigo_externo=item.get("product_id"),
-                    url=item.get("url"),
-                    marca=marca,
-                    cantidad=item.get("multiplicador")
-                )
-                db.session.add(prod_super)
-                db.session.flush()
+            # Upsert sobre (producto_id, supermercado_id): si ya existe no se
+            # pisa nada y RETURNING devuelve el id de la fila existente
+            prod_super_id = upsert(
+                ProductoSupermercado,
+                {
+                    "producto_id": producto.id,
+                    "supermercado_id": supermercado_id,
+                    "nombre_externo": item.get("nombre"),
+                    "codigo_externo": item.get("product_id"),
+                    "url": item.get("url"),
+                    "marca": marca,
+                    "cantidad": item.get("multiplicador"),
+                    "huella": huella_item(item),
+                    "ultima_vez_visto": date.today(),
+                },
+                conflicto=["producto_id", "supermercado_id"],
+                actualizar=lambda sentencia: {
+                    "huella": sentencia.excluded.huella,
+                    "ultima_vez_visto": sentencia.excluded.ultima_vez_visto,
+                },
+                devolver=ProductoSupermercado.id,
+            )
 
             print(
-                f"ProductoSupermercado ID: {prod_super.id} "
+                f"ProductoSupermercado ID: {prod_super_id} "
                 f"para producto ID: {producto.id} en super {nombre_super}"
             )
 
@@ -160,16 +469,17 @@ class DBPipeline:
                     precio_float = None
 
                 if precio_float is not None:
-                    precio_row = PrecioProducto(
-                        producto_supermercado_id=prod_super.id,
-                        precio=precio_float,
+                    # Historial por tramos: si el precio no cambió solo se extiende
+                    registrar_precio(prod_super_id, precio_float, moneda="ARS", fecha=date.today())
+                    actualizar_precio_actual(
+                        prod_super_id,
+                        precio_float,
                         moneda="ARS",
                         fecha=date.today(),
                     )
-                    db.session.add(precio_row)
                     print(
                         f"Precio registrado: {precio_float} para "
-                        f"ProductoSupermercado ID: {prod_super.id} "
+                        f"ProductoSupermercado ID: {prod_super_id} "
                         f"en {date.today()} ({nombre_super})"
                     )
 
@@ -177,6 +487,264 @@ class DBPipeline:
             normalizar(item["nombre"])
 
             db.session.commit()
+            self._aplicar_memoria()
 
-        return item
+    # ------------------------------------------------------------------ #
+    # Modo por lotes
+    # ------------------------------------------------------------------ #
+
+    def flush(self):
+        """
+        Escribe todos los items acumulados en el buffer con un solo commit.
+        """
+        if not self.buffer:
+            self._guardar_paginas()
+            return
+
+        items, self.buffer = self.buffer, []
+        with self.app.app_context():
+            try:
+                cambiados = self._separar_sin_cambios(items)
+                if cambiados:
+                    self._escribir_lote(cambiados)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self._descartar_memoria()
+                self._marcar_fallidas(items)
+                raise
+            self._aplicar_memoria()
+            self._guardar_paginas()
+
+            # normalizar() revisa intervenciones y registra pendientes en el CSV
+            for item in cambiados:
+                normalizar(item["nombre"])
+
+        self.items_procesados += len(items)
+        self.ultimo_flush = time.monotonic()
+        print(
+            f"[LOTE] {len(items)} items escritos, {len(items) - len(cambiados)} sin cambios "
+            f"(total: {self.items_procesados})"
+        )
+
+    def _resolver_supermercados(self, items):
+        """
+        Devuelve nombre -> supermercado_id para todos los supers del lote,
+        con una sola consulta IN para los que no están en cache.
+        """
+        faltantes = {
+            item["supermercado_nombre"]: item
+            for item in items
+            if item["supermercado_nombre"] not in self.supermercados_cache
+        }
+        if faltantes:
+            insertar_o_ignorar(
+                Supermercado,
+                [
+                    {
+                        "nombre": nombre,
+                        "url": item.get("supermercado_url"),
+                        "ciudad": item.get("supermercado_ciudad"),
+                    }
+                    for nombre, item in faltantes.items()
+                ],
+                conflicto=["nombre"],
+            )
+            for superm_id, nombre in db.session.execute(
+                db.select(Supermercado.id, Supermercado.nombre).where(Supermercado.nombre.in_(faltantes))
+            ):
+                self.supermercados_cache[nombre] = superm_id
+                self.claves_lote.append((self.supermercados_cache, nombre))
+
+        return self.supermercados_cache
+
+    def _resolver_marcas(self, items):
+        """
+        Devuelve (clave_marca(texto) -> marca resuelta, nombre de marca -> marca_id)
+        para el lote. Cada marca distinta (sin distinguir mayúsculas ni acentos)
+        se resuelve una sola vez por crawl, con el primer texto que aparece.
+        """
+        textos = {}
+        for item in items:
+            clave = clave_marca(item.get("marca"))
+            if clave not in self.marcas_cache:
+                textos.setdefault(clave, item.get("marca"))
+        if textos:
+            # Una sola consulta de alias para todos los textos nuevos y sus palabras
+            resueltos = resolver_claves(
+                [t for texto in textos.values() if texto for t in (texto, *texto.split())]
+            )
+            for clave, texto in textos.items():
+                self.marcas_cache[clave] = self.process_marca(texto, commit=False, resueltos=resueltos)
+            self.claves_lote.extend((self.marcas_cache, clave) for clave in textos)
 
+        nombres = {self.marcas_cache[clave_marca(item.get("marca"))] for item in items} - {None}
+        ids = {}
+        if nombres:
+            for marca_id, nombre in (
+                Marca.query.with_entities(Marca.id, Marca.nombre)
+                .filter(Marca.nombre.in_(nombres))
+                .order_by(Marca.id.asc())
+            ):
+                ids.setdefault(nombre, marca_id)
+        return self.marcas_cache, ids
+
+    def _escribir_lote(self, items):
+        supermercados = self._resolver_supermercados(items)
+        marcas, marca_ids = self._resolver_marcas(items)
+
+        # ---- EMBEDDINGS: una sola pasada del modelo para todo el lote ----
+        embeddings = embed_lote([item["nombre"] for item in items])
+        medidas = extraer_medidas([item["nombre"] for item in items])
+
+        # ---- PRODUCTOS ----
+        indice = obtener_indice()
+        productos = []          # producto (o id existente) de cada item
+        nuevos = []             # (producto, marca_id, vector) creados en este lote
+
+        for item, vector, medida in zip(items, embeddings, medidas):
+            marca = marcas[clave_marca(item.get("marca"))]
+            marca_id = marca_ids.get(marca)
+
+            mejor = None
+            mejor_similitud = -1.0
+
+            resultados = indice.buscar(vector, marca_id, k=1)
+            if resultados:
+                mejor, mejor_similitud = resultados[0]
+
+            # También comparar contra los productos nuevos del mismo lote
+            candidatos = [(p, v) for p, m, v in nuevos if m == marca_id]
+            if candidatos:
+                similitudes = np.vstack([v for _, v in candidatos]) @ vector
+                i = int(np.argmax(similitudes))
+                if similitudes[i] > mejor_similitud:
+                    mejor, mejor_similitud = candidatos[i][0], float(similitudes[i])
+
+            if mejor is None or mejor_similitud < UMBRAL_MISMO_PRODUCTO:
+                unidad_medida, valor_medida = self.process_unit_value(item["nombre"], medida)
+                mejor = Producto(
+                    nombre=item["nombre"],
+                    marca_id=marca_id,
+                    unidad_medida=unidad_medida,
+                    valor_medida=valor_medida,
+                )
+                mejor.set_vector(vector)
+                nuevos.append((mejor, marca_id, vector))
+
+            productos.append(mejor)
+
+        if nuevos:
+            db.session.add_all([p for p, _, _ in nuevos])
+            db.session.flush()
+            for producto, marca_id, vector in nuevos:
+                self._al_commitear(indice.agregar, producto.id, marca_id, vector)
+                self._al_commitear(registrar_producto, producto.id, producto.nombre)
+
+        producto_ids = [p if isinstance(p, int) else p.id for p in productos]
+
+        # ---- PRODUCTO x SUPERMERCADO: un INSERT ON CONFLICT + una consulta IN ----
+        # Si dos items del lote caen en el mismo producto del mismo super se
+        # escribe solo el primero (fila, huella y precio); el otro se avisa
+        pares = {}
+        for producto_id, item in zip(producto_ids, items):
+            par = (producto_id, supermercados[item["supermercado_nombre"]])
+            if par in pares:
+                primero = pares[par]
+                print(
+                    f"[WARN] '{item['nombre']}' ({item.get('product_id')}) es el mismo producto "
+                    f"(ID: {producto_id}) que '{primero['nombre']}' ({primero.get('product_id')}) "
+                    f"en {item['supermercado_nombre']}: se ignora"
+                )
+                continue
+            pares[par] = item
+        # Los pares que ya existen se saltean por el índice único (ON CONFLICT)
+        insertar_o_ignorar(
+            ProductoSupermercado,
+            [
+                {
+                    "producto_id": producto_id,
+                    "supermercado_id": supermercado_id,
+                    "nombre_externo": item.get("nombre"),
+                    "codigo_externo": item.get("product_id"),
+                    "url": item.get("url"),
+                    "marca": marcas[clave_marca(item.get("marca"))],
+                    "cantidad": item.get("multiplicador"),
+                }
+                for (producto_id, supermercado_id), item in pares.items()
+            ],
+            conflicto=["producto_id", "supermercado_id"],
+        )
+        hoy = date.today()
+        # Una consulta por supermercado (normalmente uno por lote): con
+        # supermercado_id = ? AND producto_id IN (...) SQLite usa el índice;
+        # con (producto_id, supermercado_id) IN (...) recorre el índice entero
+        productos_por_super = {}
+        for producto_id, supermercado_id in pares:
+            productos_por_super.setdefault(supermercado_id, []).append(producto_id)
+        existentes = {}
+        for supermercado_id, ids in productos_por_super.items():
+            for ps_id, producto_id in db.session.execute(
+                db.select(ProductoSupermercado.id, ProductoSupermercado.producto_id)
+                .where(
+                    ProductoSupermercado.supermercado_id == supermercado_id,
+                    ProductoSupermercado.producto_id.in_(ids),
+                )
+            ):
+                existentes[(producto_id, supermercado_id)] = ps_id
+
+        # Huella de lo scrapeado, para que el próximo crawl incremental lo saltee
+        db.session.execute(
+            db.update(ProductoSupermercado),
+            [
+                {"id": existentes[par], "huella": huella_item(item), "ultima_vez_visto": hoy}
+                for par, item in pares.items()
+            ],
+        )
+
+        # ---- PRECIOS: historial por tramos y precio vigente ----
+        precios = []
+        for par, item in pares.items():
+            precio = item.get("precio")
+            if precio is None:
+                continue
+            try:
+                precio_float = float(precio)
+            except (TypeError, ValueError):
+                print(f"[WARN] Precio inválido para {item['nombre']}: {precio}")
+                continue
+            precios.append((existentes[par], precio_float, "ARS", hoy))
+
+        if precios:
+            registrar_precios(precios)
+            actualizar_precios_actuales(precios)
+
+    def close_spider(self, spider):
+        """
+        Al terminar el crawl escribe lo que quedó en el buffer, informa el
+        throughput, avisa a la web que hay precios nuevos (invalida sus caches)
+        y guarda el índice vectorial en disco para que los demás procesos lo
+        carguen sin reconstruirlo.
+        """
+        self.flush()
+
+        if self.inicio is not None:
+            segundos = max(time.monotonic() - self.inicio, 1e-9)
+            items_por_segundo = self.items_procesados / segundos
+            modo = f"lotes de {self.tam_lote}" if self.tam_lote else "item por item"
+            corrida = f", crawl {self.crawl_id}" if self.crawl_id else ""
+            print(
+                f"[THROUGHPUT] {self.items_procesados} items en {segundos:.1f}s "
+                f"= {items_por_segundo:.1f} items/s ({modo}{corrida}), "
+                f"{self.items_sin_cambios} productos sin cambios"
+            )
+            stats = getattr(self, "stats", None)
+            if stats is not None:
+                stats.set_value("db_pipeline/items", self.items_procesados)
+                stats.set_value("db_pipeline/items_por_segundo", round(items_por_segundo, 2))
+                stats.set_value("db_pipeline/items_sin_cambios", self.items_sin_cambios)
+
+        with self.app.app_context():
+            if self.items_procesados:
+                incrementar_version_precios()
+            obtener_indice().guardar()
@@ -22,9 +22,23 @@ ADDONS = {}
 ROBOTSTXT_OBEY = False
 
 # Concurrency and throttling settings
-#CONCURRENT_REQUESTS = 16
-CONCURRENT_REQUESTS_PER_DOMAIN = 1
-DOWNLOAD_DELAY = 1
+# Con CONCURRENCIA_ADAPTATIVA, CONCURRENT_REQUESTS_PER_DOMAIN y DOWNLOAD_DELAY
+# son solo el punto de partida de cada dominio: ConcurrenciaAdaptativaMiddleware
+# sube la concurrencia mientras las respuestas vienen bien y la baja (y
+# agrega demora) con 429/5xx, errores o respuestas lentas.
+CONCURRENT_REQUESTS = 32
+CONCURRENT_REQUESTS_PER_DOMAIN = 2
+DOWNLOAD_DELAY = 0.5
+
+CONCURRENCIA_ADAPTATIVA = True
+CONCURRENCIA_MINIMA = 1
+CONCURRENCIA_MAXIMA = 8
+# Respuestas más lentas que esto (segundos) también bajan la concurrencia
+CONCURRENCIA_LATENCIA_OBJETIVO = 2.0
+CONCURRENCIA_DEMORA_MAXIMA = 30.0
+# Límites por dominio ({"dominio": {"maximo": 16, ...}}), normalmente en los
+# custom_settings de cada spider
+CONCURRENCIA_DOMINIOS = {}
 
 # Disable cookies (enabled by default)
 #COOKIES_ENABLED = False
@@ -40,15 +54,22 @@ DOWNLOAD_DELAY = 1
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "precios_super.middlewares.PreciosSuperSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    # Crawl incremental: marca de fin de página para guardar su hash (ver DBPipeline)
+    "precios_super.middlewares.HuellaPaginaMiddleware": 543,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "precios_super.middlewares.PreciosSuperDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    "precios_super.middlewares.CambiosPaginaMiddleware": 543,
+    # HTTPCACHE sin copias viejas: solo 304, nunca por un 5xx o un timeout
+    "scrapy.downloadermiddlewares.httpcache.HttpCacheMiddleware": None,
+    "precios_super.middlewares.CachePreciosMiddleware": 900,
+    # Después de la cache (900): ve los 304, 429/5xx y timeouts de la red
+    # tal como llegan, antes que la cache y el RetryMiddleware (550)
+    "precios_super.middlewares.ConcurrenciaAdaptativaMiddleware": 950,
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -65,7 +86,32 @@ ITEM_PIPELINES = {
     'precios_super.pipelines.DBPipeline': 300,
 }
 
+# Escritura por lotes del DBPipeline: un commit cada N items o cada T segundos.
+# Con DB_PIPELINE_LOTE = 0 vuelve al modo de un commit por item.
+DB_PIPELINE_LOTE = 200
+DB_PIPELINE_INTERVALO = 5.0
+
+# Orquestador (orquestador.py): los spiders mandan los items al proceso
+# escritor en tandas de COLA_TANDA items o cada COLA_INTERVALO segundos.
+COLA_TANDA = 100
+COLA_INTERVALO = 1.0
+
+# Crawl incremental: las páginas iguales a las del último crawl y los
+# productos con la misma huella solo actualizan "visto". Para forzar un
+# crawl completo: -s CRAWL_INCREMENTAL=0
+CRAWL_INCREMENTAL = True
+INCREMENTAL_RUTA = "estado_paginas.sqlite"
+
+# Prioridad de fuentes de precio de Coto (coto_parser.POLITICAS_PRECIO):
+# "promocion" (lo que se paga hoy) o "lista"
+COTO_POLITICA_PRECIO = "promocion"
+
+# Páginas de Coto de este tamaño (bytes) o más se parsean en streaming
+# (coto_parser.iter_page): más lento, pero sin armar el JSON completo en memoria
+COTO_UMBRAL_STREAMING = 4 * 1024 * 1024
+
 # Enable and configure the AutoThrottle extension (disabled by default)
+# No se usa junto con CONCURRENCIA_ADAPTATIVA: los dos tocan la demora del slot
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 #AUTOTHROTTLE_ENABLED = True
 # The initial download delay
@@ -80,9 +126,14 @@ ITEM_PIPELINES = {
 
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
+# Con PoliticaCachePrecios cada página se vuelve a pedir con If-None-Match /
+# If-Modified-Since y solo un 304 se sirve desde la cache (crawl
+# incremental). Nunca se usa una copia sin preguntar, ni en lugar de un 5xx
+# o un error de descarga (ver CachePreciosMiddleware), en ningún crawl.
+HTTPCACHE_ENABLED = True
+HTTPCACHE_POLICY = "precios_super.middlewares.PoliticaCachePrecios"
 #HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
+HTTPCACHE_DIR = "httpcache"
 #HTTPCACHE_IGNORE_HTTP_CODES = []
 #HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
 
@@ -1,19 +1,38 @@
 import scrapy
 import json
+import re
+from urllib.parse import urlparse
+
+URL_BUSQUEDA = "https://www.carrefour.com.ar/api/catalog_system/pub/products/search/"
+# Header "resources" de VTEX: "0-49/1234"
+RESOURCES = re.compile(r"(\d+)-(\d+)/(\d+)")
 
 
 class CarrefourCategoriasSpider(scrapy.Spider):
     name = "carrefour"
+    # Productos por pedido y máximo de resultados que pagina la API de VTEX
+    # (más allá de _from=2500 devuelve error)
+    TAM_PAGINA = 50
+    MAX_RESULTADOS = 2500
     start_urls = [
         "https://www.carrefour.com.ar/api/catalog_system/pub/category/tree/3/"
     ]
     custom_settings = {
         "LOG_LEVEL": "INFO",
+        # La API de catálogo de VTEX aguanta bastante en paralelo
+        "CONCURRENCIA_DOMINIOS": {
+            "www.carrefour.com.ar": {"maximo": 16, "latencia_objetivo": 1.5},
+        },
+        # Páginas por lote cuando la API no manda el total (header "resources")
+        "CARREFOUR_LOTE_ESPECULATIVO": 4,
     }
 
     def __init__(self, *args, **kwargs):
             super().__init__(*args, **kwargs)
             self.total_productos = 0
+            # Un producto está en varias categorías hoja: se emite completo
+            # una sola vez (ver _nuevo)
+            self.productos_vistos = set()
 
     def extraer_productos_categoria(self, data):
         """
@@ -81,33 +100,91 @@ class CarrefourCategoriasSpider(scrapy.Spider):
     def parse(self, response):
         data = json.loads(response.text)
 
+        # Solo las categorías hoja: los resultados de una categoría padre son
+        # la unión de los de sus hijas, así que pedir las dos repite páginas.
+        # Se identifican por la ruta completa (nombres repetidos en distintas
+        # ramas son categorías distintas) y se descartan rutas duplicadas.
         categorias = []
+        vistas = set()
 
-        def recorrer_nodo(nodo):
+        def recorrer_nodo(nodo, ruta):
             nombre = nodo.get("name")
             if nombre:
-                categorias.append(nombre.replace(" ", "-"))
+                ruta = ruta + [nombre.replace(" ", "-")]
+            hijos = nodo.get("children") or []
 
             # hijos (subcategorías)
-            for child in nodo.get("children", []):
-                recorrer_nodo(child)
+            for child in hijos:
+                recorrer_nodo(child, ruta)
+
+            if not hijos and ruta:
+                camino = urlparse(nodo.get("url") or "").path.strip("/") or "/".join(ruta)
+                if camino not in vistas:
+                    vistas.add(camino)
+                    categorias.append(camino)
 
         for nodo in data:
-            recorrer_nodo(nodo)
+            recorrer_nodo(nodo, [])
 
-        self.logger.info(f"Encontradas {len(categorias)} categorías")
+        self.logger.info(f"Encontradas {len(categorias)} categorías hoja")
 
         for categoria in categorias:
-            url = (
-                f"https://www.carrefour.com.ar/api/catalog_system/pub/products/search/"
-                f"{categoria}?_from=0&_to=49"
-            )
-            yield scrapy.Request(
-                url,
-                callback=self.parse_categoria,
-                meta={"categoria_slug": categoria, "desde": 0, "hasta": 49}
-            )
-        
+            yield self._pedir_pagina(categoria, 0, primera=True)
+
+    def _pedir_pagina(self, categoria_slug, desde, primera=False, fin_lote=False):
+        hasta = desde + self.TAM_PAGINA - 1
+        return scrapy.Request(
+            f"{URL_BUSQUEDA}{categoria_slug}?_from={desde}&_to={hasta}",
+            callback=self.parse_categoria,
+            meta={
+                "categoria_slug": categoria_slug,
+                "desde": desde,
+                "hasta": hasta,
+                "primera": primera,
+                "fin_lote": fin_lote,
+            },
+        )
+
+    def _total_resultados(self, response):
+        """
+        Total de resultados de la categoría según el header "resources"
+        (ej "0-49/1234"), o None si no vino.
+        """
+        valor = response.headers.get("resources")
+        m = RESOURCES.search(valor.decode("latin-1")) if valor else None
+        return int(m.group(3)) if m else None
+
+    def _lote_especulativo(self, categoria_slug, desde):
+        """
+        Sin total conocido: pide las próximas CARREFOUR_LOTE_ESPECULATIVO
+        páginas juntas. La última del lote, si vuelve llena, pide el lote
+        siguiente; a lo sumo se desperdician las páginas vacías de un lote.
+        """
+        tam_lote = max(1, self.settings.getint("CARREFOUR_LOTE_ESPECULATIVO", 4))
+        inicios = [
+            d for d in range(desde, desde + tam_lote * self.TAM_PAGINA, self.TAM_PAGINA)
+            if d < self.MAX_RESULTADOS
+        ]
+        for d in inicios:
+            yield self._pedir_pagina(categoria_slug, d, fin_lote=(d == inicios[-1]))
+
+    def _nuevo(self, product_id):
+        """
+        True la primera vez que se emite completo un product_id (y si no
+        tiene). Las páginas "sin_cambios" no cuentan: ese item no escribe
+        nada para un producto que no está en la base, y como el hash de cada
+        página se guarda por separado, un producto salteado en las demás
+        podría no escribirse nunca. Lo que se saltea acá siempre salió
+        completo en otra página; si el lote de esa página falla, no se
+        registra y en el próximo crawl se vuelve a emitir completa.
+        """
+        if not product_id:
+            return True
+        if product_id in self.productos_vistos:
+            return False
+        self.productos_vistos.add(product_id)
+        return True
+
     def parse_categoria(self, response):
         categoria_slug = response.meta["categoria_slug"]
         desde = response.meta["desde"]
@@ -115,36 +192,48 @@ class CarrefourCategoriasSpider(scrapy.Spider):
 
         data = json.loads(response.text)
         self.logger.info(f"[{categoria_slug}] {len(data)} productos en rango {desde}-{hasta}")
-        productos = self.extraer_productos_categoria(data)
-        self.total_productos += len(productos)
-
-        for p in productos:
-            yield p
-
-        # Si devolvió productos, intento pedir la siguiente "página"
-        if data:
-            siguiente_desde = hasta + 1
-            siguiente_hasta = hasta + 50  # mismo tamaño de ventana
-            next_url = (
-                f"https://www.carrefour.com.ar/api/catalog_system/pub/products/search/"
-                f"{categoria_slug}?_from={siguiente_desde}&_to={siguiente_hasta}"
-            )
-
-            self.logger.info(f"[{categoria_slug}] siguiente página {siguiente_desde}-{siguiente_hasta}")
-            yield scrapy.Request(
-                next_url,
-                callback=self.parse_categoria,
-                meta={
-                    "categoria_slug": categoria_slug,
-                    "desde": siguiente_desde,
-                    "hasta": siguiente_hasta,
+
+        if response.meta.get("pagina_sin_cambios"):
+            # Igual que en el crawl anterior: solo avisar que siguen publicados.
+            # No los marca como vistos: si aparecen completos en otra página
+            # (cambiada) ahí se escriben igual
+            ids = [
+                prod.get("productId") for prod in data
+                if prod.get("productId") and prod.get("productId") not in self.productos_vistos
+            ]
+            if ids:
+                yield {
+                    "sin_cambios": ids,
+                    "supermercado_nombre": "Carrefour",
+                    "supermercado_url": "https://www.carrefour.com.ar/",
                 }
-            )
+        else:
+            productos = [p for p in self.extraer_productos_categoria(data) if self._nuevo(p["product_id"])]
+            self.total_productos += len(productos)
+
+            for p in productos:
+                yield p
+
+        # Paginado: desde la primera página se piden todas las demás juntas,
+        # así una categoría tarda lo que permita la concurrencia y no una
+        # cadena de pedidos de a uno
+        if response.meta.get("primera") and len(data) >= self.TAM_PAGINA:
+            total = self._total_resultados(response)
+            if total is None:
+                yield from self._lote_especulativo(categoria_slug, hasta + 1)
+            else:
+                if total > self.MAX_RESULTADOS:
+                    self.logger.warning(
+                        f"[{categoria_slug}] {total} resultados: la API solo pagina "
+                        f"los primeros {self.MAX_RESULTADOS}"
+                    )
+                inicios = range(hasta + 1, min(total, self.MAX_RESULTADOS), self.TAM_PAGINA)
+                self.logger.info(f"[{categoria_slug}] {total} resultados, {len(inicios)} páginas más")
+                for siguiente_desde in inicios:
+                    yield self._pedir_pagina(categoria_slug, siguiente_desde)
+        elif response.meta.get("fin_lote") and len(data) >= self.TAM_PAGINA:
+            yield from self._lote_especulativo(categoria_slug, hasta + 1)
 
         self.logger.info(
             f"[{categoria_slug}] acumulado total_productos = {self.total_productos}"
         )
-
-
-            
-        
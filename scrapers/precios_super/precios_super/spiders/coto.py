@@ -1,9 +1,10 @@
 import scrapy
+import hashlib
 import json
-import re
+import os
 import math
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
-from coto_parser import extract_products_from_root
+from coto_parser import parse_page, validar_politica, ERRORES_JSON, UMBRAL_STREAMING
 
 class CotoSpider(scrapy.Spider):
     name = "coto"
@@ -16,185 +17,21 @@ class CotoSpider(scrapy.Spider):
         ),
         "ROBOTSTXT_OBEY": False,
         "COOKIES_ENABLED": True,   # MUY IMPORTANTE
+        # Las páginas de Endeca son pesadas: pocas en paralelo
+        "CONCURRENCIA_DOMINIOS": {
+            "www.cotodigital.com.ar": {"maximo": 4, "latencia_objetivo": 3.0},
+        },
     }
 
-    # ------------------------------------------------------------------ #
-    # Helpers
-    # ------------------------------------------------------------------ #
-    @staticmethod
-    def _first(value, default=None):
-        """Devuelve el primer elemento si es lista, o el valor tal cual."""
-        if isinstance(value, list):
-            return value[0] if value else default
-        return value if value is not None else default
-
-    @staticmethod
-    def _extract_number(s):
-        """
-        Extrae un número razonable de un string.
-
-        Maneja:
-        - "$19.199,20"    -> 19199.2
-        - "$19199.20"     -> 19199.2
-        - "Precio Regular: $23999" -> 23999.0
-        - "23999.000000"  -> 23999.0
-        """
-        if not s:
-            return None
-
-        s = str(s)
-
-        # primer bloque "numérico" que encontremos
-        m = re.search(r"[0-9][0-9.,]*", s)
-        if not m:
-            return None
-
-        num_str = m.group(0)
-
-        # caso con punto y coma -> estilo "19.199,20"
-        if "." in num_str and "," in num_str:
-            num_str = num_str.replace(".", "").replace(",", ".")
-        # solo coma -> "23999,50"
-        elif "," in num_str:
-            num_str = num_str.replace(",", ".")
-        # solo punto -> "23999.000000" -> lo dejamos así
-
-        try:
-            return float(num_str)
-        except ValueError:
-            return None
-
-    def _parse_precio_from_attributes(self, attrs):
-        """
-        Intenta sacar el mejor precio posible usando los campos
-        que Coto manda en el JSON.
-
-        Prioridad:
-        1) sku.activePrice
-        2) sku.dtoPrice (precioLista / precio)
-        3) product.dtoDescuentos* (precioDescuento / precioRegular / textoPrecioRegular)
-        4) sku.referencePrice
-        5) product.PrecioLista / product.precioLista
-        """
-
-        # 1) sku.activePrice
-        val = self._first(attrs.get("sku.activePrice"))
-        if val:
-            if isinstance(val, (int, float)):
-                return float(val)
-            num = self._extract_number(val)
-            if num is not None:
-                return num
-
-        # 2) dtoPrice (JSON con precioLista, precio, etc.)
-        raw = self._first(attrs.get("sku.dtoPrice"))
-        if raw:
-            try:
-                obj = json.loads(raw) if isinstance(raw, str) else raw
-                if isinstance(obj, dict):
-                    # 👇 acá priorizamos precioLista; si querés al revés poné ["precio", "precioLista"]
-                    for k in ["precioLista", "precio"]:
-                        if k in obj and obj[k] is not None:
-                            val = obj[k]
-                            if isinstance(val, (int, float)):
-                                return float(val)
-                            num = self._extract_number(val)
-                            if num is not None:
-                                return num
-            except Exception:
-                pass
-
-        # 3) Promos: dtoDescuentos
-        dto_keys = [
-            "product.dtoDescuentos",
-            "product.dtoDescuentosMediosPago",
-            "product.dtoDescuentosTarjeta",
-            "dtoDescuentos",
-            "dtoDescuentosMediosPago",
-            "dtoDescuentosTarjeta",
-        ]
-
-        for key in dto_keys:
-            raw = self._first(attrs.get(key))
-            if not raw or raw == "[]":
-                continue
-
-            try:
-                arr = json.loads(raw) if isinstance(raw, str) else raw
-            except Exception:
-                continue
-
-            if not isinstance(arr, list) or not arr:
-                continue
-
-            desc = arr[0]
-
-            # 3.a precioDescuento (ej: "$4605.00c/u")
-            val = desc.get("precioDescuento")
-            if val:
-                num = self._extract_number(val)
-                if num is not None:
-                    return num
-
-            # 3.b precioRegular
-            val = desc.get("precioRegular")
-            if val:
-                num = self._extract_number(val)
-                if num is not None:
-                    return num
-
-            # 3.c textoPrecioRegular (ej: "Precio Contado: $9210")
-            val = desc.get("textoPrecioRegular")
-            if val:
-                num = self._extract_number(val)
-                if num is not None:
-                    return num
-
-        # 4) sku.referencePrice
-        val = self._first(attrs.get("sku.referencePrice"))
-        if val:
-            if isinstance(val, (int, float)):
-                return float(val)
-            num = self._extract_number(val)
-            if num is not None:
-                return num
-
-        # 5) Fallback: product.PrecioLista / product.precioLista
-        for key in ["product.PrecioLista", "product.precioLista"]:
-            val = self._first(attrs.get(key))
-            if val:
-                if isinstance(val, (int, float)):
-                    return float(val)
-                num = self._extract_number(val)
-                if num is not None:
-                    return num
-
-        return None
-
-
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        # Una política de precio mal escrita corta el crawl acá, antes de
+        # pedir nada, y no página por página
+        validar_politica(crawler.settings.get("COTO_POLITICA_PRECIO"))
+        return super().from_crawler(crawler, *args, **kwargs)
 
     # ---------- Helpers NUEVOS para paginado ---------- #
 
-    @staticmethod
-    def _find_results_list(node):
-        """
-        Busca el nodo con "@type": "Category_ResultsList"
-        que tiene recsPerPage y totalNumRecs.
-        """
-        if isinstance(node, dict):
-            if node.get("@type") == "Category_ResultsList" and "totalNumRecs" in node:
-                return node
-            for v in node.values():
-                res = CotoSpider._find_results_list(v)
-                if res is not None:
-                    return res
-        elif isinstance(node, list):
-            for item in node:
-                res = CotoSpider._find_results_list(item)
-                if res is not None:
-                    return res
-        return None
-
     @staticmethod
     def _build_url_with_offset(first_page_url: str, offset: int, recs_per_page: int) -> str:
         """
@@ -306,16 +143,28 @@ class CotoSpider(scrapy.Spider):
         self.logger.info(f"STATUS categoría: {response.status}")
         self.logger.info(f"Content-Type: {response.headers.get('Content-Type')}")
 
-        texto = response.text.strip()
-        if not texto:
+        if not response.body.strip():
             self.logger.error("La categoría devolvió cuerpo vacío")
             return
 
+        # Guardar la página tal cual llegó (fixtures de benchmarks/bench_parser_coto.py)
+        directorio = self.settings.get("COTO_GUARDAR_PAGINAS")
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+            nombre = hashlib.sha1(response.url.encode("utf-8")).hexdigest()[:16]
+            with open(os.path.join(directorio, f"{nombre}.json"), "wb") as f:
+                f.write(response.body)
+
+        # Productos y paginado; las páginas muy grandes, en streaming
         try:
-            data = json.loads(texto)
-        except json.JSONDecodeError as e:
+            productos, results_list = parse_page(
+                response.body,
+                self.settings.get("COTO_POLITICA_PRECIO"),
+                self.settings.getint("COTO_UMBRAL_STREAMING", UMBRAL_STREAMING),
+            )
+        except ERRORES_JSON as e:
             self.logger.error(f"No es JSON válido en categoría: {e}")
-            self.logger.error(texto[:400])
+            self.logger.error(response.text[:400])
             return
 
         categoria = response.meta.get("categoria", "desconocida")
@@ -324,7 +173,6 @@ class CotoSpider(scrapy.Spider):
 
         # ---------- PAGINADO: solo lo calculamos en la primera página ---------- #
         if page_idx == 0:
-            results_list = self._find_results_list(data)
             if results_list:
                 try:
                     recs_per_page = int(results_list.get("recsPerPage", 0) or 0)
@@ -371,13 +219,20 @@ class CotoSpider(scrapy.Spider):
 
         # ---------- EXTRACCIÓN DE PRODUCTOS DE ESTA PÁGINA ---------- #
 
-        # Usamos el parser externo que ya probaste en tu script
-        productos = extract_products_from_root(data)
-
         self.logger.info(
             f"[{categoria}] (página {page_idx}) productos encontrados: {len(productos)}"
         )
 
+        if response.meta.get("pagina_sin_cambios"):
+            # Igual que en el crawl anterior: solo avisar que siguen publicados
+            if productos:
+                yield {
+                    "sin_cambios": [p.get("product_id") for p in productos],
+                    "supermercado_nombre": "Coto",
+                    "supermercado_url": "https://www.cotodigital.com.ar",
+                }
+            return
+
         for p in productos:
             # Si querés que la categoría sea la que pasás por meta (por si difiere
             # de parentCategory / allAncestors del JSON):
@@ -1,7 +1,14 @@
 from app import create_app, db
-from models import Producto  # importa tus modelos
+from models import Producto, PrecioActual  # importa tus modelos
+from utils.precios import reconstruir_precios_actuales
+from migraciones import aplicar_migraciones
 
 app = create_app()
 
 with app.app_context():
     db.create_all()
+    aplicar_migraciones()
+
+    # Poblar precio_actual si la base ya tenía historial de precios
+    if not PrecioActual.query.first():
+        print(f"precio_actual reconstruido: {reconstruir_precios_actuales()} filas")
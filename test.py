@@ -13,7 +13,7 @@ def generar_embeddings_productos_faltantes(batch_size: int = 100):
     """
     productos_sin_embedding = (
         Producto.query
-        .filter((Producto.embedding == None) | (Producto.embedding == []))  # type: ignore
+        .filter(Producto.embedding_bin == None)  # type: ignore
         .all()
     )
 
@@ -34,7 +34,7 @@ def generar_embeddings_productos_faltantes(batch_size: int = 100):
 
         try:
             emb = embed(texto)
-            prod.embedding = emb
+            prod.set_vector(emb)
             procesados += 1
 
             if procesados % batch_size == 0:
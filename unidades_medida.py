@@ -1,33 +1,85 @@
 import re
+from collections import namedtuple
 
-unidades_regex = {
-    # 1 kg, 1kg, 1.5 kg, 1,5kg, etc.
-    "kg": re.compile(
-        r"\b(\d+(?:[.,]\d+)?)\s*(kilos?|kg|kgs?|kilogramos?)\b",
-        re.IGNORECASE
-    ),
-
-    # 250 g, 250g, 0.5 g, etc.
-    "g": re.compile(
-        r"\b(\d+(?:[.,]\d+)?)\s*(gramos?|g|grs?|gr|grams?)\b",
-        re.IGNORECASE
-    ),
-
-    # 900 ml, 900ml, 1.5 ml...
-    "ml": re.compile(
-        r"\b(\d+(?:[.,]\d+)?)\s*(mililitros?|ml|milliliters?)\b",
-        re.IGNORECASE
-    ),
-
-    # 1 l, 1l, 1 lt, 1lts, 1 litro, etc.
-    "litro": re.compile(
-        r"\b(\d+(?:[.,]\d+)?)\s*(l|lt|lts|litros?)\b",
-        re.IGNORECASE
-    ),
-
-    # opcionales, por si los usás
-    "unidad": re.compile(
-        r"\b(\d+)\s*(u\.?|unidades?|unit[s]?)\b",
-        re.IGNORECASE
-    )
+# ---------------------------------------------------------------------- #
+# Escáner único de unidades de medida
+# ---------------------------------------------------------------------- #
+
+_NUMERO = r"\d+(?:[.,]\d+)?"
+
+# Un solo patrón compilado: pack opcional ("6 x"), valor, unidad (un grupo
+# con nombre por unidad canónica) y pack opcional al final ("x 6").
+patron_medida = re.compile(
+    rf"\b(?:(?P<pack>\d+)\s*[x×]\s*)?"
+    rf"(?P<valor>{_NUMERO})\s*"
+    r"(?:"
+    r"(?P<kg>kilogramos?|kilos?|kgs?)"
+    r"|(?P<g>gramos?|grams?|grm|grs?|g)"
+    r"|(?P<ml>mililitros?|milliliters?|ml|cc)"
+    r"|(?P<litro>litros?|lts?|l)"
+    r"|(?P<unidad>unidades?|units?|u\.?)"
+    r")(?![a-z0-9])"
+    r"(?:\s*[x×]\s*(?P<pack_final>\d+)\b)?",
+    re.IGNORECASE
+)
+
+# unidad canónica -> (unidad base, factor para pasar a la unidad base)
+UNIDADES_BASE = {
+    "kg": ("g", 1000.0),
+    "g": ("g", 1.0),
+    "ml": ("ml", 1.0),
+    "litro": ("ml", 1000.0),
+    "unidad": ("unidad", 1.0),
 }
+
+# unidad base -> valor del Enum Producto.unidad_medida
+UNIDAD_MODELO = {
+    "g": "gramo",
+    "ml": "mililitro",
+    "unidad": "unidad",
+}
+
+Medida = namedtuple(
+    "Medida",
+    ["unidad", "valor", "pack", "unidad_base", "valor_base", "texto", "inicio", "fin"],
+)
+
+
+def extraer_medida(nombre):
+    """
+    Busca la primera medida en el nombre del producto con el patrón único.
+    Retorna una Medida o None. Ejemplos:
+      "Leche 1 L"          -> unidad="litro", valor=1.0,  valor_base=1000.0 ml
+      "Agua 6 x 500 ml"    -> unidad="ml", valor=500.0, pack=6, valor_base=3000.0 ml
+      "Pionono 180g"       -> unidad="g", valor=180.0, valor_base=180.0 g
+    """
+    if not nombre:
+        return None
+
+    m = patron_medida.search(nombre)
+    if not m:
+        return None
+
+    unidad = next(u for u in UNIDADES_BASE if m.group(u))
+    unidad_base, factor = UNIDADES_BASE[unidad]
+    valor = float(m.group("valor").replace(",", "."))
+    pack = int(m.group("pack") or m.group("pack_final") or 1)
+
+    return Medida(
+        unidad=unidad,
+        valor=valor,
+        pack=pack,
+        unidad_base=unidad_base,
+        valor_base=valor * factor * pack,
+        texto=m.group(0),
+        inicio=m.start(),
+        fin=m.end(),
+    )
+
+
+def extraer_medidas(nombres):
+    """
+    extraer_medida sobre una página entera de productos.
+    Retorna una lista de Medida (o None) en el mismo orden.
+    """
+    return [extraer_medida(nombre) for nombre in nombres]
@@ -1,5 +1,49 @@
-from sentence_transformers import SentenceTransformer
+import os
+import threading
 from pathlib import Path
+from vectores import NOMBRE_MODELO
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
-RUTA_PENDIENTES = Path("pendientes_revision.csv")
\ No newline at end of file
+RUTA_PENDIENTES = Path("pendientes_revision.csv")
+RUTA_INDICE = Path("indice_productos")
+RUTA_CACHE_EMBEDDINGS = Path("embeddings_cache.sqlite")
+
+# Si está definido, los embeddings se piden al worker compartido
+# (ver worker_embeddings.py) en lugar de cargar el modelo en este proceso.
+RUTA_SOCKET_EMBEDDINGS = os.environ.get("CARRITO_EMBEDDINGS_SOCKET")
+
+# Cache de vistas (ver cache.py): "memoria", "archivo" o "redis"
+BACKEND_CACHE = os.environ.get("CARRITO_CACHE_BACKEND", "memoria")
+TTL_CACHE = float(os.environ.get("CARRITO_CACHE_TTL", "300"))
+RUTA_CACHE_VISTAS = Path(os.environ.get("CARRITO_CACHE_RUTA", "cache_vistas"))
+URL_REDIS = os.environ.get("CARRITO_REDIS_URL", "redis://localhost:6379/0")
+
+_modelo = None
+_lock_modelo = threading.Lock()
+
+def obtener_modelo():
+    """
+    Devuelve el SentenceTransformer, cargándolo la primera vez que se usa.
+    Importar `utils` ya no carga el modelo.
+    """
+    global _modelo
+    if _modelo is None:
+        with _lock_modelo:
+            if _modelo is None:
+                from sentence_transformers import SentenceTransformer
+                _modelo = SentenceTransformer(NOMBRE_MODELO)
+    return _modelo
+
+def precargar_modelo():
+    """
+    Fuerza la carga del modelo (ej: al arrancar un worker que seguro va a embeber).
+    """
+    obtener_modelo()
+
+def __getattr__(nombre):
+    # Compatibilidad con `utils.model`: se resuelve de forma perezosa
+    if nombre == "model":
+        return obtener_modelo()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+if os.environ.get("CARRITO_PRECARGAR_MODELO") == "1":
+    precargar_modelo()
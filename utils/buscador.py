@@ -0,0 +1,229 @@
+import bisect
+import heapq
+import re
+from collections import Counter
+import threading
+import time
+from .normalizar import quitar_acentos
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Cada cuántos segundos se buscan productos nuevos en la DB
+INTERVALO_SINCRONIZACION = 5.0
+
+# Los prefijos de hasta este largo abarcan muchas palabras: la unión de sus
+# postings se guarda hasta que cambie el índice
+LARGO_PREFIJO_CACHE = 2
+
+
+def tokenizar(texto):
+    """
+    Minúsculas, sin acentos y partido en palabras alfanuméricas.
+    """
+    return _TOKEN.findall(quitar_acentos((texto or "").lower()))
+
+
+class IndiceBusqueda:
+    """
+    Índice invertido en memoria para el autocompletado de productos.
+
+    - postings: palabra -> ids de productos que la contienen
+    - primeras: palabra -> ids de productos cuyo nombre empieza con ella
+    - vocabulario: lista ordenada de palabras, para resolver prefijos con bisect
+
+    Cada palabra de la consulta tiene que ser prefijo de alguna palabra del
+    producto, en cualquier orden ("desc leche" encuentra "Leche Descremada").
+    """
+
+    def __init__(self):
+        self.nombres = {}
+        self._tokens = {}
+        self._clave = {}
+        self.postings = {}
+        self.primeras = {}
+        self.vocabulario = []
+        self._cache_prefijos = {}
+        self.ultimo_id = 0
+        self.ultima_sincronizacion = 0.0
+        self._lock = threading.Lock()
+
+    def agregar(self, producto_id, nombre):
+        """
+        Agrega o reemplaza un producto en el índice.
+        """
+        with self._lock:
+            self._agregar(producto_id, nombre, ordenado=True)
+
+    def agregar_muchos(self, filas):
+        """
+        Agrega muchos (id, nombre) de una vez: el vocabulario se ordena
+        una sola vez al final en lugar de insertar ordenado palabra por palabra.
+        """
+        with self._lock:
+            for producto_id, nombre in filas:
+                self._agregar(producto_id, nombre, ordenado=False)
+            self.vocabulario.sort()
+
+    def _agregar(self, producto_id, nombre, ordenado):
+        self._cache_prefijos.clear()
+        if producto_id in self._tokens:
+            self._quitar(producto_id)
+
+        tokens = tuple(dict.fromkeys(tokenizar(nombre)))
+        self.nombres[producto_id] = nombre
+        self._tokens[producto_id] = tokens
+        # Desempate fijo: nombre más corto y después alfabético
+        self._clave[producto_id] = (len(nombre), nombre)
+        if tokens:
+            self.primeras.setdefault(tokens[0], set()).add(producto_id)
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                if ordenado:
+                    bisect.insort(self.vocabulario, token)
+                else:
+                    self.vocabulario.append(token)
+            ids.add(producto_id)
+
+        self.ultimo_id = max(self.ultimo_id, producto_id)
+
+    def _quitar(self, producto_id):
+        tokens = self._tokens.pop(producto_id, ())
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is not None:
+                ids.discard(producto_id)
+        if tokens:
+            self.primeras.get(tokens[0], set()).discard(producto_id)
+        self.nombres.pop(producto_id, None)
+        self._clave.pop(producto_id, None)
+
+    def _palabras_con_prefijo(self, prefijo):
+        inicio = bisect.bisect_left(self.vocabulario, prefijo)
+        fin = bisect.bisect_left(self.vocabulario, prefijo + "\uffff", inicio)
+        return self.vocabulario[inicio:fin]
+
+    def _ids_con_prefijo(self, prefijo, postings):
+        if len(prefijo) > LARGO_PREFIJO_CACHE:
+            return self._unir_prefijo(prefijo, postings)
+        clave = (prefijo, postings is self.primeras)
+        ids = self._cache_prefijos.get(clave)
+        if ids is None:
+            ids = self._cache_prefijos[clave] = self._unir_prefijo(prefijo, postings)
+        return ids
+
+    def _unir_prefijo(self, prefijo, postings):
+        palabras = self._palabras_con_prefijo(prefijo)
+        if len(palabras) == 1:
+            return postings.get(palabras[0], set())
+        ids = set()
+        for token in palabras:
+            ids |= postings.get(token, set())
+        return ids
+
+    def _niveles(self, tokens, candidatos):
+        """
+        Separa los candidatos según cuántas palabras de la consulta
+        coinciden completas (de más a menos), con operaciones de conjuntos.
+        """
+        if len(tokens) == 1:
+            exactos = self.postings.get(tokens[0], set()) & candidatos
+            return [exactos, candidatos - exactos]
+
+        completas = Counter()
+        for token in tokens:
+            completas.update(self.postings.get(token, set()) & candidatos)
+
+        niveles = [set() for _ in range(len(tokens) + 1)]
+        for producto_id in candidatos:
+            niveles[len(tokens) - completas[producto_id]].add(producto_id)
+        return niveles
+
+    def buscar(self, consulta, limite=10):
+        """
+        Devuelve hasta `limite` productos como lista de (id, nombre), ordenados por:
+          1) cantidad de palabras de la consulta que coinciden completas,
+          2) si el nombre empieza con la primera palabra buscada,
+          3) nombre más corto,
+          4) orden alfabético.
+        """
+        tokens = tokenizar(consulta)
+        if not tokens:
+            return []
+
+        with self._lock:
+            # Empezamos por la palabra más selectiva para achicar rápido
+            conjuntos = sorted((self._ids_con_prefijo(t, self.postings) for t in tokens), key=len)
+            # Sin modificar los conjuntos originales (son postings o caches)
+            candidatos = conjuntos[0]
+            for ids in conjuntos[1:]:
+                candidatos = candidatos & ids
+                if not candidatos:
+                    return []
+
+            empiezan = self._ids_con_prefijo(tokens[0], self.primeras)
+
+            # Se arma el top por niveles; dentro de cada nivel solo se ordena
+            # por la clave precalculada (largo, nombre)
+            mejores = []
+            for nivel in self._niveles(tokens, candidatos):
+                for grupo in (nivel & empiezan, nivel - empiezan):
+                    faltan = limite - len(mejores)
+                    if faltan <= 0:
+                        break
+                    mejores.extend(heapq.nsmallest(faltan, grupo, key=self._clave.__getitem__))
+
+            return [(producto_id, self.nombres[producto_id]) for producto_id in mejores]
+
+    def sincronizar(self, forzar=False):
+        """
+        Agrega los productos insertados en la DB desde la última vez
+        (por ejemplo, por el pipeline de scraping). Como mucho una consulta
+        cada INTERVALO_SINCRONIZACION segundos, por rango de clave primaria.
+        """
+        ahora = time.monotonic()
+        if not forzar and ahora - self.ultima_sincronizacion < INTERVALO_SINCRONIZACION:
+            return 0
+
+        from models import Producto
+
+        nuevos = (
+            Producto.query
+            .with_entities(Producto.id, Producto.nombre)
+            .filter(Producto.id > self.ultimo_id)
+            .order_by(Producto.id.asc())
+            .all()
+        )
+        self.agregar_muchos(nuevos)
+
+        self.ultima_sincronizacion = ahora
+        return len(nuevos)
+
+
+_indice = None
+_lock_global = threading.Lock()
+
+
+def obtener_indice_busqueda():
+    """
+    Devuelve el índice de búsqueda del proceso, al día con la DB.
+    """
+    global _indice
+    if _indice is None:
+        with _lock_global:
+            if _indice is None:
+                indice = IndiceBusqueda()
+                indice.sincronizar(forzar=True)
+                _indice = indice
+    else:
+        _indice.sincronizar()
+    return _indice
+
+
+def registrar_producto(producto_id, nombre):
+    """
+    Agrega un producto recién creado al índice de este proceso (si existe).
+    """
+    if _indice is not None:
+        _indice.agregar(producto_id, nombre)
@@ -0,0 +1,141 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import TimeoutError
+from .generar_alias import normalize_text
+
+# Constante de la fusión por ranking recíproco: puntaje = peso / (K_RRF + posición)
+K_RRF = 60
+
+# Cuántos candidatos aporta cada buscador antes de fusionar
+CANDIDATOS = 50
+
+# Similitud mínima para que un vecino semántico entre a la fusión
+UMBRAL_SEMANTICO = 0.35
+
+# Tiempo máximo (ms) que se espera al modelo por el embedding de la consulta
+PRESUPUESTO_MS = 150
+
+# Cuántos embeddings de consultas se guardan en memoria
+TAM_CACHE_CONSULTAS = 4096
+
+
+def fusionar_rrf(listas, pesos=None, k=K_RRF):
+    """
+    Fusión por ranking recíproco (RRF) de varias listas de ids ordenadas
+    de mejor a peor. Ante empate se respeta el orden de aparición.
+    Retorna la lista de ids fusionada.
+    """
+    pesos = pesos or [1.0] * len(listas)
+    puntajes = {}
+    for lista, peso in zip(listas, pesos):
+        for posicion, producto_id in enumerate(lista, start=1):
+            puntajes[producto_id] = puntajes.get(producto_id, 0.0) + peso / (k + posicion)
+    # sorted es estable: los empates quedan en el orden en que se vieron
+    return sorted(puntajes, key=puntajes.get, reverse=True)
+
+
+class BuscadorHibrido:
+    """
+    Búsqueda de productos que combina:
+      - coincidencias léxicas del índice de prefijos (IndiceBusqueda),
+      - vecinos más cercanos por embedding (IndiceVectorial),
+    fusionadas con RRF.
+
+    El embedding de la consulta se pide al servicio de embeddings con un
+    presupuesto de PRESUPUESTO_MS. Si no llega a tiempo se usa el de la
+    consulta más larga ya vista que sea prefijo de la actual (al tipear,
+    "leche des" reutiliza "leche"); si no hay ninguno, solo resultado léxico.
+    """
+
+    def __init__(self, lexico, vectorial, servicio, peso_lexico=1.0, peso_semantico=1.0):
+        self.lexico = lexico
+        self.vectorial = vectorial
+        self.servicio = servicio
+        self.pesos = [peso_lexico, peso_semantico]
+        self._consultas = OrderedDict()
+        self._lock = threading.Lock()
+        self.estadisticas = {"cache": 0, "modelo": 0, "prefijo": 0, "sin_vector": 0}
+
+    def _vector_consulta(self, clave):
+        with self._lock:
+            vec = self._consultas.get(clave)
+            if vec is not None:
+                self._consultas.move_to_end(clave)
+                self.estadisticas["cache"] += 1
+                return vec
+
+        try:
+            vec = self.servicio.embed(clave, timeout=PRESUPUESTO_MS / 1000)
+        except TimeoutError:
+            return self._vector_prefijo(clave)
+
+        with self._lock:
+            self._consultas[clave] = vec
+            while len(self._consultas) > TAM_CACHE_CONSULTAS:
+                self._consultas.popitem(last=False)
+            self.estadisticas["modelo"] += 1
+        return vec
+
+    def _vector_prefijo(self, clave):
+        with self._lock:
+            for fin in range(len(clave) - 1, 1, -1):
+                vec = self._consultas.get(clave[:fin].rstrip())
+                if vec is not None:
+                    self.estadisticas["prefijo"] += 1
+                    return vec
+            self.estadisticas["sin_vector"] += 1
+        return None
+
+    def buscar(self, consulta, limite=10):
+        """
+        Devuelve hasta `limite` productos como lista de (id, nombre),
+        igual que IndiceBusqueda.buscar.
+        """
+        clave = normalize_text(consulta or "").strip()
+        if not clave:
+            return []
+
+        lexicos = [producto_id for producto_id, _ in self.lexico.buscar(clave, limite=CANDIDATOS)]
+
+        semanticos = []
+        vec = self._vector_consulta(clave)
+        if vec is not None:
+            semanticos = [
+                producto_id
+                for producto_id, similitud in self.vectorial.buscar_todos(vec, k=CANDIDATOS)
+                if similitud >= UMBRAL_SEMANTICO
+            ]
+
+        resultado = []
+        for producto_id in fusionar_rrf([lexicos, semanticos], self.pesos):
+            nombre = self.lexico.nombres.get(producto_id)
+            if nombre is None:
+                # todavía no sincronizado en el índice léxico
+                continue
+            resultado.append((producto_id, nombre))
+            if len(resultado) == limite:
+                break
+        return resultado
+
+
+_buscador = None
+_lock_global = threading.Lock()
+
+
+def obtener_buscador_hibrido():
+    """
+    Devuelve el buscador híbrido del proceso, armado sobre los índices
+    compartidos (léxico y vectorial) y el servicio de embeddings.
+    """
+    global _buscador
+    from .buscador import obtener_indice_busqueda
+
+    lexico = obtener_indice_busqueda()
+    if _buscador is None:
+        with _lock_global:
+            if _buscador is None:
+                from .embedding import obtener_servicio
+                from .indice_vectorial import obtener_indice
+
+                _buscador = BuscadorHibrido(lexico, obtener_indice(), obtener_servicio())
+    return _buscador
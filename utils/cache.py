@@ -0,0 +1,250 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from extensions import db
+from models import ListaCompra, VersionDatos
+from . import BACKEND_CACHE, TTL_CACHE, RUTA_CACHE_VISTAS, URL_REDIS
+
+# Clave de VersionDatos que identifica la foto de precios vigente
+CLAVE_PRECIOS = "precios"
+
+
+# ---------------------------------------------------------------------- #
+# Backends
+#
+# Guardan strings (HTML ya renderizado) por clave, con TTL en segundos.
+# Interfaz: obtener(clave), guardar(clave, valor, ttl), borrar_prefijo(prefijo)
+# ---------------------------------------------------------------------- #
+
+class BackendArchivo:
+    """
+    Un archivo por clave dentro de un directorio, compartido entre procesos
+    de la misma máquina. La primera línea es el vencimiento (epoch).
+    """
+
+    def __init__(self, ruta=RUTA_CACHE_VISTAS):
+        self.ruta = os.fspath(ruta)
+        os.makedirs(self.ruta, exist_ok=True)
+
+    def _archivo(self, clave):
+        # El prefijo legible permite borrar por prefijo; el hash evita
+        # caracteres raros en el nombre del archivo
+        legible = "".join(c if c.isalnum() else "_" for c in clave)
+        resumen = hashlib.sha1(clave.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.ruta, f"{legible}.{resumen}.html")
+
+    def obtener(self, clave):
+        try:
+            with open(self._archivo(clave), encoding="utf-8") as f:
+                expira = float(f.readline())
+                if expira < time.time():
+                    return None
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def guardar(self, clave, valor, ttl):
+        archivo = self._archivo(clave)
+        tmp = f"{archivo}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(f"{time.time() + ttl}\n")
+            f.write(valor)
+        os.replace(tmp, archivo)
+
+    def borrar_prefijo(self, prefijo):
+        legible = "".join(c if c.isalnum() else "_" for c in prefijo)
+        for nombre in os.listdir(self.ruta):
+            if nombre.startswith(legible):
+                try:
+                    os.remove(os.path.join(self.ruta, nombre))
+                except OSError:
+                    pass
+
+
+class BackendRedis:
+    """
+    Backend sobre Redis (o cualquier cliente con get/set/scan_iter/delete,
+    por ejemplo fakeredis). Requiere el paquete `redis` si no se pasa cliente.
+    """
+
+    def __init__(self, cliente=None, url=URL_REDIS, espacio="carrito:"):
+        if cliente is None:
+            import redis
+            cliente = redis.Redis.from_url(url)
+        self.cliente = cliente
+        self.espacio = espacio
+
+    def obtener(self, clave):
+        valor = self.cliente.get(self.espacio + clave)
+        if valor is None:
+            return None
+        return valor.decode("utf-8") if isinstance(valor, bytes) else valor
+
+    def guardar(self, clave, valor, ttl):
+        self.cliente.set(self.espacio + clave, valor, ex=max(1, int(ttl)))
+
+    def borrar_prefijo(self, prefijo):
+        claves = list(self.cliente.scan_iter(match=f"{self.espacio}{prefijo}*"))
+        if claves:
+            self.cliente.delete(*claves)
+
+
+# ---------------------------------------------------------------------- #
+# Cache
+# ---------------------------------------------------------------------- #
+
+class CacheVistas:
+    """
+    Cache de fragmentos renderizados: LRU en memoria con TTL y, opcionalmente,
+    un backend compartido (archivo o Redis) detrás.
+
+    Las claves llevan la versión de la lista y la de los precios
+    (ver clave_lista), así que un cambio de datos nunca sirve HTML viejo:
+    solo hace que se pida otra clave.
+    """
+
+    def __init__(self, backend=None, tam=1024, ttl=TTL_CACHE):
+        self.backend = backend
+        self.tam = tam
+        self.ttl = ttl
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.estadisticas = {"memoria": 0, "backend": 0, "fallos": 0}
+
+    def obtener(self, clave):
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._lru.get(clave)
+            if entrada is not None:
+                valor, expira = entrada
+                if expira > ahora:
+                    self._lru.move_to_end(clave)
+                    self.estadisticas["memoria"] += 1
+                    return valor
+                del self._lru[clave]
+
+        if self.backend is not None:
+            valor = self.backend.obtener(clave)
+            if valor is not None:
+                self._guardar_memoria(clave, valor)
+                self.estadisticas["backend"] += 1
+                return valor
+
+        self.estadisticas["fallos"] += 1
+        return None
+
+    def guardar(self, clave, valor):
+        self._guardar_memoria(clave, valor)
+        if self.backend is not None:
+            self.backend.guardar(clave, valor, self.ttl)
+
+    def _guardar_memoria(self, clave, valor):
+        with self._lock:
+            self._lru[clave] = (valor, time.monotonic() + self.ttl)
+            self._lru.move_to_end(clave)
+            while len(self._lru) > self.tam:
+                self._lru.popitem(last=False)
+
+    def obtener_o_calcular(self, clave, calcular):
+        """
+        Devuelve el valor cacheado o lo calcula con `calcular()` y lo guarda.
+        """
+        valor = self.obtener(clave)
+        if valor is None:
+            valor = calcular()
+            self.guardar(clave, valor)
+        return valor
+
+    def invalidar(self, prefijo):
+        """
+        Descarta todas las entradas cuya clave empieza con `prefijo`.
+        """
+        with self._lock:
+            for clave in [c for c in self._lru if c.startswith(prefijo)]:
+                del self._lru[clave]
+        if self.backend is not None:
+            self.backend.borrar_prefijo(prefijo)
+
+
+def _prefijo_lista(lista_id):
+    return f"lista:{lista_id}:"
+
+
+def clave_lista(vista, lista):
+    """
+    Clave de cache de una vista de la lista: (lista_id, token de la lista,
+    versión de la lista, versión de los precios). El token evita que una
+    lista nueva que reusa el id de una eliminada herede sus entradas.
+    """
+    return f"{_prefijo_lista(lista.id)}{lista.token}:{vista}:v{lista.version or 0}:p{version_precios()}"
+
+
+def incrementar_version_lista(lista_id):
+    """
+    Suma 1 a la versión de la lista en la base (UPDATE ... SET version =
+    version + 1), en la transacción del cambio de ítems: dos pedidos
+    simultáneos no pueden terminar con la misma versión. No hace commit.
+    """
+    db.session.execute(
+        db.update(ListaCompra)
+        .where(ListaCompra.id == lista_id)
+        .values(version=ListaCompra.version + 1)
+    )
+
+
+def invalidar_lista(lista_id):
+    """
+    Descarta todo lo cacheado de una lista (al modificarla o eliminarla).
+    """
+    obtener_cache().invalidar(_prefijo_lista(lista_id))
+
+
+# ---------------------------------------------------------------------- #
+# Versión de precios
+# ---------------------------------------------------------------------- #
+
+def version_precios():
+    """
+    Versión actual de la foto de precios (0 si nunca corrió un crawl).
+    """
+    fila = db.session.get(VersionDatos, CLAVE_PRECIOS)
+    return fila.version if fila else 0
+
+
+def incrementar_version_precios():
+    """
+    Marca que hay precios nuevos: todo lo cacheado con la versión anterior
+    deja de usarse. Lo llama el pipeline al terminar un crawl. Hace commit.
+    """
+    fila = db.session.get(VersionDatos, CLAVE_PRECIOS)
+    if fila is None:
+        fila = VersionDatos(clave=CLAVE_PRECIOS, version=0)
+        db.session.add(fila)
+    fila.version += 1
+    db.session.commit()
+    return fila.version
+
+
+_cache = None
+_lock_global = threading.Lock()
+
+
+def obtener_cache():
+    """
+    Devuelve la cache de vistas del proceso, con el backend configurado en
+    CARRITO_CACHE_BACKEND ("memoria", "archivo" o "redis").
+    """
+    global _cache
+    if _cache is None:
+        with _lock_global:
+            if _cache is None:
+                if BACKEND_CACHE == "archivo":
+                    backend = BackendArchivo()
+                elif BACKEND_CACHE == "redis":
+                    backend = BackendRedis()
+                else:
+                    backend = None
+                _cache = CacheVistas(backend)
+    return _cache
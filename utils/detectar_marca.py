@@ -1,49 +1,56 @@
-from embedding import embed
-from models import Marca
-from normalizar import quitar_acentos
-import re
-import numpy as np
+from .embedding import embed, embed_lote
+from .generar_alias import normalize_text
+from .matcher_marcas import obtener_matcher
+from .matriz_marcas import obtener_matriz_marcas
+
+# Similitud mínima con el embedding de una marca para aceptarla
+UMBRAL_SIMILITUD = 0.8
 
 def detectar_marca(nombre):
     """
     Detecta la marca en el nombre del producto.
+    Retorna (marca, requiere_intervencion_humana).
+    """
+    # 1) y 2) marca o sinónimo como palabra(s) completa(s), en una sola
+    # pasada sobre el trie de marcas cacheado
+    marca = obtener_matcher().buscar(nombre)
+    if marca:
+        return marca, False
+
+    # 3) embeddings: una matmul contra la matriz de todas las marcas
+    nombre_embedding = embed(normalize_text(nombre))
+    marca, similitud = obtener_matriz_marcas().mejor(nombre_embedding)
+
+    if marca and similitud >= UMBRAL_SIMILITUD:
+        return marca, False
+
+    return None, True
+
+def detectar_marcas_lote(nombres):
+    """
+    Versión por lotes de detectar_marca: los nombres que no se resuelven por
+    diccionario se embeben juntos y se comparan contra todas las marcas
+    en una sola multiplicación de matrices.
+    Retorna una lista de (marca, requiere_intervencion_humana).
     """
-    nombre_lower = quitar_acentos(nombre).lower()
-    marcas = Marca.query.all()
-
-    # 1) búsqueda exacta por marca
-    for marca in marcas:
-        marca_lower = marca.nombre.lower()
-        pattern = rf"\b{re.escape(marca_lower)}\b"
-        if re.search(pattern, nombre_lower):
-            return marca.nombre, False
-
-    # 2) sinónimos
-    for marca in marcas:
-        if marca.sinonimos:
-            for sinonimo in marca.sinonimos:
-                sinonimo_lower = sinonimo.lower()
-                pattern = rf"\b{re.escape(sinonimo_lower)}\b"
-                if re.search(pattern, nombre_lower):
-                    return marca.nombre, False
-
-    # 3) embeddings
-    nombre_embedding = embed(nombre_lower)
-
-    mejor_marca = None
-    mejor_similitud = 0.0
-    umbral_similitud = 0.8
-
-    for marca in marcas:
-        if marca.embedding:
-            marca_embedding = np.array(marca.embedding, dtype="float32")
-            # si los guardaste ya normalizados, esto es coseno
-            similitud = float(np.dot(nombre_embedding, marca_embedding))
-            if similitud > mejor_similitud:
-                mejor_similitud = similitud
-                mejor_marca = marca.nombre
-
-    if mejor_similitud >= umbral_similitud:
-        return mejor_marca, False
-
-    return None, True
\ No newline at end of file
+    matcher = obtener_matcher()
+    resultados = [None] * len(nombres)
+    pendientes = []
+
+    for i, nombre in enumerate(nombres):
+        marca = matcher.buscar(nombre)
+        if marca:
+            resultados[i] = (marca, False)
+        else:
+            pendientes.append(i)
+
+    if pendientes:
+        vectores = embed_lote([normalize_text(nombres[i]) for i in pendientes])
+        mejores = obtener_matriz_marcas().mejores_lote(vectores)
+        for i, (marca, similitud) in zip(pendientes, mejores):
+            if marca and similitud >= UMBRAL_SIMILITUD:
+                resultados[i] = (marca, False)
+            else:
+                resultados[i] = (None, True)
+
+    return resultados
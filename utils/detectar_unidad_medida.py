@@ -1,16 +1,23 @@
-from ..unidades_medida import unidades_regex
+from unidades_medida import extraer_medida, extraer_medidas
 
 def detectar_unidad_medida(nombre: str):
     """
-    Detecta la unidad de medida en el nombre del producto usando regex con contexto.
-    Retorna (unidad_canonica, requiere_intervencion_humana).
+    Detecta la unidad de medida en el nombre del producto con el patrón
+    único de unidades_medida.patron_medida.
+    Retorna (unidad_base, valor_en_unidad_base, requiere_intervencion_humana),
+    ej: "Agua 6 x 500 ml" -> ("ml", 3000.0, False).
     """
-    nombre_lower = nombre.lower()
+    medida = extraer_medida(nombre)
+    if medida:
+        return medida.unidad_base, medida.valor_base, False
 
-    for unidad_canonica, pattern in unidades_regex.items():
-        match = pattern.search(nombre_lower)
-        if match:
-            valor = match.group(0)
-            return unidad_canonica, valor, False
-        
-    return None, None, True
\ No newline at end of file
+    return None, None, True
+
+def detectar_unidades_medida(nombres):
+    """
+    detectar_unidad_medida para una página entera de productos.
+    """
+    return [
+        (medida.unidad_base, medida.valor_base, False) if medida else (None, None, True)
+        for medida in extraer_medidas(nombres)
+    ]
@@ -1,17 +1,47 @@
-import numpy as np
 from models import Marca, Producto
-from . import model
+from extensions import db
+from . import obtener_modelo, RUTA_CACHE_EMBEDDINGS, RUTA_SOCKET_EMBEDDINGS
+from .indice_vectorial import obtener_indice
+from .servicio_embeddings import ServicioEmbeddings, CacheDisco
+from .worker_embeddings import ClienteEmbeddings
+
+_servicio = None
+
+def _codificar_local(textos):
+    return obtener_modelo().encode(textos, convert_to_numpy=True)
+
+def obtener_servicio():
+    """
+    Devuelve el servicio de embeddings del proceso (micro-lotes + caches).
+    Usa el worker compartido si CARRITO_EMBEDDINGS_SOCKET está definido;
+    si no, el modelo local (que se carga recién al primer embedding).
+    """
+    global _servicio
+    if _servicio is None:
+        if RUTA_SOCKET_EMBEDDINGS:
+            codificador = ClienteEmbeddings(RUTA_SOCKET_EMBEDDINGS)
+        else:
+            codificador = _codificar_local
+        _servicio = ServicioEmbeddings(
+            codificador=codificador,
+            cache_disco=CacheDisco(RUTA_CACHE_EMBEDDINGS),
+        )
+    return _servicio
 
 def embed(text: str):
     """
     Genera un embedding normalizado para el texto dado.
-    Retorna una lista de floats.
+    Retorna un array float32 (se guarda con Producto.set_vector / Marca.set_vector).
+    Los textos ya vistos salen de cache sin pasar por el modelo.
     """
-    vec = model.encode([text])[0].astype("float32")
-    norm = np.linalg.norm(vec)
-    if norm > 0:
-        vec = vec / norm
-    return vec.tolist()
+    return obtener_servicio().embed(text)
+
+def embed_lote(textos):
+    """
+    Igual que embed() pero para muchos textos: una sola llamada al modelo
+    para todos los que no estén en cache.
+    """
+    return obtener_servicio().embed_lote(textos)
 
 def cosine_similarity(vec1, vec2):
     """
@@ -31,28 +61,29 @@ def cosine_similarity(vec1, vec2):
     
     return dot_product / (norm1 * norm2)
 
-def encontrar_producto_por_nombre_semantico(nombre, marca=None):
+def encontrar_producto_por_nombre_semantico(nombre, marca=None, embedding=None):
     """
     Busca un producto en la base de datos cuyo nombre sea semánticamente similar al dado.
     Filtrando por los productos de la misma marca.
-    Retorna el primer producto encontrado o None si no hay coincidencias.
-    """
-    embedding_nombre = embed(nombre)
-    productos = Producto.query.filter_by(
-        marca_id=Marca.query.filter_by(
-            nombre=marca
-        ).first().id if marca else None
-    ).all()
-
-    mejor_producto = None
-    mejor_similitud = -1.0
-
-    for producto in productos:
-        if producto.embedding:
-            similitud = cosine_similarity(embedding_nombre, producto.embedding)
-            if similitud > mejor_similitud:
-                mejor_similitud = similitud
-                mejor_producto = producto
-
-    return mejor_producto, mejor_similitud
-    
\ No newline at end of file
+    Usa el índice vectorial en memoria (ver indice_vectorial.py) en lugar de
+    comparar contra cada producto de la marca.
+    Si ya se calculó el embedding del nombre se puede pasar en `embedding`.
+    Retorna (producto, similitud) o (None, -1.0) si no hay coincidencias.
+    """
+    embedding_nombre = embedding if embedding is not None else embed(nombre)
+
+    marca_id = None
+    if marca:
+        marca_obj = Marca.query.filter_by(nombre=marca).first()
+        marca_id = marca_obj.id if marca_obj else None
+
+    resultados = obtener_indice().buscar(embedding_nombre, marca_id, k=1)
+    if not resultados:
+        return None, -1.0
+
+    producto_id, similitud = resultados[0]
+    producto = db.session.get(Producto, producto_id)
+    if not producto:
+        return None, -1.0
+
+    return producto, similitud
@@ -1,4 +1,4 @@
-from unicodedata import unicodedata
+import unicodedata
 
 def normalize_text(s: str) -> str:
     """
@@ -0,0 +1,275 @@
+"""
+Historial de precios por tramos (tabla intervalo_precio).
+
+Cada crawl observa un precio por ProductoSupermercado. En lugar de guardar
+una fila por observación, se guarda un tramo por cada precio distinto:
+si el precio no cambió se corre `hasta` del último tramo; si cambió se
+cierra y se abre uno nuevo. Guardar y consultar cuesta según la cantidad
+de cambios de precio, no según la cantidad de crawls.
+"""
+from datetime import date, timedelta
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from extensions import db
+from models import IntervaloPrecio, PrecioProducto, ProductoSupermercado, Supermercado, VersionDatos
+
+# Clave de VersionDatos con el último id de precio_producto ya compactado
+CLAVE_COMPACTADO = "historial_compactado"
+
+
+def _ultimos_tramos(ps_ids):
+    """
+    Último tramo (el de `desde` más reciente) de cada ProductoSupermercado,
+    en una consulta. Retorna un dict ps_id -> IntervaloPrecio.
+    """
+    ultimos = (
+        db.select(
+            IntervaloPrecio.producto_supermercado_id,
+            db.func.max(IntervaloPrecio.desde).label("desde"),
+        )
+        .where(IntervaloPrecio.producto_supermercado_id.in_(ps_ids))
+        .group_by(IntervaloPrecio.producto_supermercado_id)
+        .subquery()
+    )
+    tramos = db.session.execute(
+        db.select(IntervaloPrecio).join(
+            ultimos,
+            db.and_(
+                IntervaloPrecio.producto_supermercado_id == ultimos.c.producto_supermercado_id,
+                IntervaloPrecio.desde == ultimos.c.desde,
+            ),
+        )
+    ).scalars()
+    return {tramo.producto_supermercado_id: tramo for tramo in tramos}
+
+
+def registrar_precios(precios):
+    """
+    Registra un lote de observaciones en el historial.
+    `precios` es una lista de (producto_supermercado_id, precio, moneda, fecha),
+    el mismo formato que actualizar_precios_actuales.
+
+    Por cada observación, contra el último tramo del producto en el super:
+      - mismo precio: se extiende `hasta`;
+      - otro precio el mismo día en que abrió el tramo: se corrige el tramo;
+      - otro precio: se cierra el tramo y se abre uno nuevo.
+    Las observaciones anteriores al último tramo se ignoran (no se reescribe
+    la historia). Usa una consulta para todo el lote. No hace commit.
+    Retorna la cantidad de tramos nuevos.
+    """
+    if not precios:
+        return 0
+
+    por_ps = {}
+    for ps_id, precio, moneda, fecha in precios:
+        por_ps.setdefault(ps_id, []).append((fecha or date.today(), precio, moneda))
+
+    ultimos = _ultimos_tramos(list(por_ps))
+    nuevos = 0
+    for ps_id, observaciones in por_ps.items():
+        tramo = ultimos.get(ps_id)
+        for fecha, precio, moneda in sorted(observaciones, key=lambda o: o[0]):
+            if tramo is not None and fecha < tramo.desde:
+                continue
+            if tramo is not None and precio == tramo.precio and moneda == tramo.moneda:
+                tramo.hasta = max(tramo.hasta, fecha)
+                continue
+            if tramo is not None and fecha == tramo.desde:
+                tramo.precio, tramo.moneda, tramo.hasta = precio, moneda, max(tramo.hasta, fecha)
+                continue
+            if tramo is not None and fecha <= tramo.hasta:
+                tramo.hasta = fecha - timedelta(days=1)
+
+            tramo = IntervaloPrecio(
+                producto_supermercado_id=ps_id, desde=fecha, hasta=fecha, precio=precio, moneda=moneda
+            )
+            db.session.add(tramo)
+            nuevos += 1
+    return nuevos
+
+
+def registrar_precio(producto_supermercado_id, precio, moneda="ARS", fecha=None):
+    """
+    Versión de a uno de registrar_precios. No hace commit.
+    """
+    return registrar_precios([(producto_supermercado_id, precio, moneda, fecha)])
+
+
+def precio_en_fecha(producto_supermercado_id, fecha):
+    """
+    Precio vigente en `fecha`: el del último tramo que empezó ese día o antes.
+    Entre dos crawls vale el último precio visto. Retorna (precio, moneda) o None.
+    """
+    fila = db.session.execute(
+        db.select(IntervaloPrecio.precio, IntervaloPrecio.moneda)
+        .where(
+            IntervaloPrecio.producto_supermercado_id == producto_supermercado_id,
+            IntervaloPrecio.desde <= fecha,
+        )
+        .order_by(IntervaloPrecio.desde.desc())
+        .limit(1)
+    ).first()
+    return tuple(fila) if fila else None
+
+
+def precios_en_fecha(ps_ids, fecha):
+    """
+    Versión por lotes de precio_en_fecha, en una consulta.
+    Retorna un dict ps_id -> (precio, moneda) con los que tenían precio.
+    """
+    if not ps_ids:
+        return {}
+
+    vigentes = (
+        db.select(
+            IntervaloPrecio.producto_supermercado_id,
+            db.func.max(IntervaloPrecio.desde).label("desde"),
+        )
+        .where(
+            IntervaloPrecio.producto_supermercado_id.in_(set(ps_ids)),
+            IntervaloPrecio.desde <= fecha,
+        )
+        .group_by(IntervaloPrecio.producto_supermercado_id)
+        .subquery()
+    )
+    filas = db.session.execute(
+        db.select(IntervaloPrecio.producto_supermercado_id, IntervaloPrecio.precio, IntervaloPrecio.moneda)
+        .join(
+            vigentes,
+            db.and_(
+                IntervaloPrecio.producto_supermercado_id == vigentes.c.producto_supermercado_id,
+                IntervaloPrecio.desde == vigentes.c.desde,
+            ),
+        )
+    )
+    return {ps_id: (precio, moneda) for ps_id, precio, moneda in filas}
+
+
+def serie_producto(producto_id, desde=None, hasta=None):
+    """
+    Serie de precios de un producto en todos los supermercados: los tramos
+    que se superponen con [desde, hasta] (sin límite si son None).
+    Retorna un dict nombre_supermercado -> [(desde, hasta, precio, moneda)]
+    ordenado por fecha.
+    """
+    consulta = (
+        db.select(
+            Supermercado.nombre,
+            IntervaloPrecio.desde,
+            IntervaloPrecio.hasta,
+            IntervaloPrecio.precio,
+            IntervaloPrecio.moneda,
+        )
+        .join(ProductoSupermercado, ProductoSupermercado.id == IntervaloPrecio.producto_supermercado_id)
+        .join(Supermercado, Supermercado.id == ProductoSupermercado.supermercado_id)
+        .where(ProductoSupermercado.producto_id == producto_id)
+        .order_by(Supermercado.nombre, IntervaloPrecio.desde)
+    )
+    if desde is not None:
+        consulta = consulta.where(IntervaloPrecio.hasta >= desde)
+    if hasta is not None:
+        consulta = consulta.where(IntervaloPrecio.desde <= hasta)
+
+    serie = {}
+    for nombre_super, tramo_desde, tramo_hasta, precio, moneda in db.session.execute(consulta):
+        serie.setdefault(nombre_super, []).append((tramo_desde, tramo_hasta, precio, moneda))
+    return serie
+
+
+def _meses(desde, hasta):
+    mes = desde.replace(day=1)
+    while mes <= hasta:
+        siguiente = (mes + timedelta(days=32)).replace(day=1)
+        yield mes, siguiente
+        mes = siguiente
+
+
+def asegurar_particiones(desde, hasta=None):
+    """
+    En PostgreSQL crea las particiones mensuales de intervalo_precio que
+    cubren [desde, hasta] (por defecto, hasta el mes que viene). En otros
+    motores no hace nada. Si la partición DEFAULT ya tiene filas de un mes,
+    PostgreSQL no deja crearla: esas filas siguen en DEFAULT.
+    """
+    if db.engine.dialect.name != "postgresql":
+        return 0
+
+    hasta = hasta or (date.today().replace(day=1) + timedelta(days=32))
+    creadas = 0
+    for mes, siguiente in _meses(desde, hasta):
+        nombre = f"intervalo_precio_{mes:%Y%m}"
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {nombre} PARTITION OF intervalo_precio "
+                    f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{siguiente.isoformat()}')"
+                ))
+            creadas += 1
+        except DBAPIError as e:
+            print(f"[WARN] No se pudo crear la partición {nombre}: {e.orig}")
+    return creadas
+
+
+def compactar_historial(lote=500, borrar=False):
+    """
+    Pasa las filas de precio_producto (una por crawl) a tramos en
+    intervalo_precio. Se puede correr varias veces: solo procesa las filas
+    posteriores a la última compactación. Con borrar=True elimina las filas
+    ya compactadas. Procesa `lote` productos en super por commit.
+    Retorna la cantidad de filas de precio_producto leídas.
+    """
+    marca = db.session.get(VersionDatos, CLAVE_COMPACTADO)
+    ultimo_id = marca.version if marca else 0
+    tope = db.session.execute(db.select(db.func.max(PrecioProducto.id))).scalar()
+    if tope is None or tope <= ultimo_id:
+        return 0
+
+    rango = db.session.execute(
+        db.select(db.func.min(PrecioProducto.fecha), db.func.max(PrecioProducto.fecha))
+        .where(PrecioProducto.id > ultimo_id, PrecioProducto.id <= tope)
+    ).one()
+    if rango[0] is not None:
+        asegurar_particiones(rango[0], rango[1])
+
+    pendientes = db.and_(PrecioProducto.id > ultimo_id, PrecioProducto.id <= tope, PrecioProducto.fecha.isnot(None))
+    leidas = 0
+    ultimo_ps = 0
+    while True:
+        # Paginado por producto_supermercado_id (usa ix_precio_producto_ps_fecha)
+        ps_ids = db.session.execute(
+            db.select(PrecioProducto.producto_supermercado_id)
+            .where(pendientes, PrecioProducto.producto_supermercado_id > ultimo_ps)
+            .group_by(PrecioProducto.producto_supermercado_id)
+            .order_by(PrecioProducto.producto_supermercado_id)
+            .limit(lote)
+        ).scalars().all()
+        if not ps_ids:
+            break
+
+        filas = db.session.execute(
+            db.select(
+                PrecioProducto.producto_supermercado_id,
+                PrecioProducto.precio,
+                PrecioProducto.moneda,
+                PrecioProducto.fecha,
+            )
+            .where(pendientes, PrecioProducto.producto_supermercado_id.in_(ps_ids))
+            .order_by(PrecioProducto.producto_supermercado_id, PrecioProducto.fecha, PrecioProducto.id)
+        ).all()
+        registrar_precios([tuple(fila) for fila in filas])
+        db.session.commit()
+
+        leidas += len(filas)
+        ultimo_ps = ps_ids[-1]
+        print(f"[HISTORIAL] {leidas} precios compactados...")
+
+    marca = db.session.get(VersionDatos, CLAVE_COMPACTADO)
+    if marca is None:
+        marca = VersionDatos(clave=CLAVE_COMPACTADO, version=0)
+        db.session.add(marca)
+    marca.version = tope
+
+    if borrar:
+        db.session.execute(db.delete(PrecioProducto).where(PrecioProducto.id <= tope))
+    db.session.commit()
+    return leidas
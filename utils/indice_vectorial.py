@@ -0,0 +1,291 @@
+import json
+import os
+import numpy as np
+from . import RUTA_INDICE
+
+# Clave de partición para productos sin marca
+SIN_MARCA = -1
+
+# Cuántos vectores nuevos se acumulan antes de reordenar la matriz principal
+LIMITE_PENDIENTES = 512
+
+
+def _normalizar_filas(matriz):
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+
+class IndiceVectorial:
+    """
+    Índice en memoria de los embeddings de Producto.
+
+    Guarda todos los vectores en UNA matriz float32 contigua, ordenada por
+    marca_id, de modo que cada marca es un rango de filas. Buscar los
+    productos más parecidos de una marca es un producto matriz-vector sobre
+    ese rango.
+
+    Los productos nuevos se acumulan en un buffer por marca y se incorporan
+    a la matriz principal cada LIMITE_PENDIENTES inserciones.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.matriz = np.empty((0, dim), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.marcas = np.empty(0, dtype=np.int64)
+        self.particiones = {}
+        self.ultimo_id = 0
+        self._pendientes = {}
+        self._cant_pendientes = 0
+
+    # ------------------------------------------------------------------ #
+    # Construcción
+    # ------------------------------------------------------------------ #
+
+    @classmethod
+    def desde_filas(cls, filas, dim=384):
+        """
+        Arma el índice a partir de tuplas (producto_id, marca_id, vector).
+        """
+        indice = cls(dim)
+        ids, marcas, vectores = [], [], []
+        for producto_id, marca_id, vector in filas:
+            ids.append(producto_id)
+            marcas.append(SIN_MARCA if marca_id is None else marca_id)
+            vectores.append(np.asarray(vector, dtype=np.float32))
+
+        if vectores:
+            indice._reemplazar(
+                np.vstack(vectores),
+                np.asarray(ids, dtype=np.int64),
+                np.asarray(marcas, dtype=np.int64),
+            )
+        return indice
+
+    @classmethod
+    def desde_db(cls, desde_id=0, dim=384):
+        """
+        Arma el índice con todos los productos que tienen embedding.
+        """
+        return cls.desde_filas(_filas_db(desde_id), dim)
+
+    def _reemplazar(self, matriz, ids, marcas):
+        # Orden estable por marca: cada marca queda en un rango contiguo
+        orden = np.argsort(marcas, kind="stable")
+        self.matriz = np.ascontiguousarray(_normalizar_filas(matriz[orden]), dtype=np.float32)
+        self.ids = ids[orden]
+        self.marcas = marcas[orden]
+        self.dim = self.matriz.shape[1]
+        self._recalcular_particiones()
+        if len(self.ids):
+            self.ultimo_id = max(self.ultimo_id, int(self.ids.max()))
+
+    def _recalcular_particiones(self):
+        claves, inicios, cantidades = np.unique(self.marcas, return_index=True, return_counts=True)
+        self.particiones = {
+            int(clave): (int(inicio), int(inicio + cantidad))
+            for clave, inicio, cantidad in zip(claves, inicios, cantidades)
+        }
+
+    # ------------------------------------------------------------------ #
+    # Actualización incremental
+    # ------------------------------------------------------------------ #
+
+    def agregar(self, producto_id, marca_id, vector):
+        """
+        Agrega un producto recién insertado. Queda disponible para búsquedas
+        inmediatamente.
+        """
+        clave = SIN_MARCA if marca_id is None else marca_id
+        vec = np.asarray(vector, dtype=np.float32)
+        norma = np.linalg.norm(vec)
+        if norma > 0:
+            vec = vec / norma
+
+        self._pendientes.setdefault(clave, []).append((producto_id, vec))
+        self._cant_pendientes += 1
+        self.ultimo_id = max(self.ultimo_id, int(producto_id))
+
+        if self._cant_pendientes >= LIMITE_PENDIENTES:
+            self.compactar()
+
+    def compactar(self):
+        """
+        Incorpora los vectores pendientes a la matriz principal.
+        """
+        if not self._cant_pendientes:
+            return
+
+        ids, marcas, vectores = [], [], []
+        for clave, filas in self._pendientes.items():
+            for producto_id, vec in filas:
+                ids.append(producto_id)
+                marcas.append(clave)
+                vectores.append(vec)
+
+        self._reemplazar(
+            np.vstack([self.matriz, np.vstack(vectores)]),
+            np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)]),
+            np.concatenate([self.marcas, np.asarray(marcas, dtype=np.int64)]),
+        )
+        self._pendientes = {}
+        self._cant_pendientes = 0
+
+    def sincronizar(self):
+        """
+        Agrega los productos de la DB con id mayor al último indexado
+        (los que se insertaron después de guardar el índice).
+        Retorna la cantidad de productos agregados.
+        """
+        agregados = 0
+        for producto_id, marca_id, vector in _filas_db(self.ultimo_id):
+            self.agregar(producto_id, marca_id, vector)
+            agregados += 1
+        return agregados
+
+    # ------------------------------------------------------------------ #
+    # Búsqueda
+    # ------------------------------------------------------------------ #
+
+    def buscar(self, vector, marca_id=None, k=1):
+        """
+        Devuelve los k productos de la marca más parecidos al vector,
+        como lista de (producto_id, similitud) ordenada de mayor a menor.
+        """
+        clave = SIN_MARCA if marca_id is None else marca_id
+        consulta = np.asarray(vector, dtype=np.float32)
+
+        ids = []
+        puntajes = []
+
+        rango = self.particiones.get(clave)
+        if rango:
+            inicio, fin = rango
+            ids.append(self.ids[inicio:fin])
+            puntajes.append(self.matriz[inicio:fin] @ consulta)
+
+        pendientes = self._pendientes.get(clave)
+        if pendientes:
+            ids.append(np.asarray([p[0] for p in pendientes], dtype=np.int64))
+            puntajes.append(np.vstack([p[1] for p in pendientes]) @ consulta)
+
+        return _mejores(ids, puntajes, k)
+
+    def buscar_todos(self, vector, k=10):
+        """
+        Igual que buscar() pero sobre todos los productos, sin filtrar por marca.
+        """
+        consulta = np.asarray(vector, dtype=np.float32)
+
+        ids = [self.ids]
+        puntajes = [self.matriz @ consulta]
+
+        pendientes = [fila for filas in self._pendientes.values() for fila in filas]
+        if pendientes:
+            ids.append(np.asarray([p[0] for p in pendientes], dtype=np.int64))
+            puntajes.append(np.vstack([p[1] for p in pendientes]) @ consulta)
+
+        return _mejores(ids, puntajes, k)
+
+    # ------------------------------------------------------------------ #
+    # Persistencia
+    # ------------------------------------------------------------------ #
+
+    def guardar(self, ruta=RUTA_INDICE):
+        """
+        Guarda el índice en un directorio (matriz.npy, ids.npy, marcas.npy y
+        meta.json). Cada archivo se reemplaza de forma atómica.
+        """
+        self.compactar()
+        ruta = os.fspath(ruta)
+        os.makedirs(ruta, exist_ok=True)
+
+        for nombre, arreglo in (("matriz", self.matriz), ("ids", self.ids), ("marcas", self.marcas)):
+            tmp = os.path.join(ruta, f"{nombre}.tmp.npy")
+            np.save(tmp, np.ascontiguousarray(arreglo))
+            os.replace(tmp, os.path.join(ruta, f"{nombre}.npy"))
+
+        tmp = os.path.join(ruta, "meta.tmp.json")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "ultimo_id": self.ultimo_id}, f)
+        os.replace(tmp, os.path.join(ruta, "meta.json"))
+
+    @classmethod
+    def cargar(cls, ruta=RUTA_INDICE, mmap_mode="r"):
+        """
+        Carga un índice guardado con guardar(). Con mmap_mode='r' la matriz
+        no se copia a memoria: todos los procesos comparten las páginas del archivo.
+        """
+        ruta = os.fspath(ruta)
+        with open(os.path.join(ruta, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        indice = cls(meta["dim"])
+        indice.matriz = np.load(os.path.join(ruta, "matriz.npy"), mmap_mode=mmap_mode)
+        indice.ids = np.load(os.path.join(ruta, "ids.npy"))
+        indice.marcas = np.load(os.path.join(ruta, "marcas.npy"))
+        indice.ultimo_id = meta["ultimo_id"]
+        indice._recalcular_particiones()
+        return indice
+
+
+def _mejores(ids, puntajes, k):
+    """
+    Junta los bloques de (ids, puntajes) y devuelve los k de mayor puntaje
+    como lista de (producto_id, similitud).
+    """
+    ids = np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+    if not len(ids):
+        return []
+    puntajes = np.concatenate(puntajes)
+
+    k = min(k, len(ids))
+    mejores = np.argpartition(-puntajes, k - 1)[:k]
+    mejores = mejores[np.argsort(-puntajes[mejores])]
+    return [(int(ids[i]), float(puntajes[i])) for i in mejores]
+
+
+def _filas_db(desde_id=0):
+    from models import Producto
+    from vectores import decodificar
+
+    consulta = (
+        Producto.query
+        .with_entities(
+            Producto.id,
+            Producto.marca_id,
+            Producto.embedding_bin,
+            Producto.embedding_tag,
+            Producto.embedding,
+        )
+        .filter(
+            Producto.id > desde_id,
+            Producto.embedding_bin.isnot(None) | Producto.embedding.isnot(None),
+        )
+        .order_by(Producto.id.asc())
+    )
+    for producto_id, marca_id, blob, tag, embedding in consulta.yield_per(1000):
+        if blob:
+            yield producto_id, marca_id, decodificar(blob, tag)
+        elif embedding:
+            # embedding JSON todavía sin migrar
+            yield producto_id, marca_id, embedding
+
+
+_indice = None
+
+def obtener_indice(ruta=RUTA_INDICE):
+    """
+    Devuelve el índice compartido del proceso.
+    La primera vez lo carga desde disco (si existe) y lo pone al día con la DB;
+    si no hay nada guardado lo arma desde la DB.
+    """
+    global _indice
+    if _indice is None:
+        if os.path.exists(os.path.join(os.fspath(ruta), "meta.json")):
+            _indice = IndiceVectorial.cargar(ruta)
+            _indice.sincronizar()
+        else:
+            _indice = IndiceVectorial.desde_db()
+    return _indice
@@ -0,0 +1,132 @@
+import re
+import threading
+from .generar_alias import normalize_text
+from .matriz_marcas import registrar_vector_marca, invalidar_matriz_marcas
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Prioridad de coincidencia ante igual largo: el nombre de la marca gana al sinónimo
+PRIORIDAD_NOMBRE = 0
+PRIORIDAD_SINONIMO = 1
+
+
+def tokenizar(texto):
+    """
+    Normaliza (minúsculas, sin acentos) y parte en palabras alfanuméricas.
+    "Coca-Cola Light 1,5L" -> ["coca", "cola", "light", "1", "5l"]
+    """
+    return _TOKEN.findall(normalize_text(texto or ""))
+
+
+class MatcherMarcas:
+    """
+    Trie por palabras con todos los nombres y sinónimos de marcas.
+
+    Detectar la marca de un nombre de producto es una sola pasada sobre sus
+    palabras: desde cada posición se baja por el trie mientras las palabras
+    coincidan. Gana la coincidencia más larga (en palabras); ante empate,
+    el nombre de marca sobre el sinónimo, y después la que aparece primero.
+    """
+
+    def __init__(self):
+        self._raiz = {}
+        self.cantidad = 0
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """
+        filas: iterable de (nombre_marca, sinonimos).
+        """
+        matcher = cls()
+        for nombre, sinonimos in filas:
+            matcher.agregar(nombre, sinonimos)
+        return matcher
+
+    def _agregar_texto(self, texto, marca, prioridad):
+        tokens = tokenizar(texto)
+        if not tokens:
+            return
+
+        nodo = self._raiz
+        for token in tokens:
+            nodo = nodo.setdefault(token, {})
+
+        actual = nodo.get(None)
+        if actual is None or prioridad < actual[1]:
+            if actual is None:
+                self.cantidad += 1
+            # La clave None del nodo guarda (marca, prioridad)
+            nodo[None] = (marca, prioridad)
+
+    def agregar(self, nombre, sinonimos=None):
+        """
+        Agrega (o actualiza) una marca y sus sinónimos.
+        """
+        self._agregar_texto(nombre, nombre, PRIORIDAD_NOMBRE)
+        for sinonimo in sinonimos or []:
+            self._agregar_texto(sinonimo, nombre, PRIORIDAD_SINONIMO)
+
+    def buscar(self, nombre_producto):
+        """
+        Devuelve el nombre de la marca encontrada en el nombre del producto, o None.
+        """
+        tokens = tokenizar(nombre_producto)
+        mejor = None  # (largo, -prioridad, marca)
+
+        for inicio in range(len(tokens)):
+            nodo = self._raiz
+            for fin in range(inicio, len(tokens)):
+                nodo = nodo.get(tokens[fin])
+                if nodo is None:
+                    break
+                terminal = nodo.get(None)
+                if terminal is not None:
+                    candidato = (fin - inicio + 1, -terminal[1])
+                    if mejor is None or candidato > mejor[:2]:
+                        mejor = (*candidato, terminal[0])
+
+        return mejor[2] if mejor else None
+
+
+_matcher = None
+_lock = threading.Lock()
+
+
+def obtener_matcher():
+    """
+    Devuelve el matcher del proceso, construyéndolo desde la DB la primera vez.
+    """
+    global _matcher
+    if _matcher is None:
+        with _lock:
+            if _matcher is None:
+                from models import Marca
+                _matcher = MatcherMarcas.desde_filas(
+                    Marca.query.with_entities(Marca.nombre, Marca.sinonimos)
+                )
+    return _matcher
+
+
+def registrar_marca(nombre, sinonimos=None, vector=None):
+    """
+    Actualiza los caches de marcas en memoria (trie y, si se pasa `vector`,
+    la matriz de embeddings) cuando se crea una marca o se le agregan
+    sinónimos. Los caches que todavía no se construyeron no se tocan
+    (se van a construir con los datos nuevos).
+    """
+    with _lock:
+        if _matcher is not None:
+            _matcher.agregar(nombre, sinonimos)
+    if vector is not None:
+        registrar_vector_marca(nombre, vector)
+
+
+def invalidar_matcher():
+    """
+    Descarta el trie y la matriz de embeddings de marcas para que se
+    reconstruyan en el próximo uso.
+    """
+    global _matcher
+    with _lock:
+        _matcher = None
+    invalidar_matriz_marcas()
@@ -0,0 +1,111 @@
+import threading
+import numpy as np
+
+
+class MatrizMarcas:
+    """
+    Embeddings de todas las marcas en una sola matriz float32 con filas
+    normalizadas (L2), para comparar un nombre contra todas las marcas con
+    un único producto matriz-vector.
+    """
+
+    def __init__(self, nombres, matriz):
+        self.nombres = list(nombres)
+        self.matriz = np.ascontiguousarray(matriz, dtype=np.float32)
+
+    @classmethod
+    def desde_filas(cls, filas, dim=384):
+        """
+        filas: iterable de (nombre_marca, vector).
+        """
+        nombres, vectores = [], []
+        for nombre, vector in filas:
+            if vector is None:
+                continue
+            nombres.append(nombre)
+            vectores.append(np.asarray(vector, dtype=np.float32))
+
+        if not vectores:
+            return cls([], np.empty((0, dim), dtype=np.float32))
+
+        matriz = np.vstack(vectores)
+        normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+        normas[normas == 0] = 1.0
+        return cls(nombres, matriz / normas)
+
+    def agregar(self, nombre, vector):
+        vec = np.asarray(vector, dtype=np.float32)
+        norma = np.linalg.norm(vec)
+        if norma > 0:
+            vec = vec / norma
+
+        if nombre in self.nombres:
+            self.matriz[self.nombres.index(nombre)] = vec
+        else:
+            self.nombres.append(nombre)
+            self.matriz = np.vstack([self.matriz, vec[None, :]])
+
+    def mejor(self, vector):
+        """
+        Devuelve (nombre_marca, similitud) de la marca más parecida, o (None, 0.0).
+        """
+        if not self.nombres:
+            return None, 0.0
+        similitudes = self.matriz @ np.asarray(vector, dtype=np.float32)
+        i = int(np.argmax(similitudes))
+        return self.nombres[i], float(similitudes[i])
+
+    def mejores_lote(self, vectores):
+        """
+        Igual que mejor() para muchos vectores a la vez (una sola matmul).
+        Retorna una lista de (nombre_marca, similitud).
+        """
+        vectores = np.asarray(vectores, dtype=np.float32)
+        if not self.nombres or not len(vectores):
+            return [(None, 0.0)] * len(vectores)
+
+        similitudes = vectores @ self.matriz.T
+        indices = np.argmax(similitudes, axis=1)
+        return [
+            (self.nombres[j], float(similitudes[i, j]))
+            for i, j in enumerate(indices)
+        ]
+
+
+_matriz = None
+_lock = threading.Lock()
+
+
+def obtener_matriz_marcas():
+    """
+    Devuelve la matriz de embeddings de marcas del proceso, construyéndola
+    desde la DB la primera vez.
+    """
+    global _matriz
+    if _matriz is None:
+        with _lock:
+            if _matriz is None:
+                from models import Marca
+                _matriz = MatrizMarcas.desde_filas(
+                    (marca.nombre, marca.vector) for marca in Marca.query.all()
+                )
+    return _matriz
+
+
+def registrar_vector_marca(nombre, vector):
+    """
+    Agrega o reemplaza el embedding de una marca en la matriz en memoria.
+    Si todavía no se construyó, no hace nada.
+    """
+    with _lock:
+        if _matriz is not None:
+            _matriz.agregar(nombre, vector)
+
+
+def invalidar_matriz_marcas():
+    """
+    Descarta la matriz para que se reconstruya en el próximo uso.
+    """
+    global _matriz
+    with _lock:
+        _matriz = None
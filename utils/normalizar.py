@@ -1,4 +1,7 @@
-from revisar_intervenciones import revisar_intervenciones
+from .revisar_intervenciones import revisar_intervenciones
+from .detectar_marca import detectar_marca
+from .registrar_intervencion import registrar_producto_pendiente
+from unidades_medida import extraer_medida, patron_medida
 import re
 import unicodedata
 
@@ -10,36 +13,31 @@ def quitar_acentos(s: str) -> str:
     s = unicodedata.normalize("NFD", s)
     return "".join(c for c in s if unicodedata.category(c) != "Mn")
 
-def limpiar_nombre_producto(nombre: str, unidad_medida: str, marca: str):
+def limpiar_nombre_producto(nombre: str, medida, marca: str):
     """
     Limpia el nombre del producto utilizando regex:
-      - Quita la unidad de medida detectada (solo cuando aparece como palabra o parte de patrón numérico).
+      - Quita la medida detectada (ej: "500 g", "6 x 500 ml") con el patrón
+        ya compilado de unidades, sin armar uno nuevo por producto.
       - Quita la marca detectada como palabra completa.
       - Quita caracteres especiales.
       - Normaliza espacios.
       - eliminar acentos y pasar a minúsculas
     """
 
+    # 1) Eliminar medida (antes de pasar a minúsculas, sobre el texto original)
+    if medida:
+        nombre = patron_medida.sub(" ", nombre)
+
     nombre_limpio = nombre.lower()
     nombre_limpio = quitar_acentos(nombre_limpio)
 
-    # 1) Eliminar marca (como palabra completa o casi completa)
+    # 2) Eliminar marca (como palabra completa o casi completa)
     if marca:
         marca_norm = re.escape(marca.lower())
         # match como palabra: “ coca cola ”, " coca ", "coca-cola" etc.
         pattern_marca = rf"\b{marca_norm}\b"
         nombre_limpio = re.sub(pattern_marca, " ", nombre_limpio)
 
-
-    # 2) Eliminar unidad de medida
-    # (ej: “500 g”, “1.5 kg”, “900 ml”, “1 l”)
-    if unidad_medida:
-        unidad_norm = re.escape(unidad_medida.lower())
-        
-        # patrón: número + unidad (ej: 500 g) o unidad sola como palabra
-        pattern_unidad = rf"\b\d+([.,]\d+)?\s*{unidad_norm}\b|\b{unidad_norm}\b"
-        nombre_limpio = re.sub(pattern_unidad, " ", nombre_limpio)
-
     # 3) Quitar caracteres no alfanuméricos excepto espacio
     nombre_limpio = re.sub(r"[^a-z0-9\s]", " ", nombre_limpio)
 
@@ -55,18 +53,20 @@ def normalizar_producto_nombre(nombre):
     """
     intervencion = False 
 
-    unidad_medida, valor, intervencion_um = detectar_unidad_medida(nombre)
+    medida = extraer_medida(nombre)
+    unidad_medida = medida.unidad_base if medida else None
+    valor = medida.valor_base if medida else None
     marca, intervencion_marca = detectar_marca(nombre)
 
     # Si cualquiera de las dos pide intervención, lo marcamos
-    if intervencion_um:
+    if not medida:
         print("Intervención requerida: unidad de medida no detectada o dudosa.")
         intervencion = "unidad_medida_no_detectada_o_dudosa"
     if intervencion_marca:
         print("Intervención requerida: marca no detectada o dudosa.")
         intervencion = "marca_no_detectada_o_dudosa"
 
-    producto = limpiar_nombre_producto(nombre, valor, marca)
+    producto = limpiar_nombre_producto(nombre, medida, marca)
 
     return {
         "producto": producto,
@@ -0,0 +1,242 @@
+from datetime import date, timedelta
+from extensions import db
+from models import PrecioActual, IntervaloPrecio, ProductoSupermercado, Supermercado
+from .cache import incrementar_version_precios
+
+# Ventana (en días) sobre la que se calculan precio_min / precio_max
+VENTANA_DIAS = 30
+
+def _min_max_ventana(producto_supermercado_id, fecha):
+    """
+    Devuelve (min, max) de los tramos del historial que se superponen con
+    la ventana que termina en `fecha`.
+    """
+    desde = fecha - timedelta(days=VENTANA_DIAS)
+    return db.session.execute(
+        db.select(db.func.min(IntervaloPrecio.precio), db.func.max(IntervaloPrecio.precio))
+        .where(
+            IntervaloPrecio.producto_supermercado_id == producto_supermercado_id,
+            IntervaloPrecio.hasta >= desde,
+            IntervaloPrecio.desde <= fecha,
+        )
+    ).one()
+
+def _aplicar_precio(actual, precio, moneda, fecha, minimo, maximo):
+    """
+    Vuelca un precio nuevo sobre una fila de PrecioActual (ya existente o nueva).
+    """
+    minimo = precio if minimo is None else min(minimo, precio)
+    maximo = precio if maximo is None else max(maximo, precio)
+
+    if actual.precio is not None and actual.precio != precio:
+        # precio_anterior = último precio distinto al vigente
+        actual.precio_anterior = actual.precio
+
+    actual.precio = precio
+    actual.moneda = moneda
+    actual.fecha = fecha
+    actual.precio_min = minimo
+    actual.precio_max = maximo
+    return actual
+
+def actualizar_precio_actual(producto_supermercado_id, precio, moneda="ARS", fecha=None):
+    """
+    Inserta o actualiza la fila de precio_actual de un ProductoSupermercado.
+    No hace commit: se confirma junto con el resto de la escritura del pipeline.
+    Retorna la fila de PrecioActual.
+    """
+    fecha = fecha or date.today()
+    actual = db.session.get(PrecioActual, producto_supermercado_id)
+
+    # Si llega un precio más viejo que el vigente, no pisamos nada
+    if actual and actual.fecha and fecha < actual.fecha:
+        return actual
+
+    if not actual:
+        actual = PrecioActual(producto_supermercado_id=producto_supermercado_id)
+        db.session.add(actual)
+
+    minimo, maximo = _min_max_ventana(producto_supermercado_id, fecha)
+    return _aplicar_precio(actual, precio, moneda, fecha, minimo, maximo)
+
+def actualizar_precios_actuales(precios):
+    """
+    Versión por lotes de actualizar_precio_actual.
+    `precios` es una lista de (producto_supermercado_id, precio, moneda, fecha).
+    Usa dos consultas para todo el lote (filas vigentes y min/max de la ventana)
+    en lugar de dos por precio. No hace commit.
+    """
+    if not precios:
+        return
+
+    ps_ids = {ps_id for ps_id, _, _, _ in precios}
+    fecha_hasta = max(fecha for _, _, _, fecha in precios)
+    fecha_desde = min(fecha for _, _, _, fecha in precios) - timedelta(days=VENTANA_DIAS)
+
+    actuales = {
+        fila.producto_supermercado_id: fila
+        for fila in PrecioActual.query.filter(PrecioActual.producto_supermercado_id.in_(ps_ids))
+    }
+
+    ventanas = {
+        ps_id: (minimo, maximo)
+        for ps_id, minimo, maximo in db.session.execute(
+            db.select(
+                IntervaloPrecio.producto_supermercado_id,
+                db.func.min(IntervaloPrecio.precio),
+                db.func.max(IntervaloPrecio.precio),
+            )
+            .where(
+                IntervaloPrecio.producto_supermercado_id.in_(ps_ids),
+                IntervaloPrecio.hasta >= fecha_desde,
+                IntervaloPrecio.desde <= fecha_hasta,
+            )
+            .group_by(IntervaloPrecio.producto_supermercado_id)
+        )
+    }
+
+    for ps_id, precio, moneda, fecha in precios:
+        actual = actuales.get(ps_id)
+        if actual and actual.fecha and fecha < actual.fecha:
+            continue
+        if not actual:
+            actual = PrecioActual(producto_supermercado_id=ps_id)
+            db.session.add(actual)
+            actuales[ps_id] = actual
+
+        minimo, maximo = ventanas.get(ps_id, (None, None))
+        _aplicar_precio(actual, precio, moneda, fecha, minimo, maximo)
+
+def reconstruir_precios_actuales():
+    """
+    Recalcula precio_actual completo a partir del historial de precios
+    (intervalo_precio), con las mismas reglas que actualizar_precio_actual:
+    el precio vigente es el del último tramo, precio_anterior el último
+    precio distinto al vigente y min/max salen de la ventana de VENTANA_DIAS
+    que termina el último día en que se vio. Sirve para poblar la tabla en
+    una base que ya tenía precios cargados. Retorna la cantidad de filas generadas.
+    """
+    orden = (
+        db.func.row_number()
+        .over(
+            partition_by=IntervaloPrecio.producto_supermercado_id,
+            order_by=IntervaloPrecio.desde.desc(),
+        )
+        .label("orden")
+    )
+    historial = db.select(
+        IntervaloPrecio.producto_supermercado_id,
+        IntervaloPrecio.precio,
+        IntervaloPrecio.moneda,
+        IntervaloPrecio.hasta,
+        orden,
+    ).subquery()
+    # El último tramo de cada ProductoSupermercado; `hasta` es la última vez
+    # que se vio su precio
+    vigentes = db.select(historial).where(historial.c.orden == 1).subquery()
+
+    filas = {
+        ps_id: PrecioActual(producto_supermercado_id=ps_id, precio=precio, moneda=moneda, fecha=fecha)
+        for ps_id, precio, moneda, fecha in db.session.execute(
+            db.select(vigentes.c.producto_supermercado_id, vigentes.c.precio, vigentes.c.moneda, vigentes.c.hasta)
+        )
+    }
+
+    # precio_anterior: el tramo más reciente con un precio distinto al vigente
+    # (no necesariamente el anteúltimo: una corrección del mismo día puede
+    # dejar dos tramos seguidos con el mismo precio)
+    orden_anterior = (
+        db.func.row_number()
+        .over(partition_by=historial.c.producto_supermercado_id, order_by=historial.c.orden)
+        .label("orden_anterior")
+    )
+    anteriores = (
+        db.select(historial.c.producto_supermercado_id, historial.c.precio, orden_anterior)
+        .join(vigentes, vigentes.c.producto_supermercado_id == historial.c.producto_supermercado_id)
+        .where(historial.c.orden > 1, historial.c.precio != vigentes.c.precio)
+        .subquery()
+    )
+    for ps_id, precio in db.session.execute(
+        db.select(anteriores.c.producto_supermercado_id, anteriores.c.precio)
+        .where(anteriores.c.orden_anterior == 1)
+    ):
+        filas[ps_id].precio_anterior = precio
+
+    # min/max: una consulta agrupada por cada fecha de último visto (los días
+    # de crawl, no uno por producto), igual que actualizar_precios_actuales
+    for fecha in {fila.fecha for fila in filas.values()}:
+        for ps_id, minimo, maximo in db.session.execute(
+            db.select(
+                IntervaloPrecio.producto_supermercado_id,
+                db.func.min(IntervaloPrecio.precio),
+                db.func.max(IntervaloPrecio.precio),
+            )
+            .join(vigentes, vigentes.c.producto_supermercado_id == IntervaloPrecio.producto_supermercado_id)
+            .where(
+                vigentes.c.hasta == fecha,
+                IntervaloPrecio.hasta >= fecha - timedelta(days=VENTANA_DIAS),
+                IntervaloPrecio.desde <= fecha,
+            )
+            .group_by(IntervaloPrecio.producto_supermercado_id)
+        ):
+            filas[ps_id].precio_min, filas[ps_id].precio_max = minimo, maximo
+
+    db.session.execute(db.delete(PrecioActual))
+    db.session.add_all(filas.values())
+    db.session.commit()
+
+    # Las vistas cacheadas con los precios anteriores dejan de servirse
+    incrementar_version_precios()
+    return len(filas)
+
+def mejores_precios(producto_ids):
+    """
+    Para cada producto devuelve su precio vigente más barato entre todos los
+    supermercados, en una sola consulta.
+    Retorna un dict producto_id -> (precio, nombre_supermercado).
+    """
+    if not producto_ids:
+        return {}
+
+    filas = db.session.execute(
+        db.select(ProductoSupermercado.producto_id, PrecioActual.precio, Supermercado.nombre)
+        .join(PrecioActual, PrecioActual.producto_supermercado_id == ProductoSupermercado.id)
+        .join(Supermercado, Supermercado.id == ProductoSupermercado.supermercado_id)
+        .where(ProductoSupermercado.producto_id.in_(set(producto_ids)))
+        .order_by(PrecioActual.precio.asc())
+    )
+
+    mejores = {}
+    for producto_id, precio, nombre_super in filas:
+        mejores.setdefault(producto_id, (precio, nombre_super))
+    return mejores
+
+def subconsulta_mejor_precio(producto_ids):
+    """
+    Subconsulta con el precio vigente más barato de cada producto y el
+    supermercado que lo tiene: columnas producto_id, precio, supermercado.
+    `producto_ids` puede ser una lista o un select de ids.
+    Para unirla a otra consulta sin multiplicar filas (una por producto).
+    """
+    ranking = (
+        db.select(
+            ProductoSupermercado.producto_id,
+            PrecioActual.precio,
+            Supermercado.nombre.label("supermercado"),
+            db.func.row_number()
+            .over(
+                partition_by=ProductoSupermercado.producto_id,
+                order_by=(PrecioActual.precio.asc(), ProductoSupermercado.id.asc()),
+            )
+            .label("orden"),
+        )
+        .join(PrecioActual, PrecioActual.producto_supermercado_id == ProductoSupermercado.id)
+        .join(Supermercado, Supermercado.id == ProductoSupermercado.supermercado_id)
+        .where(ProductoSupermercado.producto_id.in_(producto_ids))
+        .subquery()
+    )
+    return (
+        db.select(ranking.c.producto_id, ranking.c.precio, ranking.c.supermercado)
+        .where(ranking.c.orden == 1)
+        .subquery()
+    )
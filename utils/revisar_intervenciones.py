@@ -1,8 +1,10 @@
-from . import embed, RUTA_PENDIENTES
+from . import RUTA_PENDIENTES
+from .embedding import embed
 import csv
-from detectar_marca import detectar_marca
-from normalizar import normalize_text
-from generar_alias import generar_aliases_basicos
+from .detectar_marca import detectar_marca
+from .generar_alias import normalize_text, generar_aliases_basicos
+from .matcher_marcas import registrar_marca
+from .sinonimos_marca import resolver_alias, agregar_sinonimos
 from models import Marca
 from extensions import db
 
@@ -72,12 +74,9 @@ def revisar_intervenciones(): # TODO: revisar comportamiento con unidades de med
         marca_norm = normalize_text(marca_canon)
         print(f"[INFO] Marca canonical normalizada: '{marca_norm}'")
 
-        # Buscar si ya existe en DB
-        marca_existente = (
-            Marca.query
-            .filter(db.func.lower(Marca.nombre) == marca_norm)
-            .first()
-        )
+        # Buscar si ya existe en DB (por nombre o sinónimo, normalizado)
+        resuelta = resolver_alias(marca_canon)
+        marca_existente = db.session.get(Marca, resuelta[0]) if resuelta else None
 
         aliases_nuevos = generar_aliases_basicos(marca_canon)
         print(f"[INFO] Aliases generados: {aliases_nuevos}")
@@ -88,30 +87,19 @@ def revisar_intervenciones(): # TODO: revisar comportamiento con unidades de med
             emb = embed(marca_canon)
             print(f"[EMBED] Tamaño del embedding generado: {len(emb)} valores.")
 
-            nueva_marca = Marca(
-                nombre=marca_canon,
-                sinonimos=aliases_nuevos,
-                embedding=emb
-            )
+            nueva_marca = Marca(nombre=marca_canon)
+            nueva_marca.set_vector(emb)
             db.session.add(nueva_marca)
+            db.session.flush()
+            agregar_sinonimos(nueva_marca, aliases_nuevos)
+            registrar_marca(marca_canon, aliases_nuevos, vector=emb)
             print(f"[OK] Marca '{marca_canon}' creada con éxito.")
         else:
             print(f"[EXISTE] La marca '{marca_existente.nombre}' ya está en la DB.")
             print("[INFO] Sus aliases actuales son:", marca_existente.sinonimos)
 
-            sinonimos = marca_existente.sinonimos or []
-            existentes_norm = {normalize_text(s) for s in sinonimos}
-            nombre_canon_norm = normalize_text(marca_existente.nombre)
-
-            agregados = []
-
-            for alias in aliases_nuevos:
-                alias_norm = normalize_text(alias)
-                if alias_norm not in existentes_norm and alias_norm != nombre_canon_norm:
-                    sinonimos.append(alias)
-                    agregados.append(alias)
-
-            marca_existente.sinonimos = sinonimos
+            agregados = agregar_sinonimos(marca_existente, aliases_nuevos)
+            registrar_marca(marca_existente.nombre, agregados)
 
             if agregados:
                 print(f"[UPDATE] Se agregaron nuevos alias: {agregados}")
@@ -0,0 +1,214 @@
+import sqlite3
+import threading
+import queue
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+from vectores import NOMBRE_MODELO
+from .generar_alias import normalize_text
+
+
+class CacheDisco:
+    """
+    Cache persistente texto -> embedding en un archivo SQLite,
+    con clave (modelo, texto normalizado).
+    """
+
+    def __init__(self, ruta, modelo=NOMBRE_MODELO):
+        self.modelo = modelo
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(ruta), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " modelo TEXT NOT NULL,"
+            " texto TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (modelo, texto))"
+        )
+        self._conn.commit()
+
+    def obtener(self, textos):
+        """
+        Devuelve un dict texto -> vector con los textos que están en cache.
+        """
+        encontrados = {}
+        textos = list(textos)
+        with self._lock:
+            # de a 500 para no pasarnos del límite de parámetros de SQLite
+            for i in range(0, len(textos), 500):
+                parte = textos[i:i + 500]
+                marcas = ",".join("?" * len(parte))
+                filas = self._conn.execute(
+                    f"SELECT texto, vector FROM embeddings WHERE modelo = ? AND texto IN ({marcas})",
+                    [self.modelo, *parte],
+                )
+                for texto, blob in filas:
+                    encontrados[texto] = np.frombuffer(blob, dtype=np.float32)
+        return encontrados
+
+    def guardar(self, vectores):
+        """
+        Guarda un dict texto -> vector.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (modelo, texto, vector) VALUES (?, ?, ?)",
+                [
+                    (self.modelo, texto, np.asarray(vec, dtype=np.float32).tobytes())
+                    for texto, vec in vectores.items()
+                ],
+            )
+            self._conn.commit()
+
+
+class ServicioEmbeddings:
+    """
+    Servicio de embeddings con:
+      - micro-lotes: los pedidos concurrentes se juntan en una sola llamada
+        al modelo (hasta `tam_lote` textos o `espera_ms` milisegundos);
+      - deduplicación de textos repetidos;
+      - cache LRU en memoria + cache persistente en disco.
+
+    `codificador` es una función lista[str] -> array (n, dim).
+    """
+
+    def __init__(self, codificador, cache_disco=None, tam_lru=10000, tam_lote=64, espera_ms=2):
+        self.codificador = codificador
+        self.cache_disco = cache_disco
+        self.tam_lru = tam_lru
+        self.tam_lote = tam_lote
+        self.espera = espera_ms / 1000
+
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._cola = queue.Queue()
+        self._hilo = None
+
+        # Contadores para ver cuánta inferencia nos ahorramos
+        self.estadisticas = {"lru": 0, "disco": 0, "modelo": 0}
+
+    # ------------------------------------------------------------------ #
+    # Cache en memoria
+    # ------------------------------------------------------------------ #
+
+    def _lru_obtener(self, clave):
+        with self._lock:
+            vec = self._lru.get(clave)
+            if vec is not None:
+                self._lru.move_to_end(clave)
+            return vec
+
+    def _lru_guardar(self, clave, vec):
+        with self._lock:
+            self._lru[clave] = vec
+            self._lru.move_to_end(clave)
+            while len(self._lru) > self.tam_lru:
+                self._lru.popitem(last=False)
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+
+    def embed_lote(self, textos):
+        """
+        Devuelve los embeddings (normalizados, float32) de una lista de textos,
+        en el mismo orden. Los textos repetidos se calculan una sola vez.
+        """
+        claves = [normalize_text(t or "") for t in textos]
+        resultado = {}
+
+        faltantes = []
+        for clave in dict.fromkeys(claves):
+            vec = self._lru_obtener(clave)
+            if vec is not None:
+                resultado[clave] = vec
+                self.estadisticas["lru"] += 1
+            else:
+                faltantes.append(clave)
+
+        if faltantes and self.cache_disco is not None:
+            en_disco = self.cache_disco.obtener(faltantes)
+            for clave, vec in en_disco.items():
+                resultado[clave] = vec
+                self._lru_guardar(clave, vec)
+            self.estadisticas["disco"] += len(en_disco)
+            faltantes = [c for c in faltantes if c not in en_disco]
+
+        if faltantes:
+            resultado.update(self._codificar(faltantes))
+
+        return [resultado[clave] for clave in claves]
+
+    def embed(self, texto, timeout=None):
+        """
+        Embedding de un solo texto. Si otros hilos piden embeddings al mismo
+        tiempo, se resuelven todos juntos en un micro-lote.
+        Con `timeout` (segundos) levanta concurrent.futures.TimeoutError si el
+        modelo no responde a tiempo; el embedding se termina de calcular igual
+        y queda en cache para el próximo pedido.
+        """
+        clave = normalize_text(texto or "")
+        vec = self._lru_obtener(clave)
+        if vec is not None:
+            self.estadisticas["lru"] += 1
+            return vec
+
+        futuro = Future()
+        self._cola.put((clave, futuro))
+        self._arrancar_hilo()
+        return futuro.result(timeout)
+
+    # ------------------------------------------------------------------ #
+    # Internos
+    # ------------------------------------------------------------------ #
+
+    def _codificar(self, claves):
+        """
+        Corre el modelo sobre textos que no están en ningún cache y
+        guarda los resultados en ambos caches.
+        """
+        nuevos = {}
+        for i in range(0, len(claves), self.tam_lote):
+            parte = claves[i:i + self.tam_lote]
+            vectores = np.asarray(self.codificador(parte), dtype=np.float32)
+            normas = np.linalg.norm(vectores, axis=1, keepdims=True)
+            normas[normas == 0] = 1.0
+            vectores = vectores / normas
+            for clave, vec in zip(parte, vectores):
+                nuevos[clave] = vec
+                self._lru_guardar(clave, vec)
+
+        self.estadisticas["modelo"] += len(nuevos)
+        if self.cache_disco is not None:
+            self.cache_disco.guardar(nuevos)
+        return nuevos
+
+    def _arrancar_hilo(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._atender_cola, daemon=True)
+                self._hilo.start()
+
+    def _atender_cola(self):
+        while True:
+            pedidos = [self._cola.get()]
+
+            # Juntamos lo que llegue durante la ventana de espera
+            try:
+                while len(pedidos) < self.tam_lote:
+                    pedidos.append(self._cola.get(timeout=self.espera))
+            except queue.Empty:
+                pass
+
+            claves = [clave for clave, _ in pedidos]
+            try:
+                vectores = self.embed_lote(claves)
+            except Exception as e:
+                for _, futuro in pedidos:
+                    futuro.set_exception(e)
+                continue
+
+            for (_, futuro), vec in zip(pedidos, vectores):
+                futuro.set_result(vec)
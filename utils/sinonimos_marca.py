@@ -0,0 +1,68 @@
+from extensions import db
+from models import Marca, MarcaSinonimo
+from .generar_alias import normalize_text
+from .upsert import insertar_o_ignorar
+
+
+def resolver_aliases(textos):
+    """
+    Resuelve muchos textos de marca con UNA consulta sobre el índice único
+    de marca_sinonimo (sin distinguir mayúsculas ni acentos).
+    Retorna un dict texto -> (marca_id, nombre_marca) solo con los textos
+    que son alias de alguna marca.
+    """
+    por_alias = {}
+    for texto in textos:
+        alias = normalize_text(texto or "")
+        if alias:
+            por_alias.setdefault(alias, []).append(texto)
+    if not por_alias:
+        return {}
+
+    resueltos = {}
+    for alias, marca_id, nombre in db.session.execute(
+        db.select(MarcaSinonimo.alias, Marca.id, Marca.nombre)
+        .join(Marca, Marca.id == MarcaSinonimo.marca_id)
+        .where(MarcaSinonimo.alias.in_(por_alias))
+    ):
+        for texto in por_alias[alias]:
+            resueltos[texto] = (marca_id, nombre)
+    return resueltos
+
+
+def resolver_alias(texto):
+    """
+    Versión de a uno de resolver_aliases: (marca_id, nombre_marca) o None.
+    """
+    return resolver_aliases([texto]).get(texto)
+
+
+def agregar_sinonimos(marca, aliases):
+    """
+    Registra aliases de una marca ya flusheada (con id):
+      - en Marca.sinonimos, los que no tenía (comparando normalizados);
+      - en marca_sinonimo, normalizados junto con el nombre de la marca.
+        Un alias que ya pertenece a otra marca se ignora (ON CONFLICT).
+    No hace commit. Retorna los aliases que se agregaron a la lista.
+    """
+    actuales = list(marca.sinonimos or [])
+    vistos = {normalize_text(s) for s in actuales} | {normalize_text(marca.nombre)}
+
+    agregados = []
+    for alias in aliases:
+        alias_norm = normalize_text(alias or "")
+        if alias_norm and alias_norm not in vistos:
+            vistos.add(alias_norm)
+            agregados.append(alias)
+
+    if agregados:
+        # Lista nueva (no append) para que SQLAlchemy detecte el cambio del JSON
+        marca.sinonimos = actuales + agregados
+
+    filas = {
+        normalize_text(alias): {"alias": normalize_text(alias), "marca_id": marca.id}
+        for alias in [marca.nombre, *actuales, *agregados]
+        if normalize_text(alias or "")
+    }
+    insertar_o_ignorar(MarcaSinonimo, list(filas.values()), conflicto=["alias"])
+    return agregados
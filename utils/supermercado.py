@@ -1,20 +1,64 @@
-from models import ListaCompra, ItemListaCompra, Supermercado, ProductoSupermercado, PrecioProducto, Producto
+from extensions import db
+from models import ListaCompra, ItemListaCompra, Supermercado, ProductoSupermercado, PrecioActual, Producto
+
+def _precios_por_supermercado(lista_id):
+    """
+    Resuelve en UNA sola consulta, para todos los productos de la lista,
+    el ProductoSupermercado de cada supermercado y su precio vigente
+    (tabla precio_actual).
+    Retorna un dict (supermercado_id, producto_id) -> precio (o None si no hay precio).
+    """
+    productos_lista = (
+        db.select(ItemListaCompra.producto_id)
+        .where(ItemListaCompra.lista_compra_id == lista_id)
+        .distinct()
+        .subquery()
+    )
+
+    consulta = (
+        db.select(
+            ProductoSupermercado.supermercado_id,
+            ProductoSupermercado.producto_id,
+            PrecioActual.precio,
+        )
+        .join(productos_lista, productos_lista.c.producto_id == ProductoSupermercado.producto_id)
+        .outerjoin(PrecioActual, PrecioActual.producto_supermercado_id == ProductoSupermercado.id)
+        .order_by(ProductoSupermercado.id.asc())
+    )
+
+    precios = {}
+    for supermercado_id, producto_id, precio in db.session.execute(consulta):
+        # Igual que antes: nos quedamos con el primer ProductoSupermercado
+        # de cada (supermercado, producto), tenga o no precio.
+        precios.setdefault((supermercado_id, producto_id), precio)
+
+    return precios
 
 def armar_listado_supermercados(lista_id):
     """
     Dada una lista de compra, arma una estructura con todos los supermercados
-    y los items de la lista que tienen en stock, con su precio más barato. 
+    y los items de la lista que tienen en stock, con su precio vigente.
+    Usa una cantidad constante de consultas, sin importar el largo de la
+    lista ni la cantidad de supermercados.
     """
-    lista = ListaCompra.query.get(lista_id)
+    lista = db.session.get(ListaCompra, lista_id)
 
     if not lista:
         return []
 
-    # Traer los items de esa lista
-    items_lista = ItemListaCompra.query.filter_by(lista_compra_id=lista.id).all()
+    # Traer los items de esa lista junto con el nombre del producto
+    items_lista = db.session.execute(
+        db.select(ItemListaCompra.producto_id, ItemListaCompra.cantidad, Producto.nombre)
+        .join(Producto, Producto.id == ItemListaCompra.producto_id)
+        .where(ItemListaCompra.lista_compra_id == lista.id)
+        .order_by(ItemListaCompra.id.asc())
+    ).all()
 
     # Traer TODOS los supermercados
-    supermercados = Supermercado.query.all()
+    supermercados = Supermercado.query.order_by(Supermercado.id.asc()).all()
+
+    # Todos los precios de todos los supers de una vez
+    precios = _precios_por_supermercado(lista.id)
 
     resultado = []
 
@@ -24,28 +68,13 @@ def armar_listado_supermercados(lista_id):
             "items": []
         }
 
-        for item in items_lista:
-            # Buscar el producto en ese supermercado
-            ps = ProductoSupermercado.query.filter_by(
-                supermercado_id=superm.id,
-                producto_id=item.producto_id
-            ).first()
-
-            if not ps:
-                continue
-
-            # Buscar el precio más reciente / más barato
-            precio = (
-                PrecioProducto.query
-                .filter_by(producto_supermercado_id=ps.id)
-                .order_by(PrecioProducto.precio.asc())
-                .first()
-            )
-
-            if precio:
+        for producto_id, cantidad, nombre in items_lista:
+            precio = precios.get((superm.id, producto_id))
+
+            if precio is not None:
                 supermercado_dict["items"].append({
-                    "nombre": Producto.query.get(item.producto_id).nombre,
-                    "precio": precio.precio * item.cantidad
+                    "nombre": nombre,
+                    "precio": precio * cantidad
                 })
 
         resultado.append(supermercado_dict)
@@ -77,4 +106,4 @@ def calcular_super_mas_barato(listado_supermercados):
     if not precios_totales:
         return None
 
-    return min(precios_totales, key=precios_totales.get)
\ No newline at end of file
+    return min(precios_totales, key=precios_totales.get)
@@ -0,0 +1,49 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+
+# insert() con soporte de ON CONFLICT según el motor
+_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def _insert(modelo):
+    dialecto = db.session.get_bind().dialect.name
+    try:
+        return _INSERTS[dialecto](modelo)
+    except KeyError:
+        raise NotImplementedError(f"ON CONFLICT no soportado en {dialecto}") from None
+
+
+def insertar_o_ignorar(modelo, filas, conflicto):
+    """
+    INSERT ... ON CONFLICT (conflicto) DO NOTHING de una o muchas filas (dicts).
+    Las filas que ya existen (según el índice único de `conflicto`) se saltean.
+    """
+    if not filas:
+        return
+    db.session.execute(
+        _insert(modelo).on_conflict_do_nothing(index_elements=conflicto),
+        filas,
+    )
+
+
+def upsert(modelo, fila, conflicto, actualizar, devolver=None):
+    """
+    INSERT ... ON CONFLICT (conflicto) DO UPDATE de una fila.
+
+    `actualizar` es una función que recibe la sentencia y devuelve el dict de
+    columnas a pisar; con `sentencia.excluded.<col>` se accede al valor que
+    se intentó insertar. Si se pasa `devolver` (columna), retorna su valor
+    para la fila insertada o actualizada.
+    """
+    sentencia = _insert(modelo).values(**fila)
+    sentencia = sentencia.on_conflict_do_update(
+        index_elements=conflicto,
+        set_=actualizar(sentencia),
+    )
+    if devolver is None:
+        db.session.execute(sentencia)
+        return None
+    return db.session.execute(sentencia.returning(devolver)).scalar_one()
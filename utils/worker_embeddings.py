@@ -0,0 +1,109 @@
+"""
+Worker de embeddings compartido.
+
+Carga el modelo UNA vez y atiende pedidos por un socket Unix, así N workers
+de gunicorn o procesos de scrapy comparten una sola copia del modelo.
+
+Uso:
+    python -m utils.worker_embeddings --socket /tmp/carrito-embeddings.sock
+
+y en los clientes:
+    export CARRITO_EMBEDDINGS_SOCKET=/tmp/carrito-embeddings.sock
+
+Protocolo (por conexión, pedidos en secuencia):
+    pedido    = uint32 largo + JSON (lista de textos, utf-8)
+    respuesta = uint32 filas + uint32 dim + filas*dim float32
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import numpy as np
+
+_CABECERA = struct.Struct("<I")
+_CABECERA_RESPUESTA = struct.Struct("<II")
+
+
+def _leer_exacto(conn, n):
+    datos = bytearray()
+    while len(datos) < n:
+        parte = conn.recv(n - len(datos))
+        if not parte:
+            raise ConnectionError("Conexión cerrada por el otro extremo")
+        datos.extend(parte)
+    return bytes(datos)
+
+
+class ClienteEmbeddings:
+    """
+    Codificador (lista[str] -> array (n, dim)) que le pide los embeddings
+    al worker compartido.
+    """
+
+    def __init__(self, ruta_socket, timeout=30):
+        self.ruta_socket = ruta_socket
+        self.timeout = timeout
+
+    def __call__(self, textos):
+        pedido = json.dumps(list(textos)).encode("utf-8")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(self.timeout)
+            conn.connect(self.ruta_socket)
+            conn.sendall(_CABECERA.pack(len(pedido)) + pedido)
+
+            filas, dim = _CABECERA_RESPUESTA.unpack(_leer_exacto(conn, _CABECERA_RESPUESTA.size))
+            datos = _leer_exacto(conn, filas * dim * 4)
+
+        return np.frombuffer(datos, dtype=np.float32).reshape(filas, dim)
+
+
+class _Manejador(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        servicio = self.server.servicio
+        while True:
+            try:
+                (largo,) = _CABECERA.unpack(_leer_exacto(self.request, _CABECERA.size))
+            except ConnectionError:
+                return
+
+            textos = json.loads(_leer_exacto(self.request, largo).decode("utf-8"))
+            vectores = servicio.embed_lote(textos)
+            matriz = np.ascontiguousarray(np.vstack(vectores) if vectores else np.empty((0, 0)), dtype=np.float32)
+
+            self.request.sendall(_CABECERA_RESPUESTA.pack(*matriz.shape) + matriz.tobytes())
+
+
+class ServidorEmbeddings(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, ruta_socket, servicio):
+        if os.path.exists(ruta_socket):
+            os.unlink(ruta_socket)
+        super().__init__(ruta_socket, _Manejador)
+        self.servicio = servicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de embeddings compartido")
+    parser.add_argument("--socket", default=os.environ.get("CARRITO_EMBEDDINGS_SOCKET", "/tmp/carrito-embeddings.sock"))
+    args = parser.parse_args()
+
+    from . import obtener_modelo, RUTA_CACHE_EMBEDDINGS
+    from .servicio_embeddings import ServicioEmbeddings, CacheDisco
+
+    modelo = obtener_modelo()
+    servicio = ServicioEmbeddings(
+        codificador=lambda textos: modelo.encode(textos, convert_to_numpy=True),
+        cache_disco=CacheDisco(RUTA_CACHE_EMBEDDINGS),
+    )
+
+    with ServidorEmbeddings(args.socket, servicio) as servidor:
+        print(f"Worker de embeddings escuchando en {args.socket}")
+        servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
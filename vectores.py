@@ -0,0 +1,66 @@
+import numpy as np
+
+# Modelo con el que se generan los embeddings (se guarda como parte del tag)
+NOMBRE_MODELO = "all-MiniLM-L6-v2"
+
+# Formatos binarios soportados para guardar embeddings
+FORMATOS = {
+    "float32": np.float32,
+    "float16": np.float16,
+    "int8": np.int8,
+}
+
+# Formato por defecto de los embeddings nuevos
+FORMATO_EMBEDDINGS = "float32"
+
+# Los embeddings están normalizados (componentes en [-1, 1]),
+# así que int8 usa una escala fija y no necesita guardar parámetros.
+ESCALA_INT8 = 127.0
+
+
+def armar_tag(formato=FORMATO_EMBEDDINGS, modelo=NOMBRE_MODELO):
+    """
+    Tag que acompaña al blob: "<modelo>:<formato>", ej "all-MiniLM-L6-v2:float32".
+    """
+    return f"{modelo}:{formato}"
+
+
+def leer_tag(tag):
+    """
+    Devuelve (modelo, formato) a partir de un tag.
+    """
+    modelo, _, formato = (tag or "").rpartition(":")
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de embedding desconocido: {tag!r}")
+    return modelo, formato
+
+
+def codificar(vector, formato=FORMATO_EMBEDDINGS, modelo=NOMBRE_MODELO):
+    """
+    Convierte un embedding (lista o array) en bytes.
+    Retorna (blob, tag).
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de embedding desconocido: {formato!r}")
+
+    vec = np.asarray(vector, dtype=np.float32)
+    if formato == "int8":
+        vec = np.clip(np.rint(vec * ESCALA_INT8), -127, 127)
+
+    return vec.astype(FORMATOS[formato]).tobytes(), armar_tag(formato, modelo)
+
+
+def decodificar(blob, tag):
+    """
+    Convierte un blob guardado con codificar() en un array float32.
+    Para float32 es una vista sin copia (np.frombuffer, de solo lectura);
+    los formatos cuantizados se des-cuantizan a un array nuevo.
+    """
+    _, formato = leer_tag(tag)
+    vec = np.frombuffer(blob, dtype=FORMATOS[formato])
+
+    if formato == "float32":
+        return vec
+    if formato == "int8":
+        return vec.astype(np.float32) / ESCALA_INT8
+    return vec.astype(np.float32)